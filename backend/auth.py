@@ -0,0 +1,62 @@
+"""
+Caller identity for the per-user question store.
+
+The frontend signs in with Supabase; its access token is an HS256 JWT signed
+with the project's JWT secret, whose `sub` claim is the user's id (the same
+user_id the frontend writes to its own tables). verify_token() checks the
+signature and expiry with the standard library only, so no JWT package is
+needed.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import time
+from typing import Dict, Optional
+
+
+class InvalidToken(Exception):
+    """Raised for a malformed, badly signed or expired token."""
+
+
+def _b64decode(part: str) -> bytes:
+    return base64.urlsafe_b64decode(part + "=" * (-len(part) % 4))
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def sign_token(claims: Dict, secret: str) -> str:
+    """HS256 JWT for claims (tests and local tooling; Supabase mints the real ones)."""
+    header = _b64encode(json.dumps({"alg": "HS256", "typ": "JWT"}).encode("utf-8"))
+    body = _b64encode(json.dumps(claims).encode("utf-8"))
+    signing_input = f"{header}.{body}".encode("ascii")
+    sig = hmac.new(secret.encode("utf-8"), signing_input, hashlib.sha256).digest()
+    return f"{header}.{body}.{_b64encode(sig)}"
+
+
+def verify_token(token: str, secret: str, now: Optional[float] = None) -> Dict:
+    """Claims of an HS256 JWT signed with secret; raises InvalidToken otherwise."""
+    try:
+        header_b64, body_b64, sig_b64 = token.split(".")
+        header = json.loads(_b64decode(header_b64))
+        claims = json.loads(_b64decode(body_b64))
+        sig = _b64decode(sig_b64)
+    except ValueError:
+        raise InvalidToken("Malformed token") from None
+    if not isinstance(header, dict) or header.get("alg") != "HS256" \
+            or not isinstance(claims, dict):
+        raise InvalidToken("Unsupported token")
+    expected = hmac.new(secret.encode("utf-8"), f"{header_b64}.{body_b64}".encode("ascii"),
+                        hashlib.sha256).digest()
+    if not hmac.compare_digest(sig, expected):
+        raise InvalidToken("Bad signature")
+    exp = claims.get("exp")
+    if exp is not None and (not isinstance(exp, (int, float))
+                            or exp < (time.time() if now is None else now)):
+        raise InvalidToken("Token expired")
+    if not isinstance(claims.get("sub"), str) or not claims["sub"]:
+        raise InvalidToken("Token has no subject")
+    return claims
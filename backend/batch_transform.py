@@ -0,0 +1,338 @@
+"""
+Batch transform: whole directories of exam PDFs into one consolidated output.
+
+    python batch_transform.py reports/ "archive/**/*.pdf" --out backfill --workers 8
+    python batch_transform.py reports/ --out backfill --format parquet
+
+Inputs are PDF paths, directories (searched recursively for *.pdf) or glob
+patterns. Files are spread over a process pool, so the interpreter, PyMuPDF and
+NumPy start once per worker rather than once per file. Rows are appended to
+<out>/all_sections_clean_scored.csv and <out>/exam_metadata.csv (same columns as
+the single-file CLI), or with --format parquet to one part file per flush under
+<out>/all_sections_clean_scored/ and <out>/exam_metadata/.
+
+<out>/manifest.jsonl has one line per flush: the output position after it and,
+per file, its content sha256, path, status, rows and seconds. Results are
+flushed every --flush_every files, outputs first, then their manifest line (a
+torn last line is ignored). Rerunning the same command skips files whose
+hash is already recorded as ok, so an interrupted run picks up where it
+stopped; output written after the last manifest line is discarded first. Failed
+files are recorded with their error and retried on the next run.
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
+
+import lsat_transformerWIP as transformer
+
+MANIFEST_NAME = "manifest.jsonl"
+MERGED_STEM = "all_sections_clean_scored"
+META_STEM = "exam_metadata"
+FORMATS = ("csv", "parquet")
+_GLOB_CHARS = set("*?[")
+
+
+def expand_inputs(inputs: Iterable[str]) -> List[str]:
+    """
+    PDF paths for a mix of files, directories and glob patterns, in argument
+    order (sorted within each directory/pattern), each file once.
+    """
+    paths, seen = [], set()
+    for item in inputs:
+        if os.path.isdir(item):
+            found = sorted(os.path.join(root, name)
+                           for root, _, names in os.walk(item)
+                           for name in names if name.lower().endswith(".pdf"))
+        elif _GLOB_CHARS & set(item):
+            found = sorted(p for p in glob.glob(item, recursive=True) if os.path.isfile(p))
+        elif os.path.isfile(item):
+            found = [item]
+        else:
+            raise FileNotFoundError(f"No such file, directory or match: {item}")
+        for path in found:
+            key = os.path.realpath(path)
+            if key not in seen:
+                seen.add(key)
+                paths.append(path)
+    return paths
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _fsync_append(path: str, text: str):
+    with open(path, "a", newline="", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+class Manifest:
+    """Append-only JSONL record of flushes: {"format", "output", "files": [...]}."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.flushes: List[Dict] = []
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        self.flushes.append(json.loads(line))
+                    except ValueError:
+                        break  # torn last line from a crash mid-write
+            # Rewrite without the torn tail so later appends stay parseable
+            with open(path, "w", encoding="utf-8") as f:
+                f.writelines(json.dumps(e) + "\n" for e in self.flushes)
+
+    def done(self) -> Dict[str, Dict]:
+        """sha256 -> file entry for every file recorded as ok."""
+        return {e["sha256"]: e for fl in self.flushes for e in fl["files"]
+                if e["status"] == "ok"}
+
+    def last_output(self) -> Optional[Dict]:
+        """Output position recorded with the most recent flush, if any."""
+        return self.flushes[-1]["output"] if self.flushes else None
+
+    def append(self, flush: Dict):
+        _fsync_append(self.path, json.dumps(flush) + "\n")
+        self.flushes.append(flush)
+
+
+class CsvSink:
+    """Appends to the two consolidated CSVs; positions are their byte sizes."""
+
+    def __init__(self, out_dir: str):
+        self.merged_path = os.path.join(out_dir, MERGED_STEM + ".csv")
+        self.meta_path = os.path.join(out_dir, META_STEM + ".csv")
+
+    def recover(self, manifest: Manifest, log: Callable[[str], None]):
+        """Cut both files back to the sizes recorded with the last flush."""
+        pos = manifest.last_output() or {}
+        for path, key in ((self.merged_path, "merged_bytes"), (self.meta_path, "meta_bytes")):
+            size = pos.get(key, 0)
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                log(f"Discarding {os.path.getsize(path) - size} unrecorded bytes "
+                    f"from {path}")
+                with open(path, "r+b") as f:
+                    f.truncate(size)
+
+    def _append(self, path: str, columns: Dict[str, List]) -> int:
+        header = not os.path.exists(path) or os.path.getsize(path) == 0
+        _fsync_append(path, transformer.columns_to_csv(columns, header=header))
+        return os.path.getsize(path)
+
+    def write(self, table: transformer.RowTable, metas: List[Dict]) -> Dict:
+        return {"merged_bytes": self._append(self.merged_path, table.to_columns()),
+                "meta_bytes": self._append(
+                    self.meta_path, transformer.to_columns(metas, transformer.META_FIELDS))}
+
+
+class ParquetSink:
+    """One Parquet part file per flush in each of two dataset directories;
+    positions name the part, so parts missing from the manifest are orphans."""
+
+    def __init__(self, out_dir: str):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("--format parquet needs pyarrow (pip install pyarrow)")
+        import response_formats
+        self._pq = pq
+        self._arrow_table = response_formats.arrow_table
+        self.merged_dir = os.path.join(out_dir, MERGED_STEM)
+        self.meta_dir = os.path.join(out_dir, META_STEM)
+        os.makedirs(self.merged_dir, exist_ok=True)
+        os.makedirs(self.meta_dir, exist_ok=True)
+        self._next = 0
+
+    def recover(self, manifest: Manifest, log: Callable[[str], None]):
+        """Delete part files no manifest line refers to (crash mid-flush)."""
+        parts = {fl["output"]["part"] for fl in manifest.flushes}
+        for d in (self.merged_dir, self.meta_dir):
+            for name in sorted(os.listdir(d)):
+                if name not in parts:
+                    log(f"Discarding unrecorded {os.path.join(d, name)}")
+                    os.remove(os.path.join(d, name))
+        numbers = [int(p[5:10]) for p in parts if p.startswith("part-")]
+        self._next = max(numbers, default=-1) + 1
+
+    def _write(self, path: str, columns: Dict[str, List]):
+        tmp = path + ".tmp"
+        self._pq.write_table(self._arrow_table(columns), tmp, compression="zstd")
+        os.replace(tmp, path)
+
+    def write(self, table: transformer.RowTable, metas: List[Dict]) -> Dict:
+        part = f"part-{self._next:05d}.parquet"
+        self._next += 1
+        self._write(os.path.join(self.merged_dir, part), table.to_columns())
+        self._write(os.path.join(self.meta_dir, part),
+                    transformer.to_columns(metas, transformer.META_FIELDS))
+        return {"part": part}
+
+
+def _transform_one(task) -> Dict:
+    """Pool worker: one PDF -> RowTable/meta, or the error; never raises."""
+    path, sha, clip_render, vector_detect, ladder = task
+    t0 = time.perf_counter()
+    timings = transformer.StageTimings(enabled=False)
+    try:
+        table, meta = transformer.extract_table(
+            path, original_name_hint=os.path.basename(path), clip_render=clip_render,
+            vector_detect=vector_detect, timings=timings, ladder=ladder)
+    except Exception as e:
+        return {"path": path, "sha256": sha, "ok": False, "error": f"{type(e).__name__}: {e}",
+                "seconds": time.perf_counter() - t0}
+    return {"path": path, "sha256": sha, "ok": True, "table": table, "meta": meta,
+            "pages": timings.counts.get("pages", 0), "seconds": time.perf_counter() - t0}
+
+
+def run_batch(inputs: Iterable[str], out_dir: str, fmt: str = "csv",
+              workers: Optional[int] = None, flush_every: int = 20,
+              clip_render: bool = True, vector_detect: bool = False,
+              ladder: Optional[transformer.RenderLadder] = None,
+              log: Callable[[str], None] = print) -> Dict:
+    """
+    Transform every PDF under inputs into the consolidated outputs in out_dir,
+    skipping files the manifest already has. Returns the run summary
+    (see format_summary). Ctrl-C flushes the files already finished.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"fmt must be one of {FORMATS}, got {fmt!r}")
+    t0 = time.perf_counter()
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = Manifest(os.path.join(out_dir, MANIFEST_NAME))
+    formats_used = {fl["format"] for fl in manifest.flushes}
+    if formats_used - {fmt}:
+        raise ValueError(f"{out_dir} holds a {formats_used.pop()} run; "
+                         f"use another --out for {fmt}")
+    sink = CsvSink(out_dir) if fmt == "csv" else ParquetSink(out_dir)
+    sink.recover(manifest, log)
+
+    paths = expand_inputs(inputs)
+    done = manifest.done()
+    tasks, queued = [], set()
+    skipped = duplicates = 0
+    for path in paths:
+        sha = file_sha256(path)
+        if sha in done:
+            skipped += 1
+        elif sha in queued:
+            duplicates += 1
+        else:
+            queued.add(sha)
+            tasks.append((path, sha, clip_render, vector_detect, ladder))
+    log(f"{len(paths)} PDFs: {len(tasks)} to transform, {skipped} already done"
+        + (f", {duplicates} duplicates" if duplicates else ""))
+
+    summary = {"files": 0, "failed": 0, "skipped": skipped, "duplicates": duplicates,
+               "pages": 0, "rows": 0, "bytes": 0, "interrupted": False}
+    pending: List[Dict] = []
+
+    def flush():
+        if not pending:
+            return
+        ok = [r for r in pending if r["ok"]]
+        output = sink.write(transformer.RowTable.concat([r["table"] for r in ok]),
+                            [r["meta"] for r in ok])
+        manifest.append({"format": fmt, "output": output, "files": [
+            {"sha256": r["sha256"], "path": r["path"],
+             "status": "ok" if r["ok"] else "failed",
+             "rows": len(r["table"]) if r["ok"] else 0, "pages": r.get("pages", 0),
+             "seconds": round(r["seconds"], 3), **({} if r["ok"] else {"error": r["error"]})}
+            for r in pending]})
+        pending.clear()
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(tasks) or 1))
+    ex = ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn"),
+                             initializer=transformer.load_deps)
+    try:
+        for res in ex.map(_transform_one, tasks):
+            summary["files"] += 1
+            summary["bytes"] += os.path.getsize(res["path"])
+            if res["ok"]:
+                summary["pages"] += res["pages"]
+                summary["rows"] += len(res["table"])
+            else:
+                summary["failed"] += 1
+                log(f"FAILED {res['path']}: {res['error']}")
+            pending.append(res)
+            if len(pending) >= flush_every:
+                flush()
+                log(f"  {summary['files']}/{len(tasks)} files")
+    except KeyboardInterrupt:
+        summary["interrupted"] = True
+    finally:
+        ex.shutdown(wait=not summary["interrupted"], cancel_futures=True)
+        flush()
+    summary["seconds"] = time.perf_counter() - t0
+    return summary
+
+
+def format_summary(s: Dict) -> str:
+    secs = max(s["seconds"], 1e-9)
+    head = (f"{'Interrupted after' if s['interrupted'] else 'Transformed'} {s['files']} files"
+            f" ({s['failed']} failed), skipped {s['skipped']} already done")
+    if s["duplicates"]:
+        head += f" and {s['duplicates']} duplicates"
+    return (f"{head}\n  {s['pages']} pages, {s['rows']} rows in {secs:.1f} s: "
+            f"{s['files'] / secs:.2f} files/s, {s['pages'] / secs:.1f} pages/s, "
+            f"{s['bytes'] / secs / 1e6:.2f} MB/s")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(
+        description="Transform many LSAT PDFs into one consolidated output, resumably.")
+    ap.add_argument("inputs", nargs="+", help="PDF files, directories and/or glob patterns")
+    ap.add_argument("--out", default="output_csvs",
+                    help="Output directory (consolidated files + manifest.jsonl)")
+    ap.add_argument("--format", choices=FORMATS, default="csv",
+                    help="csv: two appended CSVs; parquet: one part file per flush")
+    ap.add_argument("--workers", type=int, default=0,
+                    help="Worker processes (default: CPU count)")
+    ap.add_argument("--flush_every", type=int, default=20,
+                    help="Files per output flush / manifest checkpoint")
+    ap.add_argument("--full_page_render", action="store_true",
+                    help="Rasterize whole pages instead of just the response/flag strips")
+    ap.add_argument("--vector_detect", action="store_true",
+                    help="Detect ✓/✕ and flags from vector fills, rasterizing only as a fallback")
+    ap.add_argument("--dpi_ladder", type=int, nargs="+", default=[300],
+                    help="Raster DPIs, lowest first; close calls escalate to the next (e.g. 100 300)")
+    ap.add_argument("--score_margin", type=float, default=transformer.DEFAULT_LADDER.score_margin,
+                    help="Escalate ✓/✕ calls closer than this (RGB units)")
+    ap.add_argument("--flag_margin", type=float, default=transformer.DEFAULT_LADDER.flag_margin,
+                    help="Escalate flag ratios within this factor of the threshold")
+    args = ap.parse_args(argv)
+
+    ladder = transformer.RenderLadder(args.dpi_ladder, score_margin=args.score_margin,
+                                      flag_margin=args.flag_margin)
+    try:
+        summary = run_batch(args.inputs, args.out, fmt=args.format, workers=args.workers,
+                            flush_every=max(1, args.flush_every),
+                            clip_render=not args.full_page_render,
+                            vector_detect=args.vector_detect, ladder=ladder)
+    except (FileNotFoundError, RuntimeError, ValueError) as e:
+        ap.error(str(e))
+    print(format_summary(summary))
+    if summary["interrupted"]:
+        return 130
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
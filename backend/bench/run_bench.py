@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Benchmark harness for the transformer.
+
+For every (case, mode) it generates a synthetic report (synth_report.py), then in a
+fresh process per measurement:
+  - process_pdf: wall time, pages/sec, peak RSS and per-stage time
+    (StageTimings: open, meta, text, parse, vector, render, classify, escalate, csv),
+    plus the escalation rate for multi-DPI modes and the pipeline's measured peak
+    memory next to estimate_peak_bytes()' prediction
+  - /transform (--api): request latency through the FastAPI app + worker pool
+and checks every output row against the generator's ground truth.
+
+Results are printed and saved as JSON (bench/results/ by default); pass
+--compare to diff against an earlier run.
+
+Usage (from backend/):
+  python bench/run_bench.py
+  python bench/run_bench.py --cases standard --modes clip vector --repeat 5 --api
+  python bench/run_bench.py --compare bench/results/<earlier>.json
+  python bench/run_bench.py --modes adaptive --dpi_ladder 72,300 --score_margin 20
+"""
+
+import csv
+import io
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing as mp
+from typing import Dict, List, Optional
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+for _p in (BACKEND_DIR, BENCH_DIR):
+    if _p not in sys.path:
+        sys.path.insert(0, _p)
+
+import synth_report  # noqa: E402
+
+# name -> synth_report.generate() kwargs
+CASES: Dict[str, Dict] = {
+    "standard": dict(sections=4, questions=[25, 26, 25, 27], experimental=[3]),
+    "long": dict(sections=10, questions=[25], experimental=[2, 7]),
+    "paged": dict(sections=4, questions=[60], experimental=[1], rows_per_page=26),
+}
+# name -> pipeline kwargs (process_pdf) / env (/transform); dpi_ladder, score_margin
+# and flag_margin become a RenderLadder
+MODES: Dict[str, Dict] = {
+    "clip": dict(clip_render=True, vector_detect=False),
+    "full_page": dict(clip_render=False, vector_detect=False),
+    "vector": dict(clip_render=True, vector_detect=True),
+    "adaptive": dict(clip_render=True, vector_detect=False, dpi_ladder="100,300"),
+}
+_LADDER_KEYS = ("dpi_ladder", "score_margin", "flag_margin")
+COMPARED_FIELDS = ["Subtype", "Difficulty", "total_time_seconds", "question_score",
+                   "Flagged", "experimental_section"]
+
+
+def _peak_rss_mb(who=resource.RUSAGE_SELF) -> float:
+    kb = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return kb / (1024 * 1024) if sys.platform == "darwin" else kb / 1024
+
+
+def check_accuracy(rows_csv: str, meta_csv: str, truth: Dict) -> Dict:
+    """Field-level mismatches of the CSV output against the generator's ground truth."""
+    expected = {(r["Section"], r["Question"]): r for r in truth["rows"]}
+    seen = set()
+    mismatches = {f: 0 for f in COMPARED_FIELDS}
+    extra = 0
+    for r in csv.DictReader(io.StringIO(rows_csv)):
+        key = (int(r["Section"]), int(r["Question"]))
+        want = expected.get(key)
+        if want is None or key in seen:
+            extra += 1
+            continue
+        seen.add(key)
+        for f in COMPARED_FIELDS:
+            if str(r[f]) != str(want[f]):
+                mismatches[f] += 1
+    meta = next(csv.DictReader(io.StringIO(meta_csv)), {})
+    meta_ok = all(meta.get(k) == v for k, v in truth["meta"].items())
+    n = len(expected)
+    wrong_rows = sum(mismatches.values())
+    return {
+        "expected_rows": n,
+        "missing_rows": n - len(seen),
+        "extra_rows": extra,
+        "field_mismatches": mismatches,
+        "meta_ok": meta_ok,
+        # share of expected cells reproduced exactly
+        "cell_accuracy": round(1 - (wrong_rows + (n - len(seen)) * len(COMPARED_FIELDS))
+                               / (n * len(COMPARED_FIELDS)), 6) if n else 1.0,
+    }
+
+
+# ---------- measurements (each runs in its own spawned process) ----------
+
+def _measure_pipeline(pdf_path: str, mode: Dict, page_workers: int, out_dir: str) -> Dict:
+    import lsat_transformerWIP as W
+    W.load_deps()  # imports are lazy; keep them out of the pipeline's clock
+    if page_workers > 1:
+        W.page_pool(page_workers)  # started once per process, as in a pool worker's warmup
+    kwargs = {k: v for k, v in mode.items() if k not in _LADDER_KEYS}
+    if "dpi_ladder" in mode:
+        kwargs["ladder"] = W.RenderLadder.parse(
+            mode["dpi_ladder"],
+            **{k: mode[k] for k in ("score_margin", "flag_margin") if k in mode})
+    predicted = W.estimate_peak_bytes(pdf_path, clip_render=kwargs["clip_render"],
+                                      page_workers=page_workers, ladder=kwargs.get("ladder"))
+    timings = W.StageTimings()
+    rss = W.RssWatermark()
+    t0 = time.perf_counter()
+    merged_csv, meta_csv = W.process_pdf(pdf_path, out_dir=out_dir, page_workers=page_workers,
+                                         timings=timings, **kwargs)
+    wall = time.perf_counter() - t0
+    mem = rss.as_dict()
+    W.shutdown_page_pool()  # joined, so RUSAGE_CHILDREN below covers the page processes
+    with open(merged_csv, encoding="utf-8") as f:
+        rows_csv = f.read()
+    with open(meta_csv, encoding="utf-8") as f:
+        meta_out = f.read()
+    return {
+        "wall_s": wall,
+        "stages_s": dict(timings.stages),
+        "counts": dict(timings.counts),
+        "peak_rss_mb": max(_peak_rss_mb(), _peak_rss_mb(resource.RUSAGE_CHILDREN)),
+        "predicted_mb": predicted / (1024 * 1024),
+        # This process only, so not comparable with page_workers
+        "measured_mb": ((mem["peak_rss_bytes"] - mem["rss_start_bytes"]) / (1024 * 1024)
+                        if mem and page_workers <= 1 else None),
+        "rows_csv": rows_csv,
+        "meta_csv": meta_out,
+    }
+
+
+def _measure_api(pdf_path: str, mode: Dict, page_workers: int, repeat: int) -> Dict:
+    os.environ["TRANSFORM_WORKERS"] = "1"
+    os.environ["TRANSFORM_PAGE_WORKERS"] = str(page_workers)
+    os.environ["TRANSFORM_VECTOR_DETECT"] = "1" if mode["vector_detect"] else "0"
+    for key in _LADDER_KEYS:
+        if key in mode:
+            os.environ[f"TRANSFORM_{key.upper()}"] = str(mode[key])
+    os.environ["RESULT_CACHE_DIR"] = ""
+    os.environ["JOBS_DB_PATH"] = ":memory:"
+    from fastapi.testclient import TestClient
+    import main
+
+    with open(pdf_path, "rb") as f:
+        data = f.read()
+    latencies = []
+    body = None
+    with TestClient(main.app) as client:
+        # First call pays for worker warm-up; it isn't counted
+        for i in range(repeat + 1):
+            t0 = time.perf_counter()
+            r = client.post("/transform",
+                            files={"file": (os.path.basename(pdf_path), data, "application/pdf")},
+                            data={"no_cache": "true"})
+            if i:
+                latencies.append(time.perf_counter() - t0)
+            r.raise_for_status()
+            body = r.json()
+    # Pool workers have been joined on shutdown, so RUSAGE_CHILDREN covers them
+    return {
+        "latencies_s": latencies,
+        "peak_rss_mb": _peak_rss_mb(),
+        "worker_peak_rss_mb": _peak_rss_mb(resource.RUSAGE_CHILDREN),
+        "rows_csv": body["all_sections_csv"],
+        "meta_csv": body["exam_metadata_csv"],
+    }
+
+
+def _in_fresh_process(fn, *args):
+    # A new interpreter per measurement keeps peak RSS and import state independent
+    with ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context("spawn")) as ex:
+        return ex.submit(fn, *args).result()
+
+
+# ---------- driver ----------
+
+def run_case(case: str, mode_name: str, repeat: int, page_workers: int,
+             api: bool, work_dir: str, seed: int, ladder: Optional[Dict] = None) -> Dict:
+    """ladder: dpi_ladder/score_margin/flag_margin overrides for multi-DPI modes."""
+    pdf_path = os.path.join(work_dir, f"{case}.pdf")
+    truth = synth_report.generate(pdf_path, seed=seed, **CASES[case])
+    pages = truth["pages"]
+    mode = dict(MODES[mode_name])
+    if "dpi_ladder" in mode:
+        mode.update(ladder or {})
+        result_ladder = {k: mode[k] for k in _LADDER_KEYS if k in mode}
+    else:
+        result_ladder = None
+    result = {"case": case, "mode": mode_name, "page_workers": page_workers,
+              "pages": pages, "rows": len(truth["rows"]),
+              "pdf_bytes": os.path.getsize(pdf_path), "ladder": result_ladder}
+
+    runs = [_in_fresh_process(_measure_pipeline, pdf_path, mode, page_workers,
+                              os.path.join(work_dir, f"out-{case}-{mode_name}"))
+            for _ in range(repeat)]
+    wall = statistics.median(r["wall_s"] for r in runs)
+    stages = {}
+    for name in sorted({s for r in runs for s in r["stages_s"]}):
+        stages[name] = statistics.median(r["stages_s"].get(name, 0.0) for r in runs)
+    counts = runs[0]["counts"]
+    result["process_pdf"] = {
+        "wall_s": wall,
+        "wall_s_all": [r["wall_s"] for r in runs],
+        "pages_per_s": pages / wall if wall else None,
+        "peak_rss_mb": max(r["peak_rss_mb"] for r in runs),
+        "predicted_mb": runs[0]["predicted_mb"],
+        "measured_mb": runs[0]["measured_mb"],
+        "stages_s": stages,
+        # share of raster-classified rows re-rendered at a higher DPI
+        "escalation_rate": (counts.get("escalated_rows", 0) / counts["raster_rows"]
+                            if counts.get("raster_rows") else None),
+        "accuracy": check_accuracy(runs[0]["rows_csv"], runs[0]["meta_csv"], truth),
+    }
+
+    if api and mode_name != "full_page":  # the API always clip-renders
+        res = _in_fresh_process(_measure_api, pdf_path, mode, page_workers, repeat)
+        lat = statistics.median(res["latencies_s"])
+        result["transform_api"] = {
+            "latency_s": lat,
+            "latency_s_all": res["latencies_s"],
+            "pages_per_s": pages / lat if lat else None,
+            "peak_rss_mb": res["peak_rss_mb"],
+            "worker_peak_rss_mb": res["worker_peak_rss_mb"],
+            "accuracy": check_accuracy(res["rows_csv"], res["meta_csv"], truth),
+        }
+    return result
+
+
+def environment() -> Dict:
+    import fitz
+    import numpy
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                             capture_output=True, text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        rev = ""
+    return {
+        "git_rev": rev,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "pymupdf": fitz.VersionBind,
+        "numpy": numpy.__version__,
+    }
+
+
+def _fmt_row(r: Dict) -> str:
+    p = r["process_pdf"]
+    stages = " ".join(f"{k}={v * 1000:.0f}" for k, v in p["stages_s"].items())
+    line = (f"{r['case']:<9} {r['mode']:<9} {r['pages']:>3}p "
+            f"{p['wall_s'] * 1000:8.1f} ms {p['pages_per_s']:7.1f} p/s "
+            f"{p['peak_rss_mb']:6.0f} MB  acc={p['accuracy']['cell_accuracy']:.4f}  [{stages}]")
+    if p.get("measured_mb") is not None:
+        line += f"  mem={p['measured_mb']:.0f}/{p['predicted_mb']:.0f} MB"
+    if p.get("escalation_rate") is not None:
+        line += f"  esc={p['escalation_rate']:.1%}"
+    api = r.get("transform_api")
+    if api:
+        line += (f"\n{'':<9} {'':<9} {'':>4} {api['latency_s'] * 1000:8.1f} ms "
+                 f"{api['pages_per_s']:7.1f} p/s {api['worker_peak_rss_mb']:6.0f} MB  "
+                 f"acc={api['accuracy']['cell_accuracy']:.4f}  (/transform)")
+    return line
+
+
+def compare(current: Dict, baseline_path: str):
+    with open(baseline_path, encoding="utf-8") as f:
+        base = json.load(f)
+    index = {(r["case"], r["mode"], r["page_workers"]): r for r in base["results"]}
+    print(f"\nvs {baseline_path} (rev {base['environment'].get('git_rev') or '?'}):")
+    for r in current["results"]:
+        b = index.get((r["case"], r["mode"], r["page_workers"]))
+        if b is None:
+            continue
+        for target, metric in (("process_pdf", "wall_s"), ("transform_api", "latency_s")):
+            if target in r and target in b:
+                old, new = b[target][metric], r[target][metric]
+                print(f"  {r['case']:<9} {r['mode']:<9} {target:<13} "
+                      f"{old * 1000:8.1f} -> {new * 1000:8.1f} ms  ({old / new:5.2f}x)")
+
+
+def main(argv: Optional[List[str]] = None):
+    import argparse
+    ap = argparse.ArgumentParser(description="Benchmark the LSAT transformer on synthetic reports.")
+    ap.add_argument("--cases", nargs="+", choices=sorted(CASES), default=list(CASES))
+    ap.add_argument("--modes", nargs="+", choices=sorted(MODES), default=list(MODES))
+    ap.add_argument("--repeat", type=int, default=3, help="Runs per measurement (median reported)")
+    ap.add_argument("--page_workers", type=int, default=0,
+                    help="Pass page_workers through (stage times are then summed over workers)")
+    ap.add_argument("--api", action="store_true", help="Also measure POST /transform")
+    ap.add_argument("--dpi_ladder", default=None,
+                    help="DPI ladder for the adaptive mode, e.g. 72,300 (default 100,300)")
+    ap.add_argument("--score_margin", type=float, default=None,
+                    help="Adaptive mode: escalate ✓/✕ calls closer than this (RGB units)")
+    ap.add_argument("--flag_margin", type=float, default=None,
+                    help="Adaptive mode: escalate flag ratios within this factor of the threshold")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default=None,
+                    help="JSON output path (default: bench/results/bench-<timestamp>.json)")
+    ap.add_argument("--compare", default=None, help="Earlier results JSON to diff against")
+    args = ap.parse_args(argv)
+
+    ladder = {k: getattr(args, k) for k in _LADDER_KEYS if getattr(args, k) is not None}
+    results = []
+    with tempfile.TemporaryDirectory(prefix="lsat-bench-") as work_dir:
+        for case in args.cases:
+            for mode in args.modes:
+                r = run_case(case, mode, max(1, args.repeat), args.page_workers,
+                             args.api, work_dir, args.seed, ladder)
+                print(_fmt_row(r), flush=True)
+                results.append(r)
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "environment": environment(),
+        "args": vars(args),
+        "results": results,
+    }
+    out = args.out or os.path.join(BENCH_DIR, "results",
+                                   f"bench-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {out}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+    bad = [r for r in results
+           for t in ("process_pdf", "transform_api")
+           if t in r and r[t]["accuracy"]["cell_accuracy"] < 1.0]
+    return 1 if bad else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Synthetic LSAT score-report PDFs with known ground truth.
+
+Layout mirrors the real exports the transformer parses:
+  page 0:   title + "Scaled Score: NNN"
+  sections: "Section N" / "Section N (*)" header, the
+            "# Response Subtype Difficulty Total Question Time" header line, then one
+            row per question with a teal (✓) / orange (✕) response marker and an
+            optional blue-gray flag between the question number and Response.
+
+Usage:
+  python bench/synth_report.py out.pdf --sections 4 --questions 25 --experimental 3
+"""
+
+import json
+import random
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import fitz  # PyMuPDF
+
+TEAL = (0.10, 0.65, 0.60)
+ORANGE = (0.95, 0.50, 0.15)
+FLAG_BLUE = (0.45, 0.60, 0.80)
+
+LR_SUBTYPES = [
+    "Flaw", "Strengthen", "Weaken", "Necessary Assumption", "Sufficient Assumption",
+    "Main Point", "Inference", "Parallel Reasoning", "Principle", "Method of Reasoning",
+]
+RC_SUBTYPES = ["Main Idea", "Detail", "Inference", "Author's Attitude", "Function"]
+
+PAGE_W, PAGE_H = 612, 792  # US letter
+ROW_PITCH = 24
+FIRST_ROW_Y = 134
+COL_X = {"#": 40, "Response": 80, "Subtype": 160, "Difficulty": 330,
+         "Total": 400, "Question": 430, "Time": 480}
+
+
+def _fmt_time(seconds: int, rng: random.Random) -> str:
+    m, s = divmod(seconds, 60)
+    if rng.random() < 0.1:
+        return f"{m}:{s:02d}"
+    return f"{m}m {s}s" if m else f"{s}s"
+
+
+def _draw_header(page: fitz.Page, section: int, experimental: bool, continued: bool):
+    label = f"Section {section}" + (" (*)" if experimental else "")
+    if continued:
+        label += " (continued)"
+    page.insert_text((40, 60), label, fontsize=14)
+    for text, x in COL_X.items():
+        page.insert_text((x, 110), text, fontsize=9)
+
+
+def _draw_flag(page: fitz.Page, x: float, y: float):
+    # Small pennant: pole + triangle, filled blue-gray
+    shape = page.new_shape()
+    shape.draw_polyline([(x, y + 1), (x, y - 8), (x + 7, y - 5.5), (x + 1, y - 3)])
+    shape.finish(color=None, fill=FLAG_BLUE, closePath=True)
+    shape.commit()
+
+
+def generate(path: str,
+             sections: int = 4,
+             questions: Sequence[int] = (25,),
+             experimental: Sequence[int] = (),
+             correct_rate: float = 0.7,
+             flag_rate: float = 0.2,
+             scaled_score: int = 165,
+             exam_number: int = 12,
+             exam_date: Tuple[int, int, int] = (2024, 9, 7),
+             rows_per_page: int = 26,
+             seed: Optional[int] = 0) -> Dict:
+    """
+    Write a report PDF to path and return its ground truth:
+      {"meta": {...}, "rows": [{Section, Question, Subtype, Difficulty,
+       total_time_seconds, question_score, Flagged, experimental_section}, ...],
+       "pages": N}
+    questions is per section (cycled when shorter than sections).
+    """
+    rng = random.Random(seed)
+    doc = fitz.open()
+    y, mo, d = exam_date
+
+    cover = doc.new_page(width=PAGE_W, height=PAGE_H)
+    cover.insert_text((72, 72), f"LSAT PrepTest {exam_number} Results", fontsize=16)
+    cover.insert_text((72, 100), f"Scaled Score: {scaled_score}", fontsize=12)
+    cover.insert_text((72, 120), f"Taken {mo}/{d}/{y}", fontsize=10)
+
+    rows: List[Dict] = []
+    for sec in range(1, sections + 1):
+        n_q = questions[(sec - 1) % len(questions)]
+        starred = sec in experimental
+        subtypes = RC_SUBTYPES if sec % 4 == 0 else LR_SUBTYPES
+        page = None
+        for q in range(1, n_q + 1):
+            slot = (q - 1) % rows_per_page
+            if slot == 0:
+                page = doc.new_page(width=PAGE_W, height=PAGE_H)
+                _draw_header(page, sec, starred, continued=q > 1)
+            row_y = FIRST_ROW_Y + slot * ROW_PITCH
+
+            correct = rng.random() < correct_rate
+            flagged = rng.random() < flag_rate
+            subtype = rng.choice(subtypes)
+            level = rng.randint(1, 5)
+            seconds = rng.randint(5, 240)
+
+            page.insert_text((COL_X["#"], row_y), str(q), fontsize=9)
+            if flagged:
+                _draw_flag(page, COL_X["#"] + 16, row_y)
+            page.draw_rect(fitz.Rect(COL_X["Response"] - 2, row_y - 10, 150, row_y + 3),
+                           color=None, fill=TEAL if correct else ORANGE)
+            page.insert_text((COL_X["Response"] + 5, row_y), rng.choice("ABCDE"),
+                             fontsize=9, color=(1, 1, 1))
+            page.insert_text((COL_X["Subtype"], row_y), subtype, fontsize=9)
+            page.insert_text((COL_X["Difficulty"], row_y), f"Level {level}", fontsize=9)
+            page.insert_text((COL_X["Total"], row_y), _fmt_time(seconds, rng), fontsize=9)
+
+            rows.append({
+                "Section": sec,
+                "Question": q,
+                "Subtype": subtype,
+                "Difficulty": level,
+                "total_time_seconds": seconds,
+                "question_score": int(correct),
+                "Flagged": "TRUE" if flagged else "FALSE",
+                "experimental_section": "TRUE" if starred else "FALSE",
+            })
+
+    doc.set_metadata({"title": f"LSAT {exam_number} {mo}_{d}_{y}"})
+    doc.save(path, garbage=3, deflate=True)
+    n_pages = len(doc)
+    doc.close()
+    return {
+        "meta": {"exam_number": str(exam_number),
+                 "exam_date": f"{y:04d}-{mo:02d}-{d:02d}",
+                 "scaled_score": str(scaled_score)},
+        "rows": rows,
+        "pages": n_pages,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Generate a synthetic LSAT report PDF.")
+    ap.add_argument("pdf", help="Output PDF path")
+    ap.add_argument("--sections", type=int, default=4)
+    ap.add_argument("--questions", type=int, nargs="+", default=[25],
+                    help="Questions per section (cycled)")
+    ap.add_argument("--experimental", type=int, nargs="*", default=[],
+                    help="Section numbers marked (*)")
+    ap.add_argument("--correct_rate", type=float, default=0.7)
+    ap.add_argument("--flag_rate", type=float, default=0.2)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--truth", default=None, help="Write ground truth JSON here")
+    args = ap.parse_args()
+
+    truth = generate(args.pdf, sections=args.sections, questions=args.questions,
+                     experimental=args.experimental, correct_rate=args.correct_rate,
+                     flag_rate=args.flag_rate, seed=args.seed)
+    if args.truth:
+        with open(args.truth, "w", encoding="utf-8") as f:
+            json.dump(truth, f, indent=2)
+    print(f"Wrote {args.pdf} ({truth['pages']} pages, {len(truth['rows'])} rows)")
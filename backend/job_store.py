@@ -0,0 +1,209 @@
+"""
+Durable transform jobs.
+
+- JobStore: one SQLite table of jobs (status, params, result JSON, error). Async
+  jobs also keep their PDF until they finish, so they resume after a restart.
+  Finished jobs expire after a TTL; past max_finished the oldest are evicted.
+- JobRunner: runs a job's work coroutine as a task, records the outcome in the
+  store and supports cancellation. Limited jobs share a concurrency cap, so a
+  burst of async jobs waits its turn instead of hitting the pool's 503.
+
+Statuses: queued -> running -> done | failed | cancelled.
+"""
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+FINISHED = ("done", "failed", "cancelled")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    expires REAL,
+    filename TEXT,
+    exam_number TEXT,
+    exam_date TEXT,
+    no_cache INTEGER NOT NULL DEFAULT 0,
+    pdf BLOB,
+    result TEXT,
+    error TEXT,
+    error_status INTEGER
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status);
+CREATE INDEX IF NOT EXISTS jobs_expires ON jobs(expires);
+"""
+_PUBLIC_COLUMNS = ("id, status, created, updated, expires, filename, exam_number, "
+                   "exam_date, result, error, error_status")
+
+
+class JobStore:
+    """Blocking SQLite access; call from a thread (asyncio.to_thread) in the API."""
+
+    def __init__(self, path: str, ttl: float = 86400.0, max_finished: int = 1000):
+        self.path = path
+        self.ttl = ttl
+        self.max_finished = max_finished
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        if path != ":memory:":
+            self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+
+    def _exec(self, sql: str, params=()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._db.execute(sql, params)
+
+    def create(self, filename: Optional[str], exam_number: Optional[str],
+               exam_date: Optional[str], no_cache: bool = False,
+               pdf: Optional[bytes] = None) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._exec(
+            "INSERT INTO jobs (id, status, created, updated, filename, exam_number, "
+            "exam_date, no_cache, pdf) VALUES (?, 'queued', ?, ?, ?, ?, ?, ?, ?)",
+            (job_id, now, now, filename, exam_number, exam_date, int(no_cache),
+             bytes(pdf) if pdf is not None else None))
+        return job_id
+
+    def mark_running(self, job_id: str) -> bool:
+        """queued -> running; False if the job was cancelled (or is gone) meanwhile."""
+        cur = self._exec("UPDATE jobs SET status='running', updated=? "
+                         "WHERE id=? AND status='queued'", (time.time(), job_id))
+        return cur.rowcount == 1
+
+    def _finish(self, job_id: str, status: str, result=None, error=None,
+                error_status=None) -> bool:
+        now = time.time()
+        cur = self._exec(
+            "UPDATE jobs SET status=?, updated=?, expires=?, result=?, error=?, "
+            "error_status=?, pdf=NULL WHERE id=? AND status IN ('queued', 'running')",
+            (status, now, now + self.ttl,
+             json.dumps(result) if result is not None else None,
+             error, error_status, job_id))
+        return cur.rowcount == 1
+
+    def finish(self, job_id: str, result: Any) -> bool:
+        return self._finish(job_id, "done", result=result)
+
+    def fail(self, job_id: str, error: str, error_status: int = 500) -> bool:
+        return self._finish(job_id, "failed", error=error, error_status=error_status)
+
+    def cancel(self, job_id: str) -> bool:
+        return self._finish(job_id, "cancelled")
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        row = self._exec(f"SELECT {_PUBLIC_COLUMNS} FROM jobs WHERE id=?",
+                         (job_id,)).fetchone()
+        if row is None or (row["expires"] is not None and row["expires"] <= time.time()):
+            return None
+        job = dict(row)
+        if job["result"] is not None:
+            job["result"] = json.loads(job["result"])
+        return job
+
+    def load_pdf(self, job_id: str) -> Optional[bytes]:
+        row = self._exec("SELECT pdf FROM jobs WHERE id=?", (job_id,)).fetchone()
+        return row["pdf"] if row is not None else None
+
+    def unfinished(self) -> List[Dict]:
+        """
+        Jobs a previous process left queued/running, oldest first, all reset to
+        queued. Call once at startup, before any new job runs.
+        """
+        self._exec("UPDATE jobs SET status='queued' WHERE status='running'")
+        rows = self._exec(
+            "SELECT id, filename, exam_number, exam_date, no_cache, pdf IS NOT NULL AS has_pdf "
+            "FROM jobs WHERE status IN ('queued', 'running') ORDER BY created").fetchall()
+        return [dict(r) for r in rows]
+
+    def delete(self, job_id: str) -> bool:
+        return self._exec("DELETE FROM jobs WHERE id=?", (job_id,)).rowcount == 1
+
+    def purge_expired(self) -> int:
+        """Drop expired jobs, then the oldest finished ones beyond max_finished."""
+        removed = self._exec("DELETE FROM jobs WHERE expires IS NOT NULL AND expires <= ?",
+                             (time.time(),)).rowcount
+        removed += self._exec(
+            "DELETE FROM jobs WHERE id IN (SELECT id FROM jobs WHERE status IN (?, ?, ?) "
+            "ORDER BY updated DESC LIMIT -1 OFFSET ?)",
+            (*FINISHED, self.max_finished)).rowcount
+        return removed
+
+    def counts(self) -> Dict[str, int]:
+        rows = self._exec("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {r["status"]: r["n"] for r in rows}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class JobRunner:
+    def __init__(self, store: JobStore, concurrency: int):
+        self.store = store
+        self._sem = asyncio.Semaphore(concurrency)
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def start(self, job_id: str, work: Callable[[], Awaitable[Any]],
+              limited: bool = True) -> asyncio.Task:
+        """
+        Run work() for job_id in a task; the task's result is work's result.
+        Failures are stored with the exception's status_code/detail when it has them.
+        """
+        task = asyncio.ensure_future(self._run(job_id, work, limited))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda t: self._done(job_id, t))
+        return task
+
+    def _done(self, job_id, task):
+        self._tasks.pop(job_id, None)
+        # Outcome is in the store; don't warn about exceptions nobody awaited
+        if not task.cancelled():
+            task.exception()
+
+    async def _run(self, job_id, work, limited):
+        if limited:
+            async with self._sem:
+                return await self._execute(job_id, work)
+        return await self._execute(job_id, work)
+
+    async def _execute(self, job_id, work):
+        if not await asyncio.to_thread(self.store.mark_running, job_id):
+            raise asyncio.CancelledError()
+        try:
+            result = await work()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await asyncio.to_thread(self.store.fail, job_id,
+                                    str(getattr(e, "detail", e)),
+                                    getattr(e, "status_code", 500))
+            raise
+        await asyncio.to_thread(self.store.finish, job_id, result)
+        return result
+
+    async def cancel(self, job_id: str) -> bool:
+        """Cancel a queued/running job. Work already handed to a worker still finishes
+        (and lands in the result cache); only this job's outcome is dropped."""
+        cancelled = await asyncio.to_thread(self.store.cancel, job_id)
+        task = self._tasks.get(job_id)
+        if task is not None:
+            task.cancel()
+        return cancelled
+
+    @property
+    def active(self) -> int:
+        return len(self._tasks)
+
+    def stop(self):
+        for task in list(self._tasks.values()):
+            task.cancel()
@@ -13,15 +13,61 @@ API-friendly:
 
 Deps:
   pip install "pymupdf>=1.24.0" "numpy>=1.24.0"
+  Both are imported on first use (or by load_deps()/warmup()), so importing this
+  module for its constants or from a server that hasn't transformed yet is cheap.
 """
 
+from __future__ import annotations
+
+import importlib
+import io
+import itertools
 import os
 import re
 import csv
+import time
 import pathlib
-from typing import Dict, List, Tuple, Optional
-import fitz  # PyMuPDF
-import numpy as np
+import tempfile
+from contextlib import contextmanager, nullcontext
+from functools import lru_cache
+from typing import Dict, Iterator, List, Sequence, Tuple, Optional, Union
+
+# ---------- lazy heavy imports ----------
+
+# Seconds spent importing each lazily loaded module in this process
+IMPORT_SECONDS: Dict[str, float] = {}
+
+
+class _LazyModule:
+    """Placeholder global for a heavy module; the first attribute access imports it
+    and replaces the placeholder, so later lookups cost nothing extra."""
+
+    def __init__(self, name: str, alias: str):
+        self._name = name
+        self._alias = alias
+
+    def __getattr__(self, attr):
+        return getattr(_load(self._alias), attr)
+
+
+def _load(alias: str):
+    mod = globals()[alias]
+    if isinstance(mod, _LazyModule):
+        t0 = time.perf_counter()
+        mod = importlib.import_module(mod._name)
+        IMPORT_SECONDS[mod.__name__] = time.perf_counter() - t0
+        globals()[alias] = mod
+    return mod
+
+
+fitz = _LazyModule("fitz", "fitz")  # PyMuPDF
+np = _LazyModule("numpy", "np")
+
+
+def load_deps():
+    """Import NumPy and PyMuPDF now instead of on first use."""
+    _load("np")
+    _load("fitz")
 
 # ---------- title/date parsing helpers ----------
 
@@ -33,19 +79,24 @@ MONTHS = {
 }
 
 
+DATE_RES = [
+    # MM/DD/YYYY or MM_DD_YYYY
+    re.compile(r'(?P<m>\d{1,2})[\/_\-](?P<d>\d{1,2})[\/_\-](?P<y>\d{4})', re.IGNORECASE),
+    # YYYY-MM-DD or YYYY_MM_DD
+    re.compile(r'(?P<y>\d{4})[\/_\-](?P<m>\d{1,2})[\/_\-](?P<d>\d{1,2})', re.IGNORECASE),
+    # Month D, YYYY
+    re.compile(r'(?P<mon>[A-Za-z]{3,9})[ ,_\-]+(?P<d>\d{1,2})(?:st|nd|rd|th)?[ ,_\-]+(?P<y>\d{4})',
+               re.IGNORECASE),
+]
+_TRAILING_SEP_RE = re.compile(r'[\s\-_/,]+$')
+_LAST_INT_RE = re.compile(r'(\d+)\D*$')
+
+
 def _last_date_match(s: str):
     """Return (year, month, day, start_idx) for the LAST date found in s, else None."""
-    patterns = [
-        # MM/DD/YYYY or MM_DD_YYYY
-        r'(?P<m>\d{1,2})[\/_\-](?P<d>\d{1,2})[\/_\-](?P<y>\d{4})',
-        # YYYY-MM-DD or YYYY_MM_DD
-        r'(?P<y>\d{4})[\/_\-](?P<m>\d{1,2})[\/_\-](?P<d>\d{1,2})',
-        # Month D, YYYY
-        r'(?P<mon>[A-Za-z]{3,9})[ ,_\-]+(?P<d>\d{1,2})(?:st|nd|rd|th)?[ ,_\-]+(?P<y>\d{4})',
-    ]
     last = None
-    for pat in patterns:
-        for m in re.finditer(pat, s, flags=re.IGNORECASE):
+    for pat in DATE_RES:
+        for m in pat.finditer(s):
             gd = m.groupdict()
             if 'mon' in gd and gd.get('mon'):
                 mon = gd['mon'].lower()
@@ -64,8 +115,8 @@ def _last_date_match(s: str):
 
 def _nearest_int_before(s: str, idx: int) -> Optional[str]:
     """Integer immediately before idx (ignoring spaces/punct)."""
-    pre = re.sub(r'[\s\-_/,]+$', '', s[:idx])
-    m = re.search(r'(\d+)\D*$', pre)
+    pre = _TRAILING_SEP_RE.sub('', s[:idx])
+    m = _LAST_INT_RE.search(pre)
     return m.group(1) if m else None
 
 
@@ -105,6 +156,8 @@ def parse_title_fields(pdf_path: str, doc: fitz.Document, hint_name: Optional[st
 
 
 SECTION_HEADER_RE = re.compile(r"Section\s+(\d+)(?:\s*\(\*\))?", re.IGNORECASE)
+# Experimental sections: "Section N (*)"
+SECTION_STARRED_RE = re.compile(r"Section\s+(\d+)\s*\(\*\)", re.IGNORECASE)
 ROW_RE = re.compile(r"""
     ^\s*(?P<qnum>\d{1,2})
     \s+[A-E]
@@ -115,14 +168,61 @@ ROW_RE = re.compile(r"""
 HEADER_LINE_RE = re.compile(
     r"^#\s*Response\s+Subtype\s+Difficulty\s+Total\s+Question\s+Time", re.IGNORECASE)
 SCALED_SCORE_RE = re.compile(r"Scaled\s+Score:\s*(\d{2,3})", re.IGNORECASE)
+_QNUM_TOKEN_RE = re.compile(r"(\d+)\D*")
+_MMSS_RE = re.compile(r'^(?P<m>\d+):(?P<s>\d{1,2})$')
+_MS_RE = re.compile(r'^(?:(?P<m>\d+)m)?(?:(?P<s>\d+)s)?$')
 
 
 def coalesce_space(s: str) -> str:
-    return re.sub(r"\s+", " ", s).strip()
+    # str.split() breaks on exactly the characters re's \s matches
+    return " ".join(s.split())
 
 
-def span_text_blocks(page: fitz.Page):
-    text_dict = page.get_text("dict")
+class PageText:
+    """
+    One text extraction per page: a shared TextPage from which the plain text
+    (for section/score regexes) and the word boxes clustered into TextLines (for row
+    parsing) are derived. Lines are built lazily, so pages without a Section header
+    stay cheap; the span dict is only built if something asks for it.
+    """
+
+    def __init__(self, page: fitz.Page):
+        self.page = page
+        self.textpage = page.get_textpage(flags=fitz.TEXTFLAGS_TEXT)
+        self.text = page.get_text("text", textpage=self.textpage)
+        self._spans = None
+        self._lines = None
+
+    @property
+    def spans(self):
+        if self._spans is None:
+            self._spans = span_text_blocks(self.page, textpage=self.textpage)
+        return self._spans
+
+    @property
+    def lines(self) -> "TextLines":
+        if self._lines is None:
+            # "words" is a fraction of the cost of the "dict" spans and carries the boxes
+            self._lines = TextLines.from_words(
+                self.page.get_text("words", textpage=self.textpage))
+        return self._lines
+
+    def has_section(self) -> bool:
+        return "Section" in self.text
+
+    def section_meta(self) -> Dict[int, Dict]:
+        """{section number: {"experimental": bool}} for the Section headers on the page."""
+        starred = set(SECTION_STARRED_RE.findall(self.text))
+        return {int(n): {"experimental": n in starred}
+                for n in SECTION_HEADER_RE.findall(self.text)}
+
+    def scaled_score(self) -> str:
+        m = SCALED_SCORE_RE.search(self.text)
+        return m.group(1) if m else ""
+
+
+def span_text_blocks(page: fitz.Page, textpage: Optional[fitz.TextPage] = None):
+    text_dict = page.get_text("dict", textpage=textpage)
     spans = []
     for block in text_dict.get("blocks", []):
         for line in block.get("lines", []):
@@ -133,83 +233,169 @@ def span_text_blocks(page: fitz.Page):
     return spans
 
 
-def group_by_line(spans):
-    lines = {}
-    for s in spans:
-        key = round(s["bbox"][1] / 1.5)
-        lines.setdefault(key, []).append(s)
-    return lines
+# A word/span joins the current line when its y-center is within this many points
+# of the previous (y-sorted) one's
+LINE_TOL_PT = 2.0
 
 
-def find_header_and_columns(spans):
+class TextLines:
+    """
+    Text pieces (words or spans) clustered into lines with array ops: sort by
+    y-center, start a new line wherever the gap to the previous center exceeds tol,
+    order each line by x0. Lines are numbered top to bottom. Unlike fixed
+    round(y / k) buckets, a line is never split because it straddles a bucket
+    boundary.
+    """
+
+    def __init__(self, box: np.ndarray, text: List[str], tol: float = LINE_TOL_PT):
+        """box: (n, 4) x0, y0, x1, y1 per piece; text: the pieces' strings."""
+        self.box = box
+        self.text = text
+        n = len(text)
+        yc = (box[:, 1] + box[:, 3]) * 0.5
+        by_y = np.argsort(yc, kind="stable")
+        line = np.zeros(n, dtype=np.int64)
+        line[by_y[1:]] = np.cumsum(np.diff(yc[by_y]) > tol)
+        # Piece indices line by line, left to right (ties keep extraction order)
+        self.order = np.lexsort((box[:, 0], line))
+        self.starts = np.flatnonzero(np.diff(line[self.order], prepend=-1))
+        self.ends = np.append(self.starts[1:], n)[:len(self.starts)].astype(np.int64)
+        self.x1 = box[self.order, 2]
+        # Mean piece y-center per line
+        self.center = (np.add.reduceat(yc[self.order], self.starts) / (self.ends - self.starts)
+                       if n else np.zeros(0))
+        self._texts = None
+
+    @classmethod
+    def from_words(cls, words: List[tuple], tol: float = LINE_TOL_PT) -> "TextLines":
+        """From page.get_text("words") tuples."""
+        n = len(words)
+        box = np.fromiter((v for w in words for v in w[:4]), dtype=np.float64,
+                          count=4 * n).reshape(n, 4)
+        return cls(box, [w[4] for w in words], tol)
+
+    @classmethod
+    def from_spans(cls, spans: List[Dict], tol: float = LINE_TOL_PT) -> "TextLines":
+        """From span_text_blocks() dicts."""
+        n = len(spans)
+        box = np.fromiter((v for s in spans for v in s["bbox"]), dtype=np.float64,
+                          count=4 * n).reshape(n, 4)
+        return cls(box, [s["text"] for s in spans], tol)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def spans_of(self, i: int) -> List[Dict]:
+        """Line i as span-like {"text", "bbox"} dicts, left to right."""
+        return [{"text": self.text[j], "bbox": tuple(self.box[j].tolist())}
+                for j in self.order[self.starts[i]:self.ends[i]].tolist()]
+
+    @property
+    def texts(self) -> List[str]:
+        """Each line's pieces joined with single spaces, left to right."""
+        if self._texts is None:
+            text = [self.text[j] for j in self.order.tolist()]
+            self._texts = [" ".join(text[a:b]) for a, b in zip(self.starts.tolist(),
+                                                              self.ends.tolist())]
+        return self._texts
+
+
+def _find_header(lines: TextLines) -> Optional[int]:
+    """Index of the column header line (topmost match), or None."""
+    for i, text in enumerate(lines.texts):
+        if HEADER_LINE_RE.search(text.strip()):
+            return i
+    return None
+
+
+def _header_columns(ordered) -> Dict[str, float]:
     col_x = {}
-    spans_by_line = {}
-    for s in spans:
-        key = round(s["bbox"][1] / 2.0)
-        spans_by_line.setdefault(key, []).append(s)
-    for _, line_spans in spans_by_line.items():
-        ordered = sorted(line_spans, key=lambda x: x["bbox"][0])
-        line_text = " ".join(ls["text"] for ls in ordered).strip()
-        if HEADER_LINE_RE.search(line_text):
-            for ls in ordered:
-                t = ls["text"].strip().lower()
-                if t == "response":
-                    col_x["response_x"] = ls["bbox"][0]
-                if t == "subtype":
-                    col_x["subtype_x"] = ls["bbox"][0]
-            break
+    for ls in ordered:
+        t = ls["text"].strip().lower()
+        if t == "response":
+            col_x["response_x"] = ls["bbox"][0]
+        if t == "subtype":
+            col_x["subtype_x"] = ls["bbox"][0]
     return col_x
 
 
+def find_header_and_columns(spans):
+    lines = TextLines.from_spans(spans)
+    header = _find_header(lines)
+    return _header_columns(lines.spans_of(header)) if header is not None else {}
+
+
+@lru_cache(maxsize=4096)  # the same few hundred time strings recur on every page
 def _time_to_seconds(s: str) -> int:
     s = s.strip().lower().replace(" ", "")
-    m = re.match(r'^(?P<m>\d+):(?P<s>\d{1,2})$', s)
+    m = _MMSS_RE.match(s)
     if m:
         return int(m.group('m'))*60 + int(m.group('s'))
-    m = re.match(r'^(?:(?P<m>\d+)m)?(?:(?P<s>\d+)s)?$', s)
+    m = _MS_RE.match(s)
     if m and (m.group('m') or m.group('s')):
         return int(m.group('m') or 0)*60 + int(m.group('s') or 0)
     return int(s) if s.isdigit() else 0
 
 
-def parse_rows(page: fitz.Page):
-    spans = span_text_blocks(page)
-    col_x = find_header_and_columns(spans)
-    rows = []
-    for _, line_spans in sorted(group_by_line(spans).items(), key=lambda kv: min(sp["bbox"][0] for sp in kv[1])):
-        ordered = sorted(line_spans, key=lambda s: s["bbox"][0])
-        text_line = coalesce_space(" ".join(sp["text"] for sp in ordered))
-        m = ROW_RE.match(text_line)
-        if not m:
-            continue
-        qnum = int(m.group("qnum"))
-        subtype = m.group("subtype").strip()
-        level = int(m.group("level").strip())               # Difficulty as int
-        total_sec = _time_to_seconds(m.group("time").strip())
-
-        # y-center & qnum right edge
-        y_vals = [(sp["bbox"][1] + sp["bbox"][3]) * 0.5 for sp in ordered]
-        row_y = sum(y_vals)/len(y_vals)
-        qnum_x1 = None
-        for sp in ordered:
-            t = sp["text"].strip()
-            if t == str(qnum) or re.fullmatch(rf"{qnum}\D*", t):
-                qnum_x1 = sp["bbox"][2]
+def _qnum_x1(lines: TextLines, row_lines: List[int], qnums: List[int]) -> List[float]:
+    """
+    Right edge of the first span in each row line that reads as its question number
+    ("12", "12." ...), else of the line's first span. The number is almost always the
+    first span, so only the other lines are scanned further.
+    """
+    starts = lines.starts[row_lines].tolist()
+    ends = lines.ends[row_lines].tolist()
+    order = lines.order.tolist()
+    line_x1 = lines.x1.tolist()
+    x1 = [line_x1[a] for a in starts]
+    for k, (a, b, q) in enumerate(zip(starts, ends, qnums)):
+        want = str(q)
+        for j in range(a, b):
+            t = lines.text[order[j]].strip()
+            if t == want or ((m := _QNUM_TOKEN_RE.fullmatch(t)) is not None
+                             and m.group(1) == want):
+                x1[k] = line_x1[j]
                 break
-        if qnum_x1 is None and ordered:
-            qnum_x1 = ordered[0]["bbox"][2]
-
-        rows.append({
-            "Question": qnum,
-            "Subtype": subtype,
-            "Difficulty": level,
-            "total_time_seconds": total_sec,
-            "row_y_pt": row_y,
-            "qnum_x1": qnum_x1,
-            **col_x
-        })
+    return x1
+
+
+def _rows_from_lines(lines: TextLines, col_x: Dict[str, float]) -> List[Dict]:
+    """Match ROW_RE per line."""
+    row_lines, matches = [], []
+    for i, text in enumerate(lines.texts):
+        # ROW_RE needs a leading question number
+        if not text.lstrip()[:1].isdigit():
+            continue
+        m = ROW_RE.match(coalesce_space(text))
+        if m:
+            row_lines.append(int(i))
+            matches.append(m)
+    if not matches:
+        return []
+
+    fields = [m.group("qnum", "subtype", "level", "time") for m in matches]
+    qnums = [int(f[0]) for f in fields]
+    centers = lines.center[row_lines].tolist()
+    qnum_x1 = _qnum_x1(lines, row_lines, qnums)
+    rows = [{
+        "Question": qnum,
+        "Subtype": subtype.strip(),
+        "Difficulty": int(level),                      # Difficulty as int
+        "total_time_seconds": _time_to_seconds(tm.strip()),
+        "row_y_pt": y,
+        "qnum_x1": x1,
+        **col_x
+    } for qnum, (_, subtype, level, tm), y, x1 in zip(qnums, fields, centers, qnum_x1)]
     return rows
 
+
+def parse_rows(page: fitz.Page, page_text: Optional[PageText] = None):
+    """Question rows on the page."""
+    lines = (page_text or PageText(page)).lines
+    header = _find_header(lines)
+    col_x = _header_columns(lines.spans_of(header)) if header is not None else {}
+    return _rows_from_lines(lines, col_x)
+
 # ---------- raster ✓/✕ + flag ----------
 
 
@@ -221,6 +407,136 @@ def render_page_np(page: fitz.Page, dpi=300):
     return arr, zoom
 
 
+# Largest half-window (px) any detector reads around a row center, plus slack
+# for int() truncation when mapping points to pixels.
+_STRIP_PAD_PX = 26
+# Row bands closer than this (pt) are rendered as one strip.
+_STRIP_MERGE_GAP_PT = 12.0
+
+
+def plan_strip_clips(rows: List[Dict], page_rect: fitz.Rect, zoom: float) -> List[fitz.Rect]:
+    """
+    Union of the clip rectangles (in points) the raster detectors will read:
+    qnum right edge -> Subtype column, one band per row, merged where close.
+    Returns [] when the column positions weren't found (caller renders full page).
+    """
+    if not rows or any("response_x" not in r or "subtype_x" not in r for r in rows):
+        return []
+    pad = _scale_px(_STRIP_PAD_PX, zoom) / zoom
+    lefts = [r["response_x"] for r in rows]
+    rights = [r["subtype_x"] for r in rows]
+    for r in rows:
+        if r.get("qnum_x1") is not None:
+            lefts.append(r["qnum_x1"] + 2)
+            rights.append(r["qnum_x1"] + 10)
+    x0 = min(lefts) - pad
+    x1 = max(rights) + pad
+
+    bands = sorted((r["row_y_pt"] - pad, r["row_y_pt"] + pad) for r in rows)
+    merged = [list(bands[0])]
+    for y0, y1 in bands[1:]:
+        if y0 - merged[-1][1] <= _STRIP_MERGE_GAP_PT:
+            merged[-1][1] = max(merged[-1][1], y1)
+        else:
+            merged.append([y0, y1])
+
+    clips = []
+    for y0, y1 in merged:
+        clip = fitz.Rect(x0, y0, x1, y1) & page_rect
+        if not clip.is_empty:
+            clips.append(clip)
+    return clips
+
+
+class PageRaster:
+    """
+    Per-page raster context: renders once, shared by every raster-based detector.
+
+    With rows carrying column geometry, only the strips the detectors read are
+    rendered (see plan_strip_clips); crops outside them fall back to a full render.
+    Pixel values are identical either way.
+    """
+
+    def __init__(self, page: fitz.Page, dpi=300, rows: Optional[List[Dict]] = None):
+        self.page = page
+        self.dpi = dpi
+        self.zoom = dpi / 72.0
+        irect = (page.rect * fitz.Matrix(self.zoom, self.zoom)).irect
+        self.shape = (irect.height, irect.width)
+        self._arr = None
+        self._strips = None
+        self._clips = plan_strip_clips(rows, page.rect, self.zoom) if rows else []
+
+    def get(self):
+        """Full-page (arr, zoom)."""
+        if self._arr is None:
+            self._arr, _ = render_page_np(self.page, dpi=self.dpi)
+        return self._arr, self.zoom
+
+    def _render_strips(self):
+        self._strips = []
+        if not self._clips:
+            return
+        mat = fitz.Matrix(self.zoom, self.zoom)
+        dl = self.page.get_displaylist()
+        for clip in self._clips:
+            pix = dl.get_pixmap(matrix=mat, clip=clip, alpha=False)
+            arr = np.frombuffer(pix.samples, dtype=np.uint8).reshape(
+                pix.height, pix.width, 3)
+            self._strips.append((pix.x, pix.y, arr))
+
+    def locate(self, y0, y1, x0, x1) -> int:
+        """Index of the rendered strip holding page_np[y0:y1, x0:x1], or -1 (full page)."""
+        if self._arr is None:
+            if self._strips is None:
+                self._render_strips()
+            y1 = min(y1, self.shape[0])
+            for i, (sx, sy, arr) in enumerate(self._strips):
+                if (0 <= x0 and sx <= x0 and x1 <= sx + arr.shape[1]
+                        and sy <= y0 and y1 <= sy + arr.shape[0]):
+                    return i
+        return -1
+
+    def crop(self, y0, y1, x0, x1):
+        """Equivalent of page_np[y0:y1, x0:x1] in full-page pixel coordinates."""
+        i = self.locate(y0, y1, x0, x1)
+        if i >= 0:
+            sx, sy, arr = self._strips[i]
+            return arr[y0 - sy:min(y1, self.shape[0]) - sy, x0 - sx:x1 - sx]
+        page_np, _ = self.get()
+        return page_np[y0:y1, x0:x1]
+
+    def render(self):
+        """Render up front whatever the detectors will read (the strips, else the full page)."""
+        if self._clips:
+            if self._arr is None and self._strips is None:
+                self._render_strips()
+        else:
+            self.get()
+
+    def release(self):
+        self._arr = None
+        self._strips = None
+
+
+# Half-heights (px at 300 DPI) of the bands sampled around each row center,
+# tried smallest first.
+SCORE_HALF_HS = (10, 16, 22)
+FLAG_HALF_HS = (12, 18, 24)
+# Narrowest Response band (px at 300 DPI) worth sampling
+SCORE_MIN_WIDTH_PX = 6
+# A band is flagged when more than this share of its pixels is flag blue-gray
+FLAG_MIN_RATIO = 0.002
+_RASTER_ZOOM = 300 / 72.0  # pixel constants above are for 300 DPI
+
+
+def _scale_px(px: int, zoom: float) -> int:
+    """A 300 DPI pixel constant at another zoom (unchanged at 300 DPI)."""
+    if zoom == _RASTER_ZOOM:
+        return px
+    return max(1, int(round(px * zoom / _RASTER_ZOOM)))
+
+
 def classify_strip_rgb(rgb):
     if rgb is None:
         return 0
@@ -232,20 +548,22 @@ def classify_strip_rgb(rgb):
     return 1 if (g + b) >= (r + 5) else 0
 
 
-def sample_band_color(page_np, zoom, row_y_pt, x_left_pt, x_right_pt):
-    H, W, _ = page_np.shape
+def sample_band_color(raster: PageRaster, row_y_pt, x_left_pt, x_right_pt):
+    H, W = raster.shape
+    zoom = raster.zoom
     y_px = int(row_y_pt * zoom)
     x0 = int(min(x_left_pt, x_right_pt) * zoom)
     x1 = int(max(x_left_pt, x_right_pt) * zoom)
-    for half_h in (10, 16, 22):
+    for half_h in SCORE_HALF_HS:
+        half_h = _scale_px(half_h, zoom)
         y0 = max(0, y_px - half_h)
         y1 = min(H, y_px + half_h)
         w = x1 - x0
-        if w <= 6:
+        if w <= _scale_px(SCORE_MIN_WIDTH_PX, zoom):
             continue
         cx0 = x0 + w//3
         cx1 = x1 - w//3
-        crop = page_np[y0:y1, cx0:cx1]
+        crop = raster.crop(y0, y1, cx0, cx1)
         if crop.size == 0:
             continue
         mask = ~((crop[..., 0] > 245) & (
@@ -256,180 +574,1148 @@ def sample_band_color(page_np, zoom, row_y_pt, x_left_pt, x_right_pt):
     return None
 
 
-def add_scores_via_raster(page: fitz.Page, rows: List[Dict]):
-    page_np, zoom = render_page_np(page, dpi=300)
-    H, W, _ = page_np.shape
+def classify_strip_rgb_batch(rgb: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    """Vectorized classify_strip_rgb over (N, 3) mean colors; rows with valid=False -> 0."""
+    r, g, b = rgb[:, 0], rgb[:, 1], rgb[:, 2]
+    teal = (g >= r + 5) & (b >= r) & (g >= b - 10)
+    orange = (r >= g + 5) & (r >= b + 10)
+    other = (g + b) >= (r + 5)
+    out = np.where(teal, 1, np.where(orange, 0, other.astype(np.int64)))
+    return np.where(valid, out, 0)
+
+
+def score_margin_batch(rgb: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    """
+    Confidence of classify_strip_rgb_batch per row, in RGB units: the smallest slack
+    among the rules that decided it (teal holds / orange holds and teal fails / the
+    fallback with both failing). 0 for rows without a color.
+    """
+    r, g, b = rgb[:, 0], rgb[:, 1], rgb[:, 2]
+    teal = np.minimum(np.minimum(g - r - 5, b - r), g - b + 10)
+    orange = np.minimum(r - g - 5, r - b - 10)
+    other = np.abs(g + b - r - 5)
+    margin = np.where(teal >= 0, teal,
+                      np.where(orange >= 0, np.minimum(orange, -teal),
+                               np.minimum(np.minimum(-teal, -orange), other)))
+    return np.where(valid, margin, 0.0)
+
+
+def _score_planes(crop):
+    """Non-white mask and the masked RGB channels (sums -> band mean)."""
+    mask = ~((crop[..., 0] > 245) & (crop[..., 1] > 245) & (crop[..., 2] > 245))
+    return [mask] + [np.where(mask, crop[..., c], 0) for c in range(3)]
+
+
+def _flag_planes(crop):
+    """Blue-gray flag mask (uint8 arithmetic, wraparound included, as in the scalar path)."""
+    rch, gch, bch = crop[..., 0], crop[..., 1], crop[..., 2]
+    not_white = ~((rch > 245) & (gch > 245) & (bch > 245))
+    not_black = ~((rch < 25) & (gch < 25) & (bch < 25))
+    bluish = (bch - rch >= 20) & (gch - rch >= 10)
+    midtone = (rch + gch + bch >= 150)
+    return [not_white & not_black & bluish & midtone]
+
+
+# Above this many distinct column ranges per strip, use a 2-D summed-area table
+_MAX_COLUMN_GROUPS = 8
+
+
+def _box_sums(raster: PageRaster, planes_fn, y0, y1, x0, x1) -> np.ndarray:
+    """
+    Sums of planes_fn(pixels) over K boxes [y0:y1, x0:x1] (page pixels, non-empty,
+    non-negative) from prefix sums, so nested windows cost O(1) each.
+
+    Boxes are grouped by the rendered strip holding them. Per group, only pixel
+    rows covered by some box are gathered and classified (once), then each
+    distinct column range gets a 1-D prefix over those rows.
+    Returns (P, K) int64.
+    """
+    K = len(y0)
+    out = None
+    where = np.array([raster.locate(int(y0[k]), int(y1[k]), int(x0[k]), int(x1[k]))
+                      for k in range(K)])
+    for strip in np.unique(where):
+        idx = np.nonzero(where == strip)[0]
+        ry0, ry1 = int(y0[idx].min()), int(y1[idx].max())
+        rx0, rx1 = int(x0[idx].min()), int(x1[idx].max())
+        ly0, ly1 = y0[idx] - ry0, y1[idx] - ry0
+        lx0, lx1 = x0[idx] - rx0, x1[idx] - rx0
+
+        # Compact to the pixel rows any box touches; cov[y] maps a local row
+        # boundary to its compacted index.
+        edges = np.zeros(ry1 - ry0 + 1, dtype=np.int64)
+        np.add.at(edges, ly0, 1)
+        np.add.at(edges, ly1, -1)
+        covered = np.cumsum(edges[:-1]) > 0
+        cov = np.zeros(ry1 - ry0 + 1, dtype=np.int64)
+        np.cumsum(covered, out=cov[1:])
+        planes = planes_fn(raster.crop(ry0, ry1, rx0, rx1)[covered])
+        if out is None:
+            out = np.zeros((len(planes), K), dtype=np.int64)
+        cy0, cy1 = cov[ly0], cov[ly1]
+
+        groups: Dict[Tuple[int, int], List[int]] = {}
+        for j, xr in enumerate(zip(lx0.tolist(), lx1.tolist())):
+            groups.setdefault(xr, []).append(j)
+        for p, plane in enumerate(planes):
+            if len(groups) <= _MAX_COLUMN_GROUPS:
+                for (gx0, gx1), js in groups.items():
+                    col = np.zeros(plane.shape[0] + 1, dtype=np.int64)
+                    np.cumsum(plane[:, gx0:gx1].sum(axis=1, dtype=np.int64), out=col[1:])
+                    out[p, idx[js]] = col[cy1[js]] - col[cy0[js]]
+            else:
+                sat = np.zeros((plane.shape[0] + 1, plane.shape[1] + 1), dtype=np.int64)
+                np.cumsum(np.cumsum(plane, axis=0, dtype=np.int64), axis=1, out=sat[1:, 1:])
+                out[p, idx] = sat[cy1, lx1] - sat[cy0, lx1] - sat[cy1, lx0] + sat[cy0, lx0]
+    return out if out is not None else np.zeros((0, 0), dtype=np.int64)
+
+
+def _window_boxes(y_px, x0, x1, half_hs, H, W):
+    """
+    Per (row, half_h) crop boxes with page_np[y0:y1, x0:x1] slicing semantics.
+    Returns (y0, y1, x0, x1, nonempty), each shaped (N, len(half_hs)).
+    """
+    hh = np.asarray(half_hs)[None, :]
+    by0 = np.maximum(0, y_px[:, None] - hh)
+    by1 = np.minimum(H, y_px[:, None] + hh)
+    bx0 = np.broadcast_to(np.minimum(x0, W)[:, None], by0.shape)
+    bx1 = np.broadcast_to(np.minimum(x1, W)[:, None], by0.shape)
+    nonempty = (by1 > by0) & (bx1 > bx0)
+    return by0, by1, bx0, bx1, nonempty
+
+
+def add_scores_via_raster(page: fitz.Page, rows: List[Dict],
+                          raster: Optional[PageRaster] = None):
+    raster = raster or PageRaster(page, rows=rows)
+    if not rows:
+        return
+    H, W = raster.shape
+    zoom = raster.zoom
     default_x0 = int(0.35 * (W/zoom))
     default_x1 = int(0.55 * (W/zoom))
-    for r in rows:
-        left = r.get("response_x", default_x0)
-        right = r.get("subtype_x",  default_x1)
-        r["question_score"] = int(classify_strip_rgb(
-            sample_band_color(page_np, zoom, r["row_y_pt"], left, right)))
+    half_hs = tuple(_scale_px(h, zoom) for h in SCORE_HALF_HS)
+
+    y_px = np.array([int(r["row_y_pt"] * zoom) for r in rows], dtype=np.int64)
+    lr = [(r.get("response_x", default_x0), r.get("subtype_x", default_x1)) for r in rows]
+    x0 = np.array([int(min(a, b) * zoom) for a, b in lr], dtype=np.int64)
+    x1 = np.array([int(max(a, b) * zoom) for a, b in lr], dtype=np.int64)
+    w = x1 - x0
+    cx0 = x0 + w // 3
+    cx1 = x1 - w // 3
+    # Negative slice bounds would wrap in numpy; keep those rows on the scalar path
+    wide = w > _scale_px(SCORE_MIN_WIDTH_PX, zoom)
+    scalar = wide & ((cx0 < 0) | (y_px + half_hs[0] < 0))
+
+    by0, by1, bx0, bx1, ok = _window_boxes(y_px, cx0, cx1, half_hs, H, W)
+    ok &= (wide & ~scalar)[:, None]
+    ri, wi = np.nonzero(ok)
+    count = np.zeros(ok.shape, dtype=np.int64)
+    sums = np.zeros(ok.shape + (3,), dtype=np.int64)
+    if len(ri):
+        stats = _box_sums(raster, _score_planes,
+                          by0[ri, wi], by1[ri, wi], bx0[ri, wi], bx1[ri, wi])
+        count[ri, wi] = stats[0]
+        sums[ri, wi] = stats[1:].T
+
+    # First window (smallest half_h) with any non-white pixel wins
+    hit = count > 0
+    first = np.argmax(hit, axis=1)
+    valid = hit.any(axis=1)
+    n = np.arange(len(rows))
+    rgb = sums[n, first] / np.maximum(count[n, first], 1)[:, None]
+    scores = classify_strip_rgb_batch(rgb, valid)
+    margins = score_margin_batch(rgb, valid)
+
+    for i, r in enumerate(rows):
+        if scalar[i]:
+            left, right = lr[i]
+            r["question_score"] = int(classify_strip_rgb(
+                sample_band_color(raster, r["row_y_pt"], left, right)))
+            r["score_margin"] = None  # not measured; RenderLadder escalates it
+        else:
+            r["question_score"] = int(scores[i])
+            r["score_margin"] = float(margins[i])
+
+
+def _flag_found(raster: PageRaster, y_px: int, x0: int, x1: int) -> bool:
+    """Scalar flag test for one row (reference path)."""
+    H, _ = raster.shape
+    for half_h in FLAG_HALF_HS:
+        half_h = _scale_px(half_h, raster.zoom)
+        y0 = max(0, y_px - half_h)
+        y1 = min(H, y_px + half_h)
+        crop = raster.crop(y0, y1, x0, x1)
+        if crop.size == 0:
+            continue
+        mask = _flag_planes(crop)[0]
+        ratio = float(mask.sum()) / float(crop.shape[0]*crop.shape[1])
+        if ratio > FLAG_MIN_RATIO:
+            return True
+    return False
 
 
-def add_flags_via_raster(page: fitz.Page, rows: List[Dict]):
-    """Detect the blue-gray flag immediately to the right of question number and left of Response."""
-    page_np, zoom = render_page_np(page, dpi=300)
-    H, W, _ = page_np.shape
+def add_flags_via_raster(page: fitz.Page, rows: List[Dict],
+                         raster: Optional[PageRaster] = None):
+    """
+    Detect the blue-gray flag immediately to the right of question number and left of Response.
+    Also records each row's largest flag-pixel ratio ("flag_ratio") for RenderLadder.
+    """
+    raster = raster or PageRaster(page, rows=rows)
+    H, W = raster.shape
+    zoom = raster.zoom
     # fallback if we didn't find the column
     default_resp = int(0.30 * (W/zoom))
 
-    for r in rows:
+    idx, y_px, x0, x1 = [], [], [], []
+    for i, r in enumerate(rows):
         qx1 = r.get("qnum_x1", None)
         rx = r.get("response_x", default_resp)
+        r["Flagged"] = "FALSE"
+        r["flag_ratio"] = 0.0
         if qx1 is None:
-            r["Flagged"] = "FALSE"
             continue
         left_pt = qx1 + 2
         right_pt = rx - 2
         if right_pt <= left_pt:
             right_pt = left_pt + 8
+        idx.append(i)
+        y_px.append(int(r["row_y_pt"] * zoom))
+        x0.append(int(left_pt * zoom))
+        x1.append(int(right_pt * zoom))
+    if not idx:
+        return
+
+    y_px = np.array(y_px, dtype=np.int64)
+    x0 = np.array(x0, dtype=np.int64)
+    x1 = np.array(x1, dtype=np.int64)
+    # Negative slice bounds would wrap in numpy; keep those rows on the scalar path
+    half_hs = tuple(_scale_px(h, zoom) for h in FLAG_HALF_HS)
+    scalar = (x0 < 0) | (y_px + half_hs[0] < 0)
+
+    by0, by1, bx0, bx1, ok = _window_boxes(y_px, x0, x1, half_hs, H, W)
+    ok &= ~scalar[:, None]
+    ri, wi = np.nonzero(ok)
+    ratios = np.zeros(ok.shape, dtype=np.float64)
+    if len(ri):
+        hits = _box_sums(raster, _flag_planes,
+                         by0[ri, wi], by1[ri, wi], bx0[ri, wi], bx1[ri, wi])[0]
+        area = (by1[ri, wi] - by0[ri, wi]) * (bx1[ri, wi] - bx0[ri, wi])
+        ratios[ri, wi] = hits.astype(np.float64) / area.astype(np.float64)
+    flagged = (ratios > FLAG_MIN_RATIO).any(axis=1)
+    best = ratios.max(axis=1)
+
+    for j, i in enumerate(idx):
+        if scalar[j]:
+            flagged[j] = _flag_found(raster, int(y_px[j]), int(x0[j]), int(x1[j]))
+            rows[i]["flag_ratio"] = None  # not measured; RenderLadder escalates it
+        else:
+            rows[i]["flag_ratio"] = float(best[j])
+        rows[i]["Flagged"] = "TRUE" if flagged[j] else "FALSE"
+
+
+# ---------- vector ✓/✕ + flag ----------
+
+
+def _fill_rgb255(drawing) -> Optional[Tuple[float, float, float]]:
+    """Fill color of a get_drawings() path as 0..255 RGB, composited over white."""
+    fill = drawing.get("fill")
+    if not fill or len(fill) != 3:
+        return None
+    op = drawing.get("fill_opacity")
+    op = 1.0 if op is None else op
+    return tuple(255.0 * (op * c + (1.0 - op)) for c in fill)
+
+
+def _is_flag_rgb(rgb) -> bool:
+    r, g, b = rgb
+    not_white = not (r > 245 and g > 245 and b > 245)
+    not_black = not (r < 25 and g < 25 and b < 25)
+    return not_white and not_black and (b - r >= 20) and (g - r >= 10) and (r + g + b >= 150)
+
+
+def _overlap_area(a, b) -> float:
+    """Intersection area of two (x0, y0, x1, y1) tuples."""
+    w = min(a[2], b[2]) - max(a[0], b[0])
+    h = min(a[3], b[3]) - max(a[1], b[1])
+    return w * h if w > 0 and h > 0 else 0.0
+
+
+def add_marks_via_vector(page: fitz.Page, rows: List[Dict], drawings=None) -> bool:
+    """
+    Score + flag detection from the page's vector fills (no rendering).
+
+    Uses the same windows as the raster path, in points: the score color is the
+    area-weighted mean of non-white fills over the middle third of the Response
+    column; a row is flagged when blue-gray fills cover > 0.2% of a flag window.
+
+    Returns False, leaving rows untouched, unless every row has a score fill
+    (columns missing, markers drawn as images/glyphs, ...); callers then fall back
+    to the raster detectors.
+    """
+    if not rows or any("response_x" not in r or "subtype_x" not in r for r in rows):
+        return False
+    if drawings is None:
+        drawings = page.get_drawings()
+    fills = []
+    for d in drawings:
+        rgb = _fill_rgb255(d)
+        if rgb is None or d.get("rect") is None:
+            continue
+        if rgb[0] > 245 and rgb[1] > 245 and rgb[2] > 245:
+            continue
+        fills.append((tuple(d["rect"]), rgb))
+    if not fills:
+        return False
+    flag_fills = [rect for rect, rgb in fills if _is_flag_rgb(rgb)]
+
+    score_half = SCORE_HALF_HS[-1] / _RASTER_ZOOM
+    results = []
+    for r in rows:
+        x0 = min(r["response_x"], r["subtype_x"])
+        x1 = max(r["response_x"], r["subtype_x"])
+        w = x1 - x0
+        win = (x0 + w / 3, r["row_y_pt"] - score_half,
+               x1 - w / 3, r["row_y_pt"] + score_half)
+        area = 0.0
+        acc = [0.0, 0.0, 0.0]
+        for rect, rgb in fills:
+            a = _overlap_area(rect, win)
+            if a > 0:
+                area += a
+                for c in range(3):
+                    acc[c] += rgb[c] * a
+        if area <= 0:
+            return False
+        score = int(classify_strip_rgb([c / area for c in acc]))
+
+        flagged = False
+        qx1 = r.get("qnum_x1")
+        if qx1 is not None:
+            left_pt = qx1 + 2
+            right_pt = r["response_x"] - 2
+            if right_pt <= left_pt:
+                right_pt = left_pt + 8
+            for half_h in FLAG_HALF_HS:
+                hh = half_h / _RASTER_ZOOM
+                fwin = (left_pt, r["row_y_pt"] - hh, right_pt, r["row_y_pt"] + hh)
+                hit = sum(_overlap_area(rect, fwin) for rect in flag_fills)
+                if hit / ((right_pt - left_pt) * 2 * hh) > FLAG_MIN_RATIO:
+                    flagged = True
+                    break
+        results.append((score, flagged))
+
+    for r, (score, flagged) in zip(rows, results):
+        r["question_score"] = score
+        r["Flagged"] = "TRUE" if flagged else "FALSE"
+    return True
+
+
+# Raster-based detectors run by process_pdf, in order. Each takes
+# (page, rows, raster=PageRaster) and annotates rows in place.
+RASTER_DETECTORS = [add_scores_via_raster, add_flags_via_raster]
+
+# ---------- stage timing ----------
+
+class StageTimings:
+    """
+    Wall time per pipeline stage (seconds) plus a few counters for one PDF.
+
+    Stages: open, meta, text, parse, vector, render, classify, escalate, csv. With
+    page_workers the per-page stages are summed over the workers.
+    Counts: pages, rows, and with a multi-DPI RenderLadder raster_rows and
+    escalated_rows (rows re-rendered at a higher DPI).
+    enabled=False keeps the counters but skips every clock.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.stages: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - t0
+
+    def count(self, name: str, n: int = 1):
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    def merge(self, stats: Dict):
+        """Add another StageTimings' as_dict() (e.g. from a page worker)."""
+        for name, secs in stats.get("stages", {}).items():
+            self.stages[name] = self.stages.get(name, 0.0) + secs
+        for name, n in stats.items():
+            if name != "stages":
+                self.count(name, n)
+
+    def as_dict(self) -> Dict:
+        return {"stages": dict(self.stages), **self.counts}
+
+
+_NO_STAGE = nullcontext()
+
+
+def _stage(timings: Optional[StageTimings], name: str):
+    """timings.stage(name), or a shared no-op when timing is off."""
+    if timings is None or not timings.enabled:
+        return _NO_STAGE
+    return timings.stage(name)
+
+
+# ---------- memory ----------
+
+# Peak-memory model behind estimate_peak_bytes(), fit to measured VmHWM deltas:
+# a rendered RGB buffer is held about twice at its peak (the pixmap plus the
+# samples copy NumPy wraps, then the detectors' masks), clipped strips run from
+# the Response column to Subtype (~125 pt wide on the vendor layout), and text
+# extraction, display lists etc. add a small constant.
+_RASTER_COPIES = 2.3
+_STRIP_WIDTH_PT = 140.0
+_BASE_BYTES = 4 << 20
+
+
+def estimate_peak_bytes(source: Union[str, bytes, fitz.Document],
+                        clip_render: bool = True,
+                        page_workers: int = 0,
+                        ladder: Optional[RenderLadder] = None) -> int:
+    """
+    Predicted peak memory (bytes) extract_table() adds on top of the process it runs
+    in, from the page count and page sizes alone (no page content is loaded).
+
+    Pages are rendered one at a time, so the largest page sets the peak: a full-page
+    raster at the ladder's first DPI, or with clip_render a page-high strip, and for
+    a multi-DPI ladder also the strips re-rendered at each higher rung. With
+    page_workers > 1, up to that many page processes each hold one page at once;
+    they are already running (page_pool()), so their own baseline is not included.
+    The source PDF itself is not included.
+    """
+    doc = source if isinstance(source, fitz.Document) else open_pdf(source)
+    try:
+        n_pages = doc.page_count
+        # Cropbox area and longest side don't depend on /Rotate
+        boxes = [doc.page_cropbox(i) for i in range(n_pages)]
+    finally:
+        if doc is not source:
+            doc.close()
+    if not boxes:
+        return _BASE_BYTES
+    area_pt = max(b.width * b.height for b in boxes)
+    side_pt = max(max(b.width, b.height) for b in boxes)
+    dpis = (ladder or DEFAULT_LADDER).dpis
+
+    def raster_bytes(dpi: int, full: bool) -> float:
+        px_per_pt = dpi / 72.0
+        pt2 = area_pt if full else side_pt * _STRIP_WIDTH_PT
+        return _RASTER_COPIES * 3 * pt2 * px_per_pt * px_per_pt
+
+    page_bytes = max([raster_bytes(dpis[0], not clip_render)] +
+                     [raster_bytes(dpi, False) for dpi in dpis[1:]]) + _BASE_BYTES
+    if page_workers > 1 and n_pages > 1:
+        return int(min(page_workers, n_pages) * page_bytes)
+    return int(page_bytes)
+
+
+def _proc_status_bytes(field: str) -> Optional[int]:
+    """A "kB" field of /proc/self/status (VmRSS, VmHWM) in bytes; None off Linux."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+class RssWatermark:
+    """
+    Peak resident memory of this process over a span, for checking
+    estimate_peak_bytes(): resets the kernel's high-water mark (VmHWM) on creation.
+    as_dict() gives {"rss_start_bytes", "peak_rss_bytes"}, or {} where the mark
+    can't be reset (non-Linux), since a lifetime peak says nothing about one job.
+    Processes started meanwhile (page_workers) are not included.
+    """
+
+    def __init__(self):
+        try:
+            with open("/proc/self/clear_refs", "w") as f:
+                f.write("5")
+            self.start = _proc_status_bytes("VmRSS")
+        except OSError:
+            self.start = None
+
+    def as_dict(self) -> Dict:
+        peak = _proc_status_bytes("VmHWM") if self.start is not None else None
+        if peak is None:
+            return {}
+        return {"rss_start_bytes": self.start, "peak_rss_bytes": peak}
 
-        y_px = int(r["row_y_pt"] * zoom)
-        x0 = int(left_pt * zoom)
-        x1 = int(right_pt * zoom)
-        found = False
-        for half_h in (12, 18, 24):
-            y0 = max(0, y_px - half_h)
-            y1 = min(H, y_px + half_h)
-            crop = page_np[y0:y1, x0:x1]
-            if crop.size == 0:
-                continue
-            rch, gch, bch = crop[..., 0], crop[..., 1], crop[..., 2]
-            not_white = ~((rch > 245) & (gch > 245) & (bch > 245))
-            not_black = ~((rch < 25) & (gch < 25) & (bch < 25))
-            bluish = (bch - rch >= 20) & (gch - rch >= 10)
-            midtone = (rch + gch + bch >= 150)
-            mask = not_white & not_black & bluish & midtone
-            ratio = float(mask.sum()) / float(crop.shape[0]*crop.shape[1])
-            if ratio > 0.002:
-                found = True
-                break
-        r["Flagged"] = "TRUE" if found else "FALSE"
 
 # ---------- main pipeline ----------
 
+MERGED_FIELDS = [
+    "exam_number",
+    "Section",
+    "Question",
+    "Subtype",
+    "Difficulty",
+    "total_time_seconds",
+    "question_score",
+    "Flagged",
+    "experimental_section",
+]
+META_FIELDS = ["exam_number", "exam_date", "scaled_score"]
+
+
+class RowTable:
+    """
+    Merged rows held column-major: the integer fields in one (n, 5) int32 array,
+    Flagged/experimental_section in an (n, 2) bool array, and exam_number/Subtype
+    as (n, 2) int32 codes into one list of distinct strings (labels). About 30 bytes
+    per row instead of a dict each, cheap to pickle between processes, ordered with
+    one np.lexsort, and each distinct string is CSV-formatted once.
+
+    to_rows(), to_columns() and to_csv() give the same values as the row-dict
+    pipeline: ints as int, flags as "TRUE"/"FALSE", fields in MERGED_FIELDS order.
+    """
+
+    INT_FIELDS = ("Section", "Question", "Difficulty", "total_time_seconds", "question_score")
+    FLAG_FIELDS = ("Flagged", "experimental_section")
+    LABEL_FIELDS = ("exam_number", "Subtype")
+
+    __slots__ = ("labels", "codes", "ints", "flags")
+
+    def __init__(self, labels: List[str], codes: np.ndarray, ints: np.ndarray,
+                 flags: np.ndarray):
+        self.labels = labels
+        self.codes = codes
+        self.ints = ints
+        self.flags = flags
+
+    @classmethod
+    def empty(cls) -> "RowTable":
+        return cls([], np.empty((0, len(cls.LABEL_FIELDS)), dtype=np.int32),
+                   np.empty((0, len(cls.INT_FIELDS)), dtype=np.int32),
+                   np.empty((0, len(cls.FLAG_FIELDS)), dtype=bool))
+
+    @classmethod
+    def from_page(cls, rows: List[Dict], section_meta: Dict[int, Dict]) -> "RowTable":
+        """One page's scored rows, repeated for every section header on the page
+        (exam_number blank until with_exam_number())."""
+        n, k = len(rows), len(section_meta)
+        if not n or not k:
+            return cls.empty()
+        labels = {"": 0}
+        flat: List[int] = []
+        for r in rows:
+            flat += (0, r["Question"], r["Difficulty"], r["total_time_seconds"],
+                     r.get("question_score", 0))
+        ints = np.array(flat, dtype=np.int32).reshape(n, len(cls.INT_FIELDS))
+        codes = np.zeros((n, len(cls.LABEL_FIELDS)), dtype=np.int32)
+        codes[:, 1] = [labels.setdefault(r["Subtype"], len(labels)) for r in rows]
+        flags = np.empty((n, len(cls.FLAG_FIELDS)), dtype=bool)
+        flags[:, 0] = [r.get("Flagged", "FALSE") == "TRUE" for r in rows]
+        if k > 1:
+            ints, codes, flags = np.tile(ints, (k, 1)), np.tile(codes, (k, 1)), np.tile(flags, (k, 1))
+        ints[:, 0] = np.repeat(list(section_meta), n)
+        flags[:, 1] = np.repeat([bool(info["experimental"]) for info in section_meta.values()], n)
+        return cls(list(labels), codes, ints, flags)
+
+    @classmethod
+    def concat(cls, tables: Sequence["RowTable"]) -> "RowTable":
+        tables = [t for t in tables if len(t)]
+        if not tables:
+            return cls.empty()
+        if len(tables) == 1:
+            return tables[0]
+        # Merge the label lists, renumbering each table's codes into the union
+        merged: Dict[str, int] = {}
+        codes = []
+        for t in tables:
+            remap = np.array([merged.setdefault(label, len(merged)) for label in t.labels],
+                             dtype=np.int32)
+            codes.append(remap[t.codes])
+        return cls(list(merged), np.concatenate(codes),
+                   np.concatenate([t.ints for t in tables]),
+                   np.concatenate([t.flags for t in tables]))
+
+    def __len__(self) -> int:
+        return len(self.ints)
+
+    def take(self, index) -> "RowTable":
+        """Rows by integer index array or boolean mask (labels are shared, not pruned)."""
+        return RowTable(self.labels, self.codes[index], self.ints[index], self.flags[index])
+
+    def with_exam_number(self, exam_number: Optional[str]) -> "RowTable":
+        exam_number = exam_number or ""
+        labels = self.labels
+        if exam_number not in labels:
+            labels = labels + [exam_number]
+        codes = self.codes.copy()
+        codes[:, 0] = labels.index(exam_number)
+        return RowTable(labels, codes, self.ints, self.flags)
+
+    @property
+    def sections(self) -> np.ndarray:
+        return self.ints[:, 0]
+
+    def sorted(self) -> "RowTable":
+        """Ordered by (Section, Question); lexsort is stable, so ties keep their order."""
+        order = np.lexsort((self.ints[:, 1], self.ints[:, 0]))
+        # Pages usually parse in order already
+        if (order[1:] > order[:-1]).all():
+            return self
+        return self.take(order)
+
+    def _columns(self, ints_fn, flags_fn, labels: np.ndarray) -> Dict[str, List]:
+        columns = {f: labels[col].tolist() for f, col in zip(self.LABEL_FIELDS, self.codes.T)}
+        columns.update((f, ints_fn(col)) for f, col in zip(self.INT_FIELDS, self.ints.T))
+        columns.update((f, flags_fn(col)) for f, col in zip(self.FLAG_FIELDS, self.flags.T))
+        return {f: columns[f] for f in MERGED_FIELDS}
+
+    def to_columns(self) -> Dict[str, List]:
+        """{field: [values]} in MERGED_FIELDS order, like to_columns(rows, MERGED_FIELDS)."""
+        labels = np.array(self.labels, dtype=object)
+        return self._columns(lambda col: col.tolist(),
+                             lambda col: np.where(col, "TRUE", "FALSE").tolist(), labels)
+
+    def to_rows(self) -> List[Dict]:
+        columns = self.to_columns()
+        return [dict(zip(MERGED_FIELDS, values)) for values in zip(*columns.values())]
+
+    def to_csv(self, lineterminator: str = "\r\n", header: bool = True) -> str:
+        """Same text as to_csv(self.to_rows(), MERGED_FIELDS), built a column at a time."""
+        labels = np.array(_csv_cells(self.labels, lineterminator), dtype=object)
+        columns = self._columns(lambda col: list(map(str, col.tolist())),
+                                lambda col: np.where(col, "TRUE", "FALSE").tolist(), labels)
+        lines = map(",".join, zip(*columns.values()))
+        if header:
+            lines = itertools.chain([",".join(MERGED_FIELDS)], lines)
+        return "".join(line + lineterminator for line in lines)
+
+
+def open_pdf(source: Union[str, bytes]) -> fitz.Document:
+    """Open a PDF from a filesystem path or from in-memory bytes."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return fitz.open(stream=source, filetype="pdf")
+    return fitz.open(source)
+
+
+class RenderLadder:
+    """
+    Raster resolutions for the ✓/✕ and flag detectors, lowest first.
+
+    Every row is classified at dpis[0]; rows whose decision was close are
+    re-rendered (clipped to just those rows) and re-classified at each next DPI.
+    Close means a score margin (score_margin_batch) under score_margin RGB units,
+    or a flag-pixel ratio within a factor flag_margin of FLAG_MIN_RATIO. The
+    default single rung, (300,), is the fixed-resolution pipeline.
+    """
+
+    def __init__(self, dpis: Sequence[int] = (300,), score_margin: float = 12.0,
+                 flag_margin: float = 4.0):
+        if not dpis or any(int(d) <= 0 for d in dpis):
+            raise ValueError(f"dpis must be positive, got {dpis!r}")
+        self.dpis = tuple(int(d) for d in dpis)
+        self.score_margin = float(score_margin)
+        self.flag_margin = float(flag_margin)
+
+    @classmethod
+    def parse(cls, spec: str, **kwargs) -> "RenderLadder":
+        """From a "100,300" style DPI list (env/CLI)."""
+        return cls([int(d) for d in spec.replace(" ", "").split(",") if d], **kwargs)
+
+    def ambiguous(self, row: Dict) -> bool:
+        margin = row.get("score_margin", 0.0)
+        ratio = row.get("flag_ratio", 0.0)
+        if margin is None or ratio is None:
+            return True
+        return (margin < self.score_margin or
+                FLAG_MIN_RATIO / self.flag_margin < ratio < FLAG_MIN_RATIO * self.flag_margin)
+
+    def __repr__(self):
+        return (f"RenderLadder({self.dpis}, score_margin={self.score_margin}, "
+                f"flag_margin={self.flag_margin})")
+
+
+DEFAULT_LADDER = RenderLadder()
+
+
+def _escalate(page: fitz.Page, rows: List[Dict], ladder: RenderLadder,
+              timings: Optional[StageTimings]):
+    """Re-classify the ambiguous rows at each higher rung of the ladder."""
+    if timings is not None:
+        timings.count("raster_rows", len(rows))
+    todo = rows
+    for rung, dpi in enumerate(ladder.dpis[1:]):
+        todo = [r for r in todo if ladder.ambiguous(r)]
+        if not todo:
+            break
+        if rung == 0 and timings is not None:
+            timings.count("escalated_rows", len(todo))
+        with _stage(timings, "escalate"):
+            raster = PageRaster(page, dpi=dpi, rows=todo)
+            raster.render()
+            for detector in RASTER_DETECTORS:
+                detector(page, todo, raster=raster)
+            raster.release()
+
+
+def process_page(page: fitz.Page, clip_render: bool = True,
+                 page_text: Optional[PageText] = None,
+                 vector_detect: bool = False,
+                 timings: Optional[StageTimings] = None,
+                 ladder: Optional[RenderLadder] = None) -> RowTable:
+    """
+    Parse + score one page; returns its merged rows (unsorted, exam_number blank),
+    empty for non-section pages.
+    vector_detect tries add_marks_via_vector first and rasterizes only if it can't resolve the page.
+    ladder sets the raster DPI(s); None renders at 300 DPI.
+    """
+    with _stage(timings, "text"):
+        pt = page_text or PageText(page)
+        if not pt.has_section():
+            return RowTable.empty()
+
+        # Section meta (incl. experimental marker *)
+        meta = pt.section_meta()
+        if not meta:
+            return RowTable.empty()
+
+    with _stage(timings, "parse"):
+        rows = parse_rows(page, page_text=pt)
+    if not rows:
+        return RowTable.empty()
+
+    resolved = False
+    if vector_detect:
+        with _stage(timings, "vector"):
+            resolved = add_marks_via_vector(page, rows)
+    if not resolved:
+        ladder = ladder or DEFAULT_LADDER
+        # Render once; every raster detector reads the same buffer
+        with _stage(timings, "render"):
+            raster = PageRaster(page, dpi=ladder.dpis[0], rows=rows if clip_render else None)
+            raster.render()
+        with _stage(timings, "classify"):
+            for detector in RASTER_DETECTORS:
+                detector(page, rows, raster=raster)
+        raster.release()
+        if len(ladder.dpis) > 1:
+            _escalate(page, rows, ladder, timings)
+
+    return RowTable.from_page(rows, meta)
+
+
+# This process's page_workers executor: started (and warmed) once, by warmup() or the
+# first page-parallel PDF, and reused for every later one
+_page_pool = None
+_page_pool_workers = 0
+_page_jobs = itertools.count()
+
+# In a page process: the Document of the job it last served, opened once per job
+_page_doc: Optional[fitz.Document] = None
+_page_doc_job: Optional[int] = None
+
+
+def _init_page_worker():
+    try:
+        warmup()
+    except Exception:
+        pass  # as in a pool worker, a failed warmup only costs the first page its cold start
+
+
+def page_pool(workers: int):
+    """
+    The persistent ProcessPoolExecutor behind page_workers, with at least that many
+    processes, all started before returning. Each one imports the heavy deps and runs
+    warmup() once, instead of a fresh interpreter per PDF.
+    """
+    global _page_pool, _page_pool_workers
+    if _page_pool is None or _page_pool_workers < workers:
+        from concurrent.futures import ProcessPoolExecutor
+        shutdown_page_pool()
+        _page_pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_page_worker)
+        _page_pool_workers = workers
+        for fut in [_page_pool.submit(os.getpid) for _ in range(workers)]:
+            fut.result()
+    return _page_pool
+
+
+def shutdown_page_pool():
+    """Stop the page_workers processes, if any (the next page_pool() starts new ones)."""
+    global _page_pool, _page_pool_workers
+    if _page_pool is not None:
+        _page_pool.shutdown(wait=True, cancel_futures=True)
+    _page_pool, _page_pool_workers = None, 0
+
+
+def _page_document(job: int, path: str) -> fitz.Document:
+    global _page_doc, _page_doc_job
+    if _page_doc_job != job:
+        if _page_doc is not None:
+            _page_doc.close()
+        _page_doc, _page_doc_job = open_pdf(path), job
+    return _page_doc
+
+
+def _process_page_index(args: Tuple[int, str, int, bool, bool, Optional[bool],
+                                    Optional[RenderLadder]]
+                        ) -> Tuple[RowTable, Optional[Dict]]:
+    job, path, idx, clip_render, vector_detect, timed, ladder = args
+    # timed: None = no timings, else StageTimings.enabled
+    timings = StageTimings(enabled=timed) if timed is not None else None
+    table = process_page(_page_document(job, path)[idx], clip_render=clip_render,
+                         vector_detect=vector_detect, timings=timings, ladder=ladder)
+    return table, (timings.as_dict() if timings is not None else None)
+
+
+def _iter_page_rows(doc: fitz.Document, source: Union[str, bytes],
+                    first_text: Optional[PageText], clip_render: bool, page_workers: int,
+                    vector_detect: bool, timings: Optional[StageTimings],
+                    ladder: Optional[RenderLadder]) -> Iterator[RowTable]:
+    """process_page() output for every page, in page order."""
+    n_pages = len(doc)
+    if page_workers > 1 and n_pages > 1:
+        # Page processes open their own Document once per job, from a path: bytes go
+        # through a temp file rather than being pickled with every page. map() keeps
+        # page order.
+        from concurrent.futures.process import BrokenProcessPool
+        timed = timings.enabled if timings is not None else None
+        path, tmp = source, None
+        if not isinstance(source, str):
+            fd, tmp = tempfile.mkstemp(suffix=".pdf")
+            with os.fdopen(fd, "wb") as f:
+                f.write(source)
+            path = tmp
+        job = next(_page_jobs)
+        try:
+            for page_table, page_stats in page_pool(page_workers).map(
+                    _process_page_index,
+                    [(job, path, i, clip_render, vector_detect, timed, ladder)
+                     for i in range(n_pages)]):
+                if page_stats:
+                    timings.merge(page_stats)
+                yield page_table
+        except BrokenProcessPool:
+            # A page process died; the next PDF gets a fresh executor
+            shutdown_page_pool()
+            raise
+        finally:
+            if tmp is not None:
+                os.unlink(tmp)
+    else:
+        for page in doc:
+            if page.number == 0:
+                pt = first_text
+            else:
+                with _stage(timings, "text"):
+                    pt = PageText(page)
+            yield process_page(page, clip_render=clip_render, page_text=pt,
+                               vector_detect=vector_detect, timings=timings, ladder=ladder)
+
+
+def iter_tables(source: Union[str, bytes],
+                original_name_hint: Optional[str] = None,
+                exam_number_override: Optional[str] = None,
+                exam_date_override: Optional[str] = None,
+                clip_render: bool = True,
+                page_workers: int = 0,
+                vector_detect: bool = False,
+                group: str = "page",
+                meta: Optional[Dict] = None,
+                timings: Optional[StageTimings] = None,
+                ladder: Optional[RenderLadder] = None) -> Iterator[RowTable]:
+    """
+    Streaming pipeline: yields batches of finished rows (RowTable) while later
+    pages are still being processed. meta, if given, is filled with the
+    META_FIELDS values before the first batch is yielded.
+
+    Ordering:
+      group="page"     one batch per page that has rows, in page order; each batch
+                       sorted by (Section, Question).
+      group="section"  rows are held until a page without that section arrives (or
+                       the document ends); each batch is one section sorted by
+                       Question, flushed in ascending section order. A section split
+                       across non-adjacent pages arrives in more than one batch.
+    Concatenated batches equal extract_table()'s order whenever sections appear in
+    ascending order with their pages in question order (as in the vendor's exports);
+    only extract_table() guarantees a global sort.
+    """
+    if group not in ("page", "section"):
+        raise ValueError(f"group must be 'page' or 'section', not {group!r}")
+    pdf_path = source if isinstance(source, str) else ""
+    with _stage(timings, "open"):
+        doc = open_pdf(source)
+    try:
+        # Use metadata + original filename hint + stem
+        with _stage(timings, "meta"):
+            exam_number, exam_date = parse_title_fields(
+                pdf_path, doc, hint_name=original_name_hint)
+
+        # Optional overrides from the API
+        if exam_number_override is not None:
+            exam_number = str(exam_number_override)
+        if exam_date_override is not None:
+            exam_date = str(exam_date_override)
+
+        # Scaled score from first page
+        n_pages = len(doc)
+        with _stage(timings, "text"):
+            first_text = PageText(doc[0]) if n_pages else None
+            scaled_score = first_text.scaled_score() if first_text else ""
+        if meta is not None:
+            meta.update({
+                "exam_number": exam_number or "",
+                "exam_date": exam_date or "",
+                "scaled_score": scaled_score or "",
+            })
+        if timings is not None:
+            timings.count("pages", n_pages)
+
+        pending: Dict[int, List[RowTable]] = {}
+        for page_table in _iter_page_rows(doc, source, first_text, clip_render,
+                                          page_workers, vector_detect, timings, ladder):
+            if not len(page_table):
+                continue
+            batch = page_table.with_exam_number(exam_number).sorted()
+            if timings is not None:
+                timings.count("rows", len(batch))
+            if group == "page":
+                yield batch
+                continue
+            sections = np.unique(batch.sections).tolist()
+            for sec in sorted(sec for sec in pending if sec not in sections):
+                yield RowTable.concat(pending.pop(sec)).sorted()
+            for sec in sections:
+                pending.setdefault(sec, []).append(batch.take(batch.sections == sec))
+        for sec in sorted(pending):
+            yield RowTable.concat(pending[sec]).sorted()
+    finally:
+        doc.close()
+
+
+def iter_rows(source: Union[str, bytes],
+              original_name_hint: Optional[str] = None,
+              exam_number_override: Optional[str] = None,
+              exam_date_override: Optional[str] = None,
+              clip_render: bool = True,
+              page_workers: int = 0,
+              vector_detect: bool = False,
+              group: str = "page",
+              meta: Optional[Dict] = None,
+              timings: Optional[StageTimings] = None,
+              ladder: Optional[RenderLadder] = None) -> Iterator[List[Dict]]:
+    """iter_tables() with each batch as row dicts (extract_exam()'s row shape)."""
+    for batch in iter_tables(source, original_name_hint=original_name_hint,
+                             exam_number_override=exam_number_override,
+                             exam_date_override=exam_date_override,
+                             clip_render=clip_render, page_workers=page_workers,
+                             vector_detect=vector_detect, group=group, meta=meta,
+                             timings=timings, ladder=ladder):
+        yield batch.to_rows()
+
+
+def extract_table(source: Union[str, bytes],
+                  original_name_hint: Optional[str] = None,
+                  exam_number_override: Optional[str] = None,
+                  exam_date_override: Optional[str] = None,
+                  clip_render: bool = True,
+                  page_workers: int = 0,
+                  vector_detect: bool = False,
+                  timings: Optional[StageTimings] = None,
+                  ladder: Optional[RenderLadder] = None) -> Tuple[RowTable, Dict]:
+    """
+    Core pipeline, no filesystem output.
+    Returns (table, meta): a RowTable sorted by (Section, Question); meta keyed by
+    META_FIELDS.
+    page_workers > 1 fans pages out to that many processes; output is identical.
+    vector_detect reads ✓/✕/flag fills from the drawing list, rasterizing only
+    pages it can't resolve.
+    timings, when given, collects per-stage wall time and page/row counts.
+    ladder (RenderLadder) enables low-DPI rendering with escalation of close calls.
+    """
+    exam_meta: Dict = {}
+    table = RowTable.concat(list(iter_tables(
+        source,
+        original_name_hint=original_name_hint,
+        exam_number_override=exam_number_override,
+        exam_date_override=exam_date_override,
+        clip_render=clip_render,
+        page_workers=page_workers,
+        vector_detect=vector_detect,
+        meta=exam_meta,
+        timings=timings,
+        ladder=ladder,
+    )))
+    # Batches are sorted per page; the stable lexsort keeps ties in page order
+    return table.sorted(), exam_meta
+
+
+def extract_exam(source: Union[str, bytes],
+                 original_name_hint: Optional[str] = None,
+                 exam_number_override: Optional[str] = None,
+                 exam_date_override: Optional[str] = None,
+                 clip_render: bool = True,
+                 page_workers: int = 0,
+                 vector_detect: bool = False,
+                 timings: Optional[StageTimings] = None,
+                 ladder: Optional[RenderLadder] = None) -> Tuple[List[Dict], Dict]:
+    """extract_table() with the rows as dicts keyed by MERGED_FIELDS."""
+    table, meta = extract_table(
+        source,
+        original_name_hint=original_name_hint,
+        exam_number_override=exam_number_override,
+        exam_date_override=exam_date_override,
+        clip_render=clip_render,
+        page_workers=page_workers,
+        vector_detect=vector_detect,
+        timings=timings,
+        ladder=ladder,
+    )
+    return table.to_rows(), meta
+
+
+def to_csv(rows: List[Dict], fieldnames: List[str], lineterminator: str = "\r\n",
+           header: bool = True) -> str:
+    """Serialize rows to CSV text in memory (header=False: rows only, for streaming)."""
+    return columns_to_csv(to_columns(rows, fieldnames), lineterminator=lineterminator,
+                          header=header)
+
+
+def to_columns(rows: List[Dict], fieldnames: List[str]) -> Dict[str, List]:
+    """Column-major copy of rows: {field: [value per row]}, in fieldnames order."""
+    return {f: [r.get(f, "") for r in rows] for f in fieldnames}
+
+
+def _csv_cells(values: Sequence, lineterminator: str) -> List[str]:
+    """One column's cells exactly as csv.writer formats them; each distinct value once."""
+    types = set(map(type, values))
+    if types == {int}:
+        return list(map(str, values))
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator=lineterminator)
+    cut = len(lineterminator) + 1
+
+    def cell(v) -> str:
+        buf.seek(0)
+        buf.truncate()
+        writer.writerow((v, ""))
+        return buf.getvalue()[:-cut]
+
+    if len(types) > 1:
+        # Mixed types (1 and True) would share a dict key
+        return [cell(v) for v in values]
+    cells = {v: cell(v) for v in set(values)}
+    return list(map(cells.__getitem__, values))
+
+
+def columns_to_csv(columns: Dict[str, List], lineterminator: str = "\r\n",
+                   header: bool = True) -> str:
+    """
+    to_csv() for column-major data; same bytes as to_csv on the equivalent rows.
+    Formats column by column and joins the lines in bulk instead of a writer call per row.
+    """
+    if len(columns) < 2:
+        # csv.writer quotes a lone empty field; keep its exact output
+        buf = io.StringIO()
+        writer = csv.writer(buf, lineterminator=lineterminator)
+        if header:
+            writer.writerow(columns.keys())
+        writer.writerows(zip(*columns.values()))
+        return buf.getvalue()
+    lines = map(",".join, zip(*(_csv_cells(v, lineterminator) for v in columns.values())))
+    if header:
+        lines = itertools.chain([",".join(_csv_cells(list(columns), lineterminator))], lines)
+    return "".join(line + lineterminator for line in lines)
+
 
 def process_pdf(pdf_path: str, out_dir: str = "output_csvs",
                 merged_name: str = "all_sections_clean_scored.csv",
                 exam_meta_name: str = "exam_metadata.csv",
                 original_name_hint: Optional[str] = None,
                 exam_number_override: Optional[str] = None,
-                exam_date_override: Optional[str] = None):
+                exam_date_override: Optional[str] = None,
+                clip_render: bool = True,
+                page_workers: int = 0,
+                vector_detect: bool = False,
+                timings: Optional[StageTimings] = None,
+                ladder: Optional[RenderLadder] = None):
+    """File-writing wrapper around extract_table(); returns the two CSV paths."""
     os.makedirs(out_dir, exist_ok=True)
-    doc = fitz.open(pdf_path)
-
-    # Use metadata + original filename hint + stem
-    exam_number, exam_date = parse_title_fields(
-        pdf_path, doc, hint_name=original_name_hint)
-
-    # Optional overrides from the API
-    if exam_number_override is not None:
-        exam_number = str(exam_number_override)
-    if exam_date_override is not None:
-        exam_date = str(exam_date_override)
-
-    # Scaled score from first page
-    scaled_score = ""
-    if len(doc) > 0:
-        m = SCALED_SCORE_RE.search(doc[0].get_text("text"))
-        if m:
-            scaled_score = m.group(1)
+    table, meta = extract_table(
+        pdf_path,
+        original_name_hint=original_name_hint,
+        exam_number_override=exam_number_override,
+        exam_date_override=exam_date_override,
+        clip_render=clip_render,
+        page_workers=page_workers,
+        vector_detect=vector_detect,
+        timings=timings,
+        ladder=ladder,
+    )
 
-    merged_rows: List[Dict] = []
-    for page in doc:
-        txt = page.get_text("text")
-        if "Section" not in txt:
-            continue
+    with _stage(timings, "csv"):
+        # Write merged (exam_number first)
+        merged_out = os.path.join(out_dir, merged_name)
+        with open(merged_out, "w", newline="", encoding="utf-8") as f:
+            f.write(table.to_csv())
 
-        # Section meta (incl. experimental marker *)
-        meta: Dict[int, Dict] = {}
-        for m in SECTION_HEADER_RE.finditer(txt):
-            n = int(m.group(1))
-            starred = bool(
-                re.search(rf"Section\s+{n}\s*\(\*\)", txt, re.IGNORECASE))
-            meta[n] = {"experimental": starred}
-        if not meta:
-            m = re.search(r"Section\s+(\d+)", txt, re.IGNORECASE)
-            if not m:
-                continue
-            n = int(m.group(1))
-            starred = bool(
-                re.search(rf"Section\s+{n}\s*\(\*\)", txt, re.IGNORECASE))
-            meta = {n: {"experimental": starred}}
+        # Write metadata
+        meta_out = os.path.join(out_dir, exam_meta_name)
+        with open(meta_out, "w", newline="", encoding="utf-8") as f:
+            f.write(to_csv([meta], META_FIELDS))
 
-        rows = parse_rows(page)
-        if not rows:
-            continue
+    return merged_out, meta_out
 
-        add_scores_via_raster(page, rows)
-        add_flags_via_raster(page, rows)
-
-        for sec_num, info in meta.items():
-            for r in rows:
-                merged_rows.append({
-                    "Section": sec_num,
-                    "Question": r["Question"],
-                    "Subtype": r["Subtype"],
-                    "Difficulty": r["Difficulty"],               # int
-                    "total_time_seconds": r["total_time_seconds"],  # int
-                    "question_score": r.get("question_score", 0),
-                    "Flagged": r.get("Flagged", "FALSE"),
-                    "experimental_section": "TRUE" if info["experimental"] else "FALSE",
-                })
 
+def _warmup_pdf() -> bytes:
+    """One page in the report layout: section and column headers, one ✓ row."""
+    doc = fitz.open()
+    page = doc.new_page(width=612, height=792)
+    page.insert_text((40, 60), "Section 1", fontsize=14)
+    for text, x in (("#", 40), ("Response", 80), ("Subtype", 160), ("Difficulty", 330),
+                    ("Total", 400), ("Question", 430), ("Time", 480)):
+        page.insert_text((x, 110), text, fontsize=9)
+    page.draw_rect(fitz.Rect(78, 124, 150, 137), color=None, fill=(0.10, 0.65, 0.60))
+    for text, x in (("1", 40), ("Weaken", 160), ("Level 1", 330), ("1m 5s", 400)):
+        page.insert_text((x, 134), text, fontsize=9)
+    page.insert_text((85, 134), "A", fontsize=9, color=(1, 1, 1))
+    data = doc.tobytes()
     doc.close()
+    return data
 
-    # Clean stray legacy keys
-    for r in merged_rows:
-        r.pop("Exam Number", None)
-        r.pop("exam_number", None)
-        r.pop("Total Question Time", None)
-
-    # Write merged (exam_number first)
-    merged_out = os.path.join(out_dir, merged_name)
-    fieldnames = [
-        "exam_number",
-        "Section",
-        "Question",
-        "Subtype",
-        "Difficulty",
-        "total_time_seconds",
-        "question_score",
-        "Flagged",
-        "experimental_section",
-    ]
-    with open(merged_out, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(
-            f, fieldnames=fieldnames, extrasaction="ignore")
-        writer.writeheader()
-        for r in sorted(merged_rows, key=lambda x: (x["Section"], x["Question"])):
-            writer.writerow({
-                "exam_number": exam_number or "",
-                **r
-            })
-
-    # Write metadata
-    meta_out = os.path.join(out_dir, exam_meta_name)
-    with open(meta_out, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=[
-                                "exam_number", "exam_date", "scaled_score"], extrasaction="ignore")
-        writer.writeheader()
-        writer.writerow({
-            "exam_number": exam_number or "",
-            "exam_date": exam_date or "",
-            "scaled_score": scaled_score or "",
-        })
 
-    return merged_out, meta_out
+def warmup(page_workers: int = 0) -> Dict:
+    """
+    Import the heavy deps and run a one-row synthetic report through extract_table,
+    so a fresh process's first real transform doesn't pay for imports and first-call
+    setup. page_workers > 1 also starts that many warmed page processes (page_pool()).
+    Returns a report:
+    {"imports": IMPORT_SECONDS, "import_s", "run_s", "rows"[, "page_pool_s"]}.
+    """
+    t0 = time.perf_counter()
+    load_deps()
+    t1 = time.perf_counter()
+    table, _ = extract_table(_warmup_pdf(), original_name_hint="warmup.pdf")
+    report = {"imports": dict(IMPORT_SECONDS), "import_s": t1 - t0,
+              "run_s": time.perf_counter() - t1, "rows": len(table)}
+    if page_workers > 1:
+        t2 = time.perf_counter()
+        page_pool(page_workers)
+        report["page_pool_s"] = time.perf_counter() - t2
+    return report
 
 
 # ---------- CLI ----------
 if __name__ == "__main__":
     import argparse
     ap = argparse.ArgumentParser(
-        description="Merge LSAT sections to CSVs (score, flag, cleaned fields).")
+        description="Merge LSAT sections to CSVs (score, flag, cleaned fields).",
+        epilog="For directories or globs of PDFs, use batch_transform.py.")
     ap.add_argument("pdf", help="Path to the PDF")
     ap.add_argument("--out", default="output_csvs", help="Output directory")
     ap.add_argument(
@@ -441,8 +1727,28 @@ if __name__ == "__main__":
     ap.add_argument("--exam_number", default=None, help="Override exam_number")
     ap.add_argument("--exam_date", default=None,
                     help="Override exam_date (YYYY-MM-DD)")
+    ap.add_argument("--full_page_render", action="store_true",
+                    help="Rasterize whole pages instead of just the response/flag strips")
+    ap.add_argument("--page_workers", type=int, default=0,
+                    help="Process pages in this many worker processes (0/1 = serial)")
+    ap.add_argument("--vector_detect", action="store_true",
+                    help="Detect ✓/✕ and flags from vector fills, rasterizing only as a fallback")
+    ap.add_argument("--dpi_ladder", type=int, nargs="+", default=[300],
+                    help="Raster DPIs, lowest first; close calls escalate to the next (e.g. 100 300)")
+    ap.add_argument("--score_margin", type=float, default=DEFAULT_LADDER.score_margin,
+                    help="Escalate ✓/✕ calls closer than this (RGB units)")
+    ap.add_argument("--flag_margin", type=float, default=DEFAULT_LADDER.flag_margin,
+                    help="Escalate flag ratios within this factor of the threshold")
+    ap.add_argument("--timings", action="store_true",
+                    help="Print wall time per pipeline stage")
     args = ap.parse_args()
 
+    # Up front, so the first stage's clock doesn't include the imports
+    load_deps()
+    timings = StageTimings() if args.timings else None
+    ladder = RenderLadder(args.dpi_ladder, score_margin=args.score_margin,
+                          flag_margin=args.flag_margin)
+
     merged_csv, meta_csv = process_pdf(
         args.pdf,
         out_dir=args.out,
@@ -451,8 +1757,21 @@ if __name__ == "__main__":
         original_name_hint=args.original_name_hint,
         exam_number_override=args.exam_number,
         exam_date_override=args.exam_date,
+        clip_render=not args.full_page_render,
+        page_workers=args.page_workers,
+        vector_detect=args.vector_detect,
+        timings=timings,
+        ladder=ladder,
     )
     print("Wrote:\n -", merged_csv, "\n -", meta_csv)
+    if timings is not None:
+        for name, secs in IMPORT_SECONDS.items():
+            print(f"  import {name:<9}{secs * 1000:9.1f} ms")
+        for name, secs in timings.stages.items():
+            print(f"  {name:<9}{secs * 1000:9.1f} ms")
+        if timings.counts.get("raster_rows"):
+            print(f"  escalated {timings.counts.get('escalated_rows', 0)}"
+                  f"/{timings.counts['raster_rows']} rows")
 
 # ==== API adapters (do NOT change parsing logic above) ====
 
@@ -460,56 +1779,132 @@ if __name__ == "__main__":
 def transform_file(pdf_path: str,
                    original_name: Optional[str] = None,
                    exam_number: Optional[str] = None,
-                   exam_date: Optional[str] = None) -> Tuple[str, str]:
+                   exam_date: Optional[str] = None,
+                   page_workers: int = 0,
+                   vector_detect: bool = False,
+                   ladder: Optional[RenderLadder] = None) -> Tuple[str, str]:
     """
-    Runs process_pdf and RETURNS CSV TEXT (not file paths).
+    Runs the pipeline and RETURNS CSV TEXT (not file paths).
     Threads the original filename hint + optional overrides.
     """
-    import tempfile
-    import os
-    import shutil
-    tmp_out = tempfile.mkdtemp(prefix="lsat_transform_")
-    try:
-        merged_csv_path, meta_csv_path = process_pdf(
-            pdf_path,
-            out_dir=tmp_out,
-            merged_name="all_sections_clean_scored.csv",
-            exam_meta_name="exam_metadata.csv",
-            original_name_hint=original_name,
-            exam_number_override=exam_number,
-            exam_date_override=exam_date,
-        )
-        with open(merged_csv_path, "r", encoding="utf-8") as f:
-            merged_csv_text = f.read()
-        with open(meta_csv_path, "r", encoding="utf-8") as f:
-            meta_csv_text = f.read()
-        return merged_csv_text, meta_csv_text
-    finally:
-        try:
-            shutil.rmtree(tmp_out)
-        except Exception:
-            pass
+    return _transform_source(pdf_path, original_name, exam_number, exam_date,
+                             page_workers, vector_detect, ladder=ladder)
 
 
 def transform(pdf_bytes: bytes,
               original_name: Optional[str] = None,
               exam_number: Optional[str] = None,
-              exam_date: Optional[str] = None) -> Tuple[str, str]:
+              exam_date: Optional[str] = None,
+              page_workers: int = 0,
+              vector_detect: bool = False,
+              ladder: Optional[RenderLadder] = None) -> Tuple[str, str]:
     """
-    Bytes entrypoint: write a temp file and delegate to transform_file().
+    Bytes entrypoint: opens the PDF from memory, no temp files.
     """
-    import tempfile
-    import os
-    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tf:
-        tf.write(pdf_bytes)
-        tmp_pdf = tf.name
-    try:
-        return transform_file(tmp_pdf,
-                              original_name=original_name,
-                              exam_number=exam_number,
-                              exam_date=exam_date)
-    finally:
-        try:
-            os.remove(tmp_pdf)
-        except Exception:
-            pass
+    return _transform_source(pdf_bytes, original_name, exam_number, exam_date,
+                             page_workers, vector_detect, ladder=ladder)
+
+
+def transform_with_stats(pdf_bytes: bytes,
+                         original_name: Optional[str] = None,
+                         exam_number: Optional[str] = None,
+                         exam_date: Optional[str] = None,
+                         page_workers: int = 0,
+                         vector_detect: bool = False,
+                         timed: bool = True,
+                         ladder: Optional[RenderLadder] = None) -> Tuple[str, str, Dict]:
+    """
+    transform() plus a stats dict: {"stages": {stage: seconds}, "pages", "rows",
+    "wall_s"} (plus "raster_rows"/"escalated_rows" with a multi-DPI ladder). timed=False leaves "stages" empty and skips the per-stage clocks.
+    """
+    timings = StageTimings(enabled=timed)
+    t0 = time.perf_counter()
+    rows_csv, meta_csv = _transform_source(pdf_bytes, original_name, exam_number, exam_date,
+                                           page_workers, vector_detect, timings=timings,
+                                           ladder=ladder)
+    stats = timings.as_dict()
+    stats["wall_s"] = time.perf_counter() - t0
+    return rows_csv, meta_csv, stats
+
+
+def transform_columns(pdf_bytes: bytes,
+                      original_name: Optional[str] = None,
+                      exam_number: Optional[str] = None,
+                      exam_date: Optional[str] = None,
+                      page_workers: int = 0,
+                      vector_detect: bool = False,
+                      timed: bool = True,
+                      ladder: Optional[RenderLadder] = None) -> Tuple[Dict[str, List], Dict, Dict]:
+    """
+    transform_with_stats() without the CSV step: returns (columns, meta, stats)
+    with columns = {field: [values]} in MERGED_FIELDS order, for callers that
+    encode the result themselves (columnar JSON, Arrow, Parquet, CSV).
+    stats also carries this process's RssWatermark ("rss_start_bytes",
+    "peak_rss_bytes") where it can be measured.
+    """
+    timings = StageTimings(enabled=timed)
+    rss = RssWatermark()
+    t0 = time.perf_counter()
+    table, meta = extract_table(
+        pdf_bytes,
+        original_name_hint=original_name,
+        exam_number_override=exam_number,
+        exam_date_override=exam_date,
+        page_workers=page_workers,
+        vector_detect=vector_detect,
+        timings=timings,
+        ladder=ladder,
+    )
+    columns = table.to_columns()
+    stats = timings.as_dict()
+    stats["wall_s"] = time.perf_counter() - t0
+    stats.update(rss.as_dict())
+    return columns, meta, stats
+
+
+def transform_stream(pdf_bytes: bytes,
+                     original_name: Optional[str] = None,
+                     exam_number: Optional[str] = None,
+                     exam_date: Optional[str] = None,
+                     page_workers: int = 0,
+                     vector_detect: bool = False,
+                     group: str = "page",
+                     ladder: Optional[RenderLadder] = None) -> Iterator[Tuple[str, object]]:
+    """
+    iter_rows() as tagged items for a streaming caller: ("meta", {META_FIELDS})
+    first, then ("rows", [row, ...]) per batch.
+    """
+    meta: Dict = {}
+    rows = iter_rows(pdf_bytes, original_name_hint=original_name,
+                     exam_number_override=exam_number, exam_date_override=exam_date,
+                     page_workers=page_workers, vector_detect=vector_detect,
+                     group=group, meta=meta, ladder=ladder)
+    first = next(rows, None)
+    yield "meta", meta
+    if first is not None:
+        yield "rows", first
+        for batch in rows:
+            yield "rows", batch
+
+
+def _transform_source(source: Union[str, bytes],
+                      original_name: Optional[str],
+                      exam_number: Optional[str],
+                      exam_date: Optional[str],
+                      page_workers: int = 0,
+                      vector_detect: bool = False,
+                      timings: Optional[StageTimings] = None,
+                      ladder: Optional[RenderLadder] = None) -> Tuple[str, str]:
+    table, meta = extract_table(
+        source,
+        original_name_hint=original_name,
+        exam_number_override=exam_number,
+        exam_date_override=exam_date,
+        page_workers=page_workers,
+        vector_detect=vector_detect,
+        timings=timings,
+        ladder=ladder,
+    )
+    with _stage(timings, "csv"):
+        return (table.to_csv(lineterminator="\n"),
+                to_csv([meta], META_FIELDS, lineterminator="\n"))
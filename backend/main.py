@@ -1,12 +1,37 @@
-from typing import Optional
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException
+import time
+
+_IMPORT_START = time.perf_counter()
+
+import asyncio
+import functools
+import hmac
+import io
+import json
+import os
+import zipfile
+import zlib
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, List, Optional, Tuple, Union
+from fastapi import (Depends, FastAPI, File, UploadFile, Form, Header, HTTPException, Query,
+                     Request, Response)
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import RedirectResponse
+from fastapi.responses import PlainTextResponse, RedirectResponse, StreamingResponse
 from pydantic import BaseModel
 import uvicorn
 
 import lsat_transformerWIP as transformer
+from worker_pool import TransformPool, PoolBusy, JobTimeout
+from memory_budget import JobTooLarge, MemoryBudget, OverBudget
+from result_cache import ResultCache, cache_key
+from auth import InvalidToken, verify_token
+from job_store import FINISHED, JobRunner, JobStore
+from question_store import QuestionStore, decode_cursor, encode_cursor
+from upload_guard import BodySizeLimitMiddleware, UploadTooLarge, looks_like_pdf, read_upload
+import metrics as prom
+import response_formats as formats
 
+# Startup report: the transformer's heavy deps load lazily, so this stays small
+APP_IMPORT_SECONDS = time.perf_counter() - _IMPORT_START
 
 ALLOWED_ORIGINS = [
     "http://localhost:5173",
@@ -14,14 +39,195 @@ ALLOWED_ORIGINS = [
     "https://bakar404.github.io/lsat-tracker",
 ]
 
-app = FastAPI(title="LSAT Transformer API", version="0.2.0")
+MAX_PDF_BYTES = 50 * 1024 * 1024
+MAX_PDF_PAGES = int(os.getenv("MAX_PDF_PAGES", "200"))
+# Multipart framing + form fields on top of the PDF itself
+FORM_OVERHEAD_BYTES = 64 * 1024
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "200"))
+BATCH_MAX_BYTES = int(os.getenv("BATCH_MAX_MB", "500")) * 1024 * 1024
+BATCH_BUSY_RETRIES = 5
+
+# Transform pool sizing (env-configurable)
+TRANSFORM_WORKERS = int(os.getenv("TRANSFORM_WORKERS", "0")) or None  # None -> cpu count
+TRANSFORM_QUEUE_SIZE = int(os.getenv("TRANSFORM_QUEUE_SIZE", "8"))
+TRANSFORM_TIMEOUT_SECONDS = float(os.getenv("TRANSFORM_TIMEOUT_SECONDS", "120"))
+TRANSFORM_RETRY_AFTER_SECONDS = int(os.getenv("TRANSFORM_RETRY_AFTER_SECONDS", "5"))
+# >1 splits each PDF's pages across that many extra processes (0 = serial)
+TRANSFORM_PAGE_WORKERS = int(os.getenv("TRANSFORM_PAGE_WORKERS", "0"))
+# Read ✓/✕/flag markers from vector fills, rasterizing only pages that need it
+TRANSFORM_VECTOR_DETECT = os.getenv("TRANSFORM_VECTOR_DETECT", "0") == "1"
+# Raster DPIs, lowest first; only close ✓/✕/flag calls are re-rendered at the next one
+TRANSFORM_DPI_LADDER = transformer.RenderLadder.parse(
+    os.getenv("TRANSFORM_DPI_LADDER", "300"),
+    score_margin=float(os.getenv("TRANSFORM_SCORE_MARGIN", "12")),
+    flag_margin=float(os.getenv("TRANSFORM_FLAG_MARGIN", "4")),
+)
+
+# Global budget (MB) for the transforms' predicted peak memory; 0 = no memory admission.
+# Jobs over it wait up to TRANSFORM_MEMORY_WAIT_SECONDS, then get 503 + Retry-After
+TRANSFORM_MEMORY_BUDGET_MB = int(os.getenv("TRANSFORM_MEMORY_BUDGET_MB", "0"))
+TRANSFORM_MEMORY_WAIT_SECONDS = float(os.getenv("TRANSFORM_MEMORY_WAIT_SECONDS", "30"))
+
+# Result cache (env-configurable); RESULT_CACHE_DIR enables the on-disk tier
+RESULT_CACHE_ENTRIES = int(os.getenv("RESULT_CACHE_ENTRIES", "256"))
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR") or None
+RESULT_CACHE_DISK_MB = int(os.getenv("RESULT_CACHE_DISK_MB", "256"))
+# Bearer token for DELETE /cache; unset = purging over HTTP is disabled
+CACHE_ADMIN_TOKEN = os.getenv("CACHE_ADMIN_TOKEN") or None
+
+# Job store (POST /jobs); finished jobs expire after the TTL
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "jobs.sqlite3")
+JOBS_TTL_SECONDS = float(os.getenv("JOBS_TTL_SECONDS", "86400"))
+JOBS_MAX_FINISHED = int(os.getenv("JOBS_MAX_FINISHED", "1000"))
+JOBS_SWEEP_SECONDS = 60
+
+# Question store (POST/GET /questions): rows upserted on
+# (user_id, exam_number, Section, Question)
+QUESTIONS_DB_PATH = os.getenv("QUESTIONS_DB_PATH", "questions.sqlite3")
+# Verifies the Supabase access token whose `sub` is the caller's user_id;
+# unset = the question store endpoints are disabled
+SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET") or None
+QUESTIONS_PAGE_MAX = 1000
+
+# Each worker runs a tiny synthetic PDF through the pipeline at startup (0 = import only)
+TRANSFORM_WARMUP = os.getenv("TRANSFORM_WARMUP", "1") == "1"
+
+# Per-stage clocks inside the transform (Server-Timing + /metrics histograms)
+TRANSFORM_STAGE_TIMINGS = os.getenv("TRANSFORM_STAGE_TIMINGS", "1") == "1"
+
+pool = TransformPool(
+    workers=TRANSFORM_WORKERS,
+    queue_size=TRANSFORM_QUEUE_SIZE,
+    timeout=TRANSFORM_TIMEOUT_SECONDS,
+    # Also starts each worker's page_workers processes, so no request pays for them
+    warmup=(functools.partial(transformer.warmup, page_workers=TRANSFORM_PAGE_WORKERS)
+            if TRANSFORM_WARMUP else None),
+)
+budget = MemoryBudget(
+    TRANSFORM_MEMORY_BUDGET_MB * 1024 * 1024,
+    max_wait=TRANSFORM_MEMORY_WAIT_SECONDS,
+    max_waiting=TRANSFORM_QUEUE_SIZE,
+)
+cache = ResultCache(
+    max_entries=RESULT_CACHE_ENTRIES,
+    disk_dir=RESULT_CACHE_DIR,
+    disk_max_bytes=RESULT_CACHE_DISK_MB * 1024 * 1024,
+)
+# The job and question stores are opened in lifespan() (app.state.jobs, .runner,
+# .questions), so importing this module doesn't create their SQLite files
+
+metrics = prom.Registry()
+STAGE_SECONDS = metrics.histogram(
+    "lsat_transform_stage_seconds",
+    "Time per transform stage (upload, check, admit, queue and pipeline stages)", ("stage",))
+REQUEST_SECONDS = metrics.histogram(
+    "lsat_transform_request_seconds", "POST /transform handling time, by cache status",
+    ("cache",), buckets=prom.REQUEST_BUCKETS)
+JOBS = metrics.counter("lsat_transform_jobs_total", "Transform jobs by outcome", ("outcome",))
+PAGES = metrics.counter("lsat_transform_pages_total", "PDF pages transformed")
+ROWS = metrics.counter("lsat_transform_rows_total", "Question rows parsed")
+RASTER_ROWS = metrics.counter(
+    "lsat_transform_raster_rows_total", "Rows classified at the ladder's lowest DPI")
+ESCALATED_ROWS = metrics.counter(
+    "lsat_transform_escalated_rows_total", "Rows re-rendered at a higher DPI")
+MEMORY_PREDICTED = metrics.histogram(
+    "lsat_transform_memory_predicted_bytes", "Predicted peak memory per transform",
+    buckets=prom.MEMORY_BUCKETS)
+MEMORY_PEAK = metrics.histogram(
+    "lsat_transform_memory_peak_bytes",
+    "Measured peak RSS growth of the worker per transform", buckets=prom.MEMORY_BUCKETS)
+MEMORY_RATIO = metrics.histogram(
+    "lsat_transform_memory_estimate_ratio", "Measured / predicted peak memory per transform",
+    buckets=(0.25, 0.5, 0.75, 0.9, 1.0, 1.1, 1.25, 1.5, 2.0, 4.0))
+STORED_ROWS = metrics.counter(
+    "lsat_question_store_rows_total", "Uploaded rows by question store outcome", ("change",))
+metrics.sampled("lsat_transform_queue_depth", "Jobs running or waiting for a worker",
+                lambda: pool.pending)
+metrics.sampled("lsat_transform_pool_capacity", "Workers + queue slots",
+                lambda: pool.capacity)
+metrics.sampled("lsat_transform_memory_reserved_bytes",
+                "Predicted memory of the admitted transforms", lambda: budget.in_use)
+metrics.sampled("lsat_transform_memory_waiting", "Transforms waiting for memory",
+                lambda: budget.waiting)
+metrics.sampled("lsat_transform_workers_ready", "Workers done importing and warming up",
+                lambda: pool.ready_workers)
+metrics.sampled(
+    "lsat_startup_seconds",
+    "Startup time: app imports, and the slowest worker's imports and warmup",
+    labelnames=("phase",),
+    fn=lambda: [({"phase": "app_import"}, APP_IMPORT_SECONDS)] + [
+        ({"phase": phase}, max(r.get(key, 0.0) for r in pool.warm_reports))
+        for phase, key in (("worker_import", "import_s"), ("worker_warmup", "warmup_s"))
+        if pool.warm_reports])
+metrics.sampled("lsat_result_cache_events_total", "Result cache events", kind="counter",
+                labelnames=("event",),
+                fn=lambda: [({"event": k}, v) for k, v in sorted(cache.stats.items())])
+metrics.sampled("lsat_result_cache_entries", "Entries in the in-memory result cache",
+                lambda: cache.snapshot()["entries"])
+metrics.sampled("lsat_jobs", "Stored jobs by status", labelnames=("status",),
+                fn=lambda: [({"status": k}, v)
+                            for k, v in sorted(app.state.jobs.counts().items())])
+
+
+async def _sweep_jobs():
+    while True:
+        await asyncio.sleep(JOBS_SWEEP_SECONDS)
+        await asyncio.to_thread(app.state.jobs.purge_expired)
+
 
+async def _resume_jobs():
+    """Restart async jobs a previous process left unfinished; sync ones can't be."""
+    for job in await asyncio.to_thread(app.state.jobs.unfinished):
+        if job["has_pdf"]:
+            app.state.runner.start(job["id"], _job_work(
+                job["id"], None, job["filename"], job["exam_number"], job["exam_date"],
+                bool(job["no_cache"]), retry_busy=True))
+        else:
+            await asyncio.to_thread(app.state.jobs.fail, job["id"],
+                                    "Interrupted by a restart", 500)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.jobs = JobStore(JOBS_DB_PATH, ttl=JOBS_TTL_SECONDS,
+                              max_finished=JOBS_MAX_FINISHED)
+    # Async jobs take at most one pool slot per worker, so they can't starve /transform
+    app.state.runner = JobRunner(app.state.jobs, concurrency=pool.workers)
+    app.state.questions = QuestionStore(QUESTIONS_DB_PATH)
+    pool.start()
+    await _resume_jobs()
+    sweeper = asyncio.ensure_future(_sweep_jobs())
+    try:
+        yield
+    finally:
+        sweeper.cancel()
+        app.state.runner.stop()
+        pool.shutdown()
+
+
+app = FastAPI(title="LSAT Transformer API", version="0.2.0", lifespan=lifespan)
+
+app.add_middleware(prom.RequestTimingMiddleware)
+# Added before CORS so CORS stays outermost and 413s carry its headers
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    limits={
+        "/transform": MAX_PDF_BYTES + FORM_OVERHEAD_BYTES,
+        "/jobs": MAX_PDF_BYTES + FORM_OVERHEAD_BYTES,
+        "/transform/batch": BATCH_MAX_BYTES,
+        "/transform/stream": MAX_PDF_BYTES + FORM_OVERHEAD_BYTES,
+        "/questions": MAX_PDF_BYTES + FORM_OVERHEAD_BYTES,
+    },
+)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=ALLOWED_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Readable from the frontend's fetch()
+    expose_headers=["X-Cache", "X-Cache-Key", "X-Job-Id", "Server-Timing",
+                    "X-Exam-Number", "X-Exam-Date", "X-Scaled-Score"],
 )
 
 
@@ -41,34 +247,735 @@ def healthz():
     return {"ok": True}
 
 
-@app.post("/transform", response_model=TransformResponse)
+@app.get("/readyz")
+def readyz(response: Response):
+    """503 until every transform worker has warmed up; includes the startup report."""
+    ready = pool.ready_workers >= pool.workers
+    if not ready:
+        response.status_code = 503
+    return {"ready": ready, "workers": pool.workers, "ready_workers": pool.ready_workers,
+            "startup": {"app_import_s": APP_IMPORT_SECONDS,
+                        "workers": pool.warm_reports}}
+
+
+def _check_pdf(data) -> Optional[Tuple[int, str]]:
+    """Sniff + open (xref only, no page content). Returns (status, detail) to reject, else None."""
+    if not looks_like_pdf(data):
+        return 400, "File must be a PDF"
+    try:
+        doc = transformer.open_pdf(data)
+    except Exception as e:
+        return 400, f"Invalid PDF: {e}"
+    with doc:
+        if doc.needs_pass:
+            return 400, "PDF is password-protected"
+        if doc.page_count == 0:
+            return 400, "PDF has no pages"
+        if doc.page_count > MAX_PDF_PAGES:
+            return 413, f"PDF has too many pages (max {MAX_PDF_PAGES})"
+        if budget.enabled and _job_bytes(data, doc) > budget.limit:
+            return 413, "PDF needs more memory than the transform budget"
+    return None
+
+
+def _job_bytes(data, doc=None) -> int:
+    """What a transform of data is admitted for: its predicted peak plus the PDF itself."""
+    return len(data) + _predict_bytes(doc if doc is not None else data)
+
+
+def _predict_bytes(source) -> int:
+    return transformer.estimate_peak_bytes(
+        source, page_workers=TRANSFORM_PAGE_WORKERS, ladder=TRANSFORM_DPI_LADDER)
+
+
+def _pool_error(e: Exception) -> HTTPException:
+    """Map a failed pool job to the API's HTTP error, counting the outcome."""
+    if isinstance(e, PoolBusy):
+        JOBS.inc(outcome="busy")
+        return HTTPException(
+            status_code=503, detail="Transformer busy, retry later",
+            headers={"Retry-After": str(TRANSFORM_RETRY_AFTER_SECONDS)})
+    if isinstance(e, OverBudget):
+        JOBS.inc(outcome="over_budget")
+        return HTTPException(
+            status_code=503, detail="Transformer memory budget exhausted, retry later",
+            headers={"Retry-After": str(TRANSFORM_RETRY_AFTER_SECONDS)})
+    if isinstance(e, JobTooLarge):
+        JOBS.inc(outcome="too_large")
+        return HTTPException(
+            status_code=413, detail="PDF needs more memory than the transform budget")
+    if isinstance(e, JobTimeout):
+        JOBS.inc(outcome="timeout")
+        return HTTPException(status_code=504, detail="Transformer timed out")
+    JOBS.inc(outcome="error")
+    return HTTPException(status_code=500, detail=f"Transformer failed: {e}")
+
+
+async def _run_transform(data: bytes, original_name: Optional[str],
+                         exam_number: Optional[str], exam_date: Optional[str],
+                         timing: Optional[Dict[str, float]] = None):
+    """
+    Run one job on the pool; returns the cacheable result {"columns", "meta"}.
+    Records metrics and, if given, fills timing {stage: seconds}.
+    """
+    t0 = time.perf_counter()
+    predicted = await asyncio.to_thread(_predict_bytes, data)
+    try:
+        async with budget.reserve(len(data) + predicted):
+            admitted = time.perf_counter()
+            columns, meta, stats = await pool.submit(
+                transformer.transform_columns,
+                data,
+                original_name=original_name,  # browser filename hint
+                exam_number=exam_number,      # optional override
+                exam_date=exam_date,          # optional override
+                page_workers=TRANSFORM_PAGE_WORKERS,
+                vector_detect=TRANSFORM_VECTOR_DETECT,
+                timed=TRANSFORM_STAGE_TIMINGS,
+                ladder=TRANSFORM_DPI_LADDER,
+            )
+    except Exception as e:
+        raise _pool_error(e)
+
+    # admit: estimating + waiting for memory; queue: waiting for a worker + IPC
+    stages = {"admit": admitted - t0,
+              "queue": max(0.0, time.perf_counter() - admitted - stats["wall_s"]),
+              **stats["stages"]}
+    for stage, secs in stages.items():
+        STAGE_SECONDS.observe(secs, stage=stage)
+    PAGES.inc(stats.get("pages", 0))
+    ROWS.inc(stats.get("rows", 0))
+    RASTER_ROWS.inc(stats.get("raster_rows", 0))
+    ESCALATED_ROWS.inc(stats.get("escalated_rows", 0))
+    MEMORY_PREDICTED.observe(predicted)
+    # The worker's own growth; page_workers' processes aren't in it
+    if "peak_rss_bytes" in stats and TRANSFORM_PAGE_WORKERS <= 1:
+        peak = max(0, stats["peak_rss_bytes"] - stats["rss_start_bytes"])
+        MEMORY_PEAK.observe(peak)
+        MEMORY_RATIO.observe(peak / predicted)
+    if timing is not None:
+        timing.update(stages)
+
+    JOBS.inc(outcome="ok")
+    return {"columns": columns, "meta": meta}
+
+
+def _job_work(job_id: str, data: Optional[bytes], filename: Optional[str],
+              exam_number: Optional[str], exam_date: Optional[str], no_cache: bool,
+              info: Optional[dict] = None, retry_busy: bool = False):
+    """
+    The work behind a job: the cached transform. data=None reads the PDF back from
+    the job store. info, if given, receives "key", "cache" and "timing".
+    retry_busy waits out a full pool (async jobs) instead of failing with 503.
+    """
+    async def work():
+        pdf = (data if data is not None
+               else await asyncio.to_thread(app.state.jobs.load_pdf, job_id))
+        if pdf is None:
+            raise HTTPException(status_code=500, detail="Job input is missing")
+        timing = info.setdefault("timing", {}) if info is not None else None
+        key = cache_key(pdf, filename, exam_number, exam_date)
+        while True:
+            try:
+                result, status = await cache.get_or_compute(
+                    key, lambda: _run_transform(pdf, filename, exam_number, exam_date, timing),
+                    bypass=no_cache)
+                break
+            except HTTPException as e:
+                if not (retry_busy and e.status_code == 503):
+                    raise
+                await asyncio.sleep(TRANSFORM_RETRY_AFTER_SECONDS)
+        if info is not None:
+            info.update(key=key, cache=status)
+        return result
+    return work
+
+
+async def _read_checked_upload(file: UploadFile, start: float) -> Tuple[bytearray, dict]:
+    """Read + validate one PDF upload; returns (data, timing) or raises HTTPException."""
+    try:
+        data = await read_upload(file, MAX_PDF_BYTES)
+    except UploadTooLarge:
+        raise HTTPException(status_code=413, detail="PDF too large")
+    # Includes the multipart parse that ran before the handler
+    timing = {"upload": time.perf_counter() - start}
+    t = time.perf_counter()
+    rejected = await asyncio.to_thread(_check_pdf, data)
+    timing["check"] = time.perf_counter() - t
+    if rejected:
+        raise HTTPException(status_code=rejected[0], detail=rejected[1])
+    return data, timing
+
+
+def _encoded_response(request: Request, fmt: str, result: dict, headers: dict,
+                      timing: Optional[dict] = None) -> Response:
+    """Encode a job result as fmt, compressed per Accept-Encoding."""
+    t = time.perf_counter()
+    if fmt == "csv":
+        rows_csv, meta_csv = formats.csv_pair(result["columns"], result["meta"])
+        # Same bytes FastAPI's JSONResponse would produce for TransformResponse
+        body = json.dumps({"all_sections_csv": rows_csv, "exam_metadata_csv": meta_csv},
+                          ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    else:
+        body = formats.encode(fmt, result["columns"], result["meta"])
+    headers = {**headers, "Vary": "Accept, Accept-Encoding"}
+    encoding = formats.negotiate_encoding(request.headers.get("accept-encoding"))
+    # Parquet pages are already zstd-compressed
+    if encoding and fmt != "parquet" and len(body) >= formats.COMPRESS_MIN_BYTES:
+        body = formats.compress(body, encoding)
+        headers["Content-Encoding"] = encoding
+    if timing is not None:
+        timing["encode"] = time.perf_counter() - t
+        headers["Server-Timing"] = prom.server_timing(timing.items())
+    return Response(content=body, media_type=formats.FORMAT_MEDIA_TYPES[fmt], headers=headers)
+
+
+def _negotiate(request: Request, format: Optional[str]) -> str:
+    try:
+        return formats.negotiate_format(request.headers.get("accept"), format)
+    except formats.NotAcceptable as e:
+        raise HTTPException(status_code=406, detail=str(e))
+
+
+_FORMAT_QUERY = Query(None, description="csv | columns | arrow | parquet (overrides Accept)")
+_FORMAT_RESPONSES = {200: {"content": {m: {} for m in formats.FORMAT_MEDIA_TYPES.values()}}}
+
+
+async def _transform_and_wait(data: bytes, filename: Optional[str], exam_number: Optional[str],
+                              exam_date: Optional[str], no_cache: bool,
+                              info: dict) -> Tuple[str, dict]:
+    """Run a job for an already-checked upload and wait for it; returns (job_id, result)."""
+    job_id = await asyncio.to_thread(app.state.jobs.create, filename, exam_number, exam_date,
+                                     no_cache)
+    task = app.state.runner.start(job_id, _job_work(job_id, data, filename, exam_number,
+                                                    exam_date, no_cache, info=info),
+                                  limited=False)
+    # shield: a disconnecting client must not cancel the job
+    return job_id, await asyncio.shield(task)
+
+
+@app.post("/transform", response_model=TransformResponse, responses=_FORMAT_RESPONSES)
 async def transform_endpoint(
+    request: Request,
     file: UploadFile = File(...),
     exam_number: Optional[str] = Form(None),
     exam_date: Optional[str] = Form(None),
+    no_cache: bool = Form(False),
+    format: Optional[str] = _FORMAT_QUERY,
 ):
-    if file.content_type not in ("application/pdf", "application/octet-stream"):
-        raise HTTPException(status_code=400, detail="File must be a PDF")
+    """
+    Synchronous wrapper around a job: runs it and waits for the result.
+    Default body is TransformResponse (two CSV strings). Accept (or ?format=) selects
+    columnar JSON, Arrow IPC or Parquet instead; Accept-Encoding gzip/zstd compresses.
+    The job (X-Job-Id) keeps its result for GET /jobs/{id} if the client goes away.
+    """
+    start = prom.request_start(request.scope) or time.perf_counter()
+    fmt = _negotiate(request, format)
+    data, timing = await _read_checked_upload(file, start)
+    info = {"timing": timing}
+    job_id, result = await _transform_and_wait(data, file.filename, exam_number, exam_date,
+                                               no_cache, info)
 
-    data = await file.read()
-    if len(data) > 50 * 1024 * 1024:
-        raise HTTPException(status_code=413, detail="PDF too large")
+    status = info["cache"]
+    response = _encoded_response(
+        request, fmt, result,
+        {"X-Cache": status.upper(), "X-Cache-Key": info["key"], "X-Job-Id": job_id},
+        timing)
+    for stage in ("upload", "check", "encode"):
+        STAGE_SECONDS.observe(timing[stage], stage=stage)
+    REQUEST_SECONDS.observe(time.perf_counter() - start, cache=status)
+    return response
+
+
+@app.post("/jobs", status_code=202)
+async def create_job(
+    request: Request,
+    response: Response,
+    file: UploadFile = File(...),
+    exam_number: Optional[str] = Form(None),
+    exam_date: Optional[str] = Form(None),
+    no_cache: bool = Form(False),
+):
+    """Queue a transform and return its id at once; poll GET /jobs/{id}."""
+    start = prom.request_start(request.scope) or time.perf_counter()
+    data, _ = await _read_checked_upload(file, start)
+    job_id = await asyncio.to_thread(app.state.jobs.create, file.filename, exam_number,
+                                     exam_date, no_cache, data)
+    app.state.runner.start(job_id, _job_work(job_id, None, file.filename, exam_number,
+                                             exam_date, no_cache, retry_busy=True))
+    response.headers["Location"] = f"/jobs/{job_id}"
+    return {"id": job_id, "status": "queued", "status_url": f"/jobs/{job_id}",
+            "result_url": f"/jobs/{job_id}/result"}
+
+
+async def _get_job(job_id: str) -> dict:
+    job = await asyncio.to_thread(app.state.jobs.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status; once done, also the two CSVs (as in TransformResponse)."""
+    job = await _get_job(job_id)
+    body = {k: job[k] for k in ("id", "status", "created", "updated", "expires", "filename")}
+    if job["status"] == "failed":
+        body.update(error=job["error"], error_status=job["error_status"])
+    elif job["status"] == "done":
+        rows_csv, meta_csv = formats.csv_pair(job["result"]["columns"], job["result"]["meta"])
+        body.update(all_sections_csv=rows_csv, exam_metadata_csv=meta_csv,
+                    result_url=f"/jobs/{job_id}/result")
+    return body
+
+
+@app.get("/jobs/{job_id}/result", response_model=TransformResponse,
+         responses=_FORMAT_RESPONSES)
+async def get_job_result(request: Request, job_id: str, format: Optional[str] = _FORMAT_QUERY):
+    """A finished job's result, negotiated like POST /transform."""
+    fmt = _negotiate(request, format)
+    job = await _get_job(job_id)
+    if job["status"] == "failed":
+        raise HTTPException(status_code=job["error_status"] or 500, detail=job["error"])
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    return _encoded_response(request, fmt, job["result"], {"X-Job-Id": job_id})
 
+
+@app.delete("/jobs/{job_id}")
+async def delete_job(job_id: str):
+    """Cancel a queued/running job; delete a finished one."""
+    job = await _get_job(job_id)
+    if job["status"] in FINISHED:
+        await asyncio.to_thread(app.state.jobs.delete, job_id)
+        return {"id": job_id, "deleted": True}
+    await app.state.runner.cancel(job_id)
+    return {"id": job_id, "status": "cancelled"}
+
+
+class _BufferFile(io.RawIOBase):
+    """Seekable read-only file over a buffer, without the copy io.BytesIO makes of a
+    bytearray."""
+
+    def __init__(self, data):
+        self._view = memoryview(data).cast("B")
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        chunk = self._view[self._pos:self._pos + len(b)]
+        b[:len(chunk)] = chunk
+        self._pos += len(chunk)
+        return len(chunk)
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: len(self._view)}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+
+# A batch item's PDF: the upload buffer itself, or a loader that reads a ZIP member
+_BatchSource = Union[bytearray, Callable[[], bytes]]
+
+
+def _expand_batch_upload(name: str, data: bytearray
+                         ) -> Tuple[List[Tuple[str, Optional[_BatchSource], Optional[str]]],
+                                    int, Optional[zipfile.ZipFile]]:
+    """
+    Return ([(filename, source, error)], expanded_bytes, archive); ZIPs are expanded to
+    their PDF members. Nothing is decompressed here: a member's source is a loader,
+    and expanded_bytes sums the sizes the central directory declares (reading a
+    member never yields more than that). A plain PDF is passed on as the upload
+    buffer itself, not a copy. archive is the open ZipFile the loaders read from, for
+    the caller to close once they're done.
+    """
+    if not (data[:4] == b"PK\x03\x04" or name.lower().endswith(".zip")):
+        if len(data) > MAX_PDF_BYTES:
+            return [(name, None, "PDF too large")], 0, None
+        if not looks_like_pdf(data):
+            return [(name, None, "File must be a PDF")], 0, None
+        return [(name, data, None)], len(data), None
+    try:
+        zf = zipfile.ZipFile(_BufferFile(data))
+    except zipfile.BadZipFile:
+        return [(name, None, "Invalid ZIP archive")], 0, None
+
+    def loader(info: zipfile.ZipInfo) -> Callable[[], bytes]:
+        def load() -> bytes:
+            try:
+                return zf.read(info)
+            except (zipfile.BadZipFile, zlib.error, EOFError, RuntimeError,
+                    NotImplementedError) as e:
+                raise ValueError(f"Unreadable ZIP member: {e}") from None
+        return load
+
+    items, expanded = [], 0
+    for info in zf.infolist():
+        base = info.filename.rsplit("/", 1)[-1]
+        if info.is_dir() or info.filename.startswith("__MACOSX/") or base.startswith("."):
+            continue
+        if not base.lower().endswith(".pdf"):
+            continue
+        if info.file_size > MAX_PDF_BYTES:
+            items.append((base, None, "PDF too large"))
+            continue
+        items.append((base, loader(info), None))
+        expanded += info.file_size
+    return items, expanded, zf
+
+
+async def _batch_item(index: int, name: str, source: Optional[_BatchSource],
+                      error: Optional[str], sem: asyncio.Semaphore, fmt: str = "csv") -> dict:
+    record = {"index": index, "filename": name}
+    if error:
+        return {**record, "ok": False, "status": 400, "error": error}
+    # ZIP members are read only once the item gets a slot, so at most pool.workers
+    # of them are in memory at a time
+    async with sem:
+        if callable(source):
+            try:
+                data = await asyncio.to_thread(source)
+            except ValueError as e:
+                return {**record, "ok": False, "status": 400, "error": str(e)}
+        else:
+            data = source
+        rejected = await asyncio.to_thread(_check_pdf, data)
+        if rejected:
+            return {**record, "ok": False, "status": rejected[0], "error": rejected[1]}
+        for attempt in range(BATCH_BUSY_RETRIES + 1):
+            try:
+                key = cache_key(data, name, None, None)
+                result, status = await cache.get_or_compute(
+                    key, lambda: _run_transform(data, name, None, None))
+                record.update(ok=True, cache=status.upper())
+                if fmt == "columns":
+                    record.update(fields=list(result["columns"]), columns=result["columns"],
+                                  exam_metadata=result["meta"])
+                else:
+                    rows_csv, meta_csv = formats.csv_pair(result["columns"], result["meta"])
+                    record.update(all_sections_csv=rows_csv, exam_metadata_csv=meta_csv)
+                return record
+            except HTTPException as e:
+                if e.status_code == 503 and attempt < BATCH_BUSY_RETRIES:
+                    await asyncio.sleep(TRANSFORM_RETRY_AFTER_SECONDS)
+                    continue
+                return {**record, "ok": False, "status": e.status_code, "error": e.detail}
+
+
+@app.post("/transform/batch")
+async def transform_batch_endpoint(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    format: Optional[str] = Query(None, description="csv | columns"),
+):
+    """
+    Transform many PDFs (or ZIPs of PDFs) at once.
+    Streams one NDJSON record per exam in completion order; per-file failures are
+    reported as records with ok=false instead of failing the batch.
+    format=columns (or Accept: application/vnd.lsat.columns+json) puts the rows in
+    each record column-major instead of as CSV. Accept-Encoding gzip/zstd compresses
+    the stream, flushed per record.
+    """
+    fmt = _negotiate(request, format)
+    if fmt not in ("csv", "columns"):
+        raise HTTPException(status_code=406, detail=f"{fmt} is not available for batches")
+
+    # Counts and sizes come from the ZIP directories, so an archive that would expand
+    # past the limits is rejected before any member is decompressed
+    items, archives, expanded = [], [], 0
+    try:
+        for f in files:
+            try:
+                data = await read_upload(f, BATCH_MAX_BYTES)
+            except UploadTooLarge:
+                raise HTTPException(status_code=413, detail="Batch too large")
+            more, size, zf = await asyncio.to_thread(_expand_batch_upload,
+                                                     f.filename or "", data)
+            if zf is not None:
+                archives.append(zf)
+            items.extend(more)
+            expanded += size
+            if len(items) > BATCH_MAX_FILES:
+                raise HTTPException(
+                    status_code=413, detail=f"Too many files (max {BATCH_MAX_FILES})")
+            if expanded > BATCH_MAX_BYTES:
+                raise HTTPException(status_code=413, detail="Batch too large")
+        if not items:
+            raise HTTPException(status_code=400, detail="No PDFs in upload")
+    except HTTPException:
+        for zf in archives:
+            zf.close()
+        raise
+
+    # At most one pool slot per worker per batch, so a batch can't starve /transform
+    sem = asyncio.Semaphore(pool.workers)
+
+    encoding = formats.negotiate_encoding(request.headers.get("accept-encoding"))
+    compressor = formats.StreamCompressor(encoding) if encoding else None
+
+    async def stream():
+        tasks = [asyncio.ensure_future(_batch_item(i, name, source, err, sem, fmt))
+                 for i, (name, source, err) in enumerate(items)]
+        try:
+            for fut in asyncio.as_completed(tasks):
+                line = (json.dumps(await fut) + "\n").encode("utf-8")
+                yield compressor.chunk(line) if compressor else line
+            if compressor:
+                yield compressor.finish()
+        finally:
+            for t in tasks:
+                t.cancel()
+            # A member still being read in a thread keeps its own handle open
+            for zf in archives:
+                zf.close()
+
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return StreamingResponse(stream(), media_type="application/x-ndjson", headers=headers)
+
+
+@app.post("/transform/stream")
+async def transform_stream_endpoint(
+    request: Request,
+    file: UploadFile = File(...),
+    exam_number: Optional[str] = Form(None),
+    exam_date: Optional[str] = Form(None),
+    group: str = Query("page", pattern="^(page|section)$",
+                       description="Batch per page or per section"),
+    format: Optional[str] = Query(None, description="ndjson | csv (overrides Accept)"),
+):
+    """
+    Rows as the pipeline finishes them; ordering as in lsat_transformerWIP.iter_rows.
+    NDJSON (default): {"type": "meta", "exam_metadata"}, one {"type": "rows", "rows"}
+    per batch, then {"type": "end", "rows": N}; a failure mid-stream ends with
+    {"type": "error", "status", "error"}.
+    CSV (Accept: text/csv or ?format=csv): the all_sections CSV, header first, with the
+    exam metadata in X-Exam-Number/X-Exam-Date/X-Scaled-Score; a failure ends it early.
+    Not cached. Accept-Encoding gzip/zstd compresses, flushed per batch.
+    """
+    start = prom.request_start(request.scope) or time.perf_counter()
+    if format and format.lower() not in ("ndjson", "csv"):
+        raise HTTPException(status_code=406, detail=f"Unsupported format: {format}")
+    as_csv = (format.lower() == "csv" if format
+              else "text/csv" in (request.headers.get("accept") or "").lower())
+    data, _ = await _read_checked_upload(file, start)
+
+    # Held until the stream ends, however it ends
+    reserved = await asyncio.to_thread(_job_bytes, data)
+    try:
+        await budget.acquire(reserved)
+    except Exception as e:
+        raise _pool_error(e)
+    items = pool.stream(
+        transformer.transform_stream,
+        data,
+        original_name=file.filename,
+        exam_number=exam_number,
+        exam_date=exam_date,
+        page_workers=TRANSFORM_PAGE_WORKERS,
+        vector_detect=TRANSFORM_VECTOR_DETECT,
+        group=group,
+        ladder=TRANSFORM_DPI_LADDER,
+    )
+    # Wait for the metadata so admission/early failures still get a proper status
     try:
-        rows_csv, meta_csv = transformer.transform(
-            data,
-            original_name=file.filename,  # browser filename hint
-            exam_number=exam_number,      # optional override
-            exam_date=exam_date,          # optional override
-        )
+        _, meta = await items.__anext__()
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Transformer failed: {e}")
+        budget.release(reserved)
+        raise _pool_error(e)
+
+    encoding = formats.negotiate_encoding(request.headers.get("accept-encoding"))
+    compressor = formats.StreamCompressor(encoding) if encoding else None
+
+    def chunk(text: str) -> bytes:
+        data = text.encode("utf-8")
+        return compressor.chunk(data) if compressor else data
+
+    async def body():
+        total = 0
+        try:
+            if as_csv:
+                yield chunk(transformer.to_csv([], transformer.MERGED_FIELDS, "\n"))
+            else:
+                yield chunk(json.dumps({"type": "meta", "exam_metadata": meta}) + "\n")
+            async for _, batch in items:
+                total += len(batch)
+                if as_csv:
+                    yield chunk(transformer.to_csv(batch, transformer.MERGED_FIELDS, "\n",
+                                                   header=False))
+                else:
+                    yield chunk(json.dumps({"type": "rows", "rows": batch}) + "\n")
+            JOBS.inc(outcome="ok")
+            ROWS.inc(total)
+            if not as_csv:
+                yield chunk(json.dumps({"type": "end", "rows": total}) + "\n")
+        except Exception as e:
+            err = _pool_error(e)
+            if not as_csv:
+                yield chunk(json.dumps({"type": "error", "status": err.status_code,
+                                        "error": err.detail}) + "\n")
+        finally:
+            # Kills the worker if the client went away mid-stream
+            await items.aclose()
+            budget.release(reserved)
+        if compressor:
+            yield compressor.finish()
+
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    if as_csv:
+        headers.update({"X-Exam-Number": meta["exam_number"], "X-Exam-Date": meta["exam_date"],
+                        "X-Scaled-Score": meta["scaled_score"]})
+    return StreamingResponse(body(), headers=headers,
+                             media_type="text/csv" if as_csv else "application/x-ndjson")
+
+
+def _user_id(authorization: Optional[str] = Header(None)) -> str:
+    """The caller's user_id: `sub` of `Authorization: Bearer <Supabase access token>`."""
+    if SUPABASE_JWT_SECRET is None:
+        raise HTTPException(status_code=403, detail="Question store is disabled")
+    scheme, _, token = (authorization or "").partition(" ")
+    try:
+        if scheme.lower() != "bearer":
+            raise InvalidToken("Bearer token required")
+        return verify_token(token, SUPABASE_JWT_SECRET)["sub"]
+    except InvalidToken as e:
+        raise HTTPException(status_code=401, detail=str(e),
+                            headers={"WWW-Authenticate": "Bearer"})
+
+
+@app.post("/questions")
+async def store_questions(
+    request: Request,
+    response: Response,
+    file: UploadFile = File(...),
+    exam_number: Optional[str] = Form(None),
+    exam_date: Optional[str] = Form(None),
+    no_cache: bool = Form(False),
+    user_id: str = Depends(_user_id),
+):
+    """
+    Transform a PDF (as POST /transform) and upsert its rows into the caller's part of
+    the question store, keyed by user_id|exam_number|Section|Question. Returns only the
+    rows that were inserted or changed, plus counts; re-uploading an unchanged exam
+    returns no rows. 400 if neither the form nor the PDF gives an exam_number.
+    """
+    start = prom.request_start(request.scope) or time.perf_counter()
+    data, timing = await _read_checked_upload(file, start)
+    info = {"timing": timing}
+    job_id, result = await _transform_and_wait(data, file.filename, exam_number, exam_date,
+                                               no_cache, info)
+    t = time.perf_counter()
+    try:
+        changes = await asyncio.to_thread(app.state.questions.upsert, user_id,
+                                          result["columns"], result["meta"])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    timing["store"] = time.perf_counter() - t
+    for change in ("inserted", "updated"):
+        STORED_ROWS.inc(len(changes[change]), change=change)
+    STORED_ROWS.inc(changes["unchanged"], change="unchanged")
+    response.headers.update({"X-Cache": info["cache"].upper(), "X-Job-Id": job_id,
+                             "Server-Timing": prom.server_timing(timing.items())})
+    return {"exam_metadata": result["meta"], "exam_changed": changes["exam_changed"],
+            "inserted": len(changes["inserted"]), "updated": len(changes["updated"]),
+            "unchanged": changes["unchanged"],
+            "rows": ([{**r, "change": "inserted"} for r in changes["inserted"]] +
+                     [{**r, "change": "updated"} for r in changes["updated"]])}
+
+
+@app.get("/questions")
+async def list_questions(
+    exam_number: Optional[str] = None,
+    section: Optional[int] = None,
+    subtype: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=QUESTIONS_PAGE_MAX),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    user_id: str = Depends(_user_id),
+):
+    """The caller's stored rows in exam_number, Section, Question order, filtered and
+    keyset-paged."""
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    rows, last = await asyncio.to_thread(app.state.questions.query, user_id, exam_number,
+                                         section, subtype, limit, after)
+    return {"rows": rows, "next_cursor": encode_cursor(last) if last else None}
+
+
+_DATE_PATTERN = r"^\d{4}-\d{2}-\d{2}$"
+
+
+@app.get("/analytics")
+async def analytics(
+    date_from: Optional[str] = Query(None, pattern=_DATE_PATTERN, description="YYYY-MM-DD"),
+    date_to: Optional[str] = Query(None, pattern=_DATE_PATTERN, description="YYYY-MM-DD"),
+    exclude_experimental: bool = False,
+    user_id: str = Depends(_user_id),
+):
+    """
+    Accuracy, average time, flag rate and counts over the caller's stored exams:
+    overall and per section, subtype and difficulty, filtered by exam_date range.
+    """
+    return await asyncio.to_thread(app.state.questions.analytics, user_id, date_from,
+                                   date_to, exclude_experimental)
+
+
+@app.get("/exams")
+async def list_exams(user_id: str = Depends(_user_id)):
+    """The caller's stored exams: metadata and row count each."""
+    return {"exams": await asyncio.to_thread(app.state.questions.exams, user_id)}
+
+
+@app.delete("/exams/{exam_number}")
+async def delete_exam(exam_number: str, user_id: str = Depends(_user_id)):
+    """Remove one of the caller's exams and its rows from the question store."""
+    removed = await asyncio.to_thread(app.state.questions.delete_exam, user_id, exam_number)
+    if removed is None:
+        raise HTTPException(status_code=404, detail="Exam not found")
+    return {"exam_number": exam_number, "removed": removed}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type=prom.CONTENT_TYPE)
+
+
+@app.get("/cache")
+def cache_stats():
+    return cache.snapshot()
+
+
+def _require_cache_admin(authorization: Optional[str] = Header(None)):
+    """Cache purges need `Authorization: Bearer $CACHE_ADMIN_TOKEN`."""
+    if CACHE_ADMIN_TOKEN is None:
+        raise HTTPException(status_code=403, detail="Cache purging is disabled")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(
+            token.encode("utf-8"), CACHE_ADMIN_TOKEN.encode("utf-8")):
+        raise HTTPException(status_code=401, detail="Admin token required",
+                            headers={"WWW-Authenticate": "Bearer"})
+
+
+@app.delete("/cache", dependencies=[Depends(_require_cache_admin)])
+def cache_purge_all():
+    return {"removed": cache.purge()}
 
-    if not rows_csv.strip() or not meta_csv.strip():
-        raise HTTPException(
-            status_code=500, detail="Transformer returned empty CSV(s)")
 
-    return TransformResponse(all_sections_csv=rows_csv, exam_metadata_csv=meta_csv)
+@app.delete("/cache/{key}", dependencies=[Depends(_require_cache_admin)])
+def cache_purge(key: str):
+    return {"removed": cache.purge(key)}
 
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
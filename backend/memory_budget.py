@@ -0,0 +1,105 @@
+"""
+Memory admission for transform jobs.
+
+Each job's peak footprint is predicted before it runs
+(lsat_transformerWIP.estimate_peak_bytes) and reserved against one global
+byte budget for as long as it runs:
+
+- a job that fits starts at once; the rest wait in arrival order, so a large
+  job isn't overtaken forever by small ones;
+- a job still waiting after max_wait seconds, or arriving when max_waiting jobs
+  already wait, raises OverBudget (the API answers 503 + Retry-After);
+- a job larger than the whole budget can never run and raises JobTooLarge (413).
+
+limit_bytes=0 turns the budget off: every reservation is admitted.
+"""
+
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Optional, Tuple
+
+
+class OverBudget(Exception):
+    """Raised when a job couldn't be admitted within the wait limit."""
+
+
+class JobTooLarge(Exception):
+    """Raised when a job's estimate exceeds the whole budget."""
+
+
+class MemoryBudget:
+    def __init__(self, limit_bytes: int, max_wait: float = 30.0,
+                 max_waiting: Optional[int] = None):
+        self.limit = max(0, int(limit_bytes))
+        self.max_wait = max_wait
+        self.max_waiting = max_waiting
+        self.in_use = 0
+        self._waiters: Deque[Tuple[int, asyncio.Future]] = deque()
+
+    @property
+    def enabled(self) -> bool:
+        return self.limit > 0
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def check(self, nbytes: int):
+        """Raise JobTooLarge if nbytes could never be admitted."""
+        if self.enabled and nbytes > self.limit:
+            raise JobTooLarge(f"{nbytes} bytes > budget {self.limit}")
+
+    async def acquire(self, nbytes: int):
+        """Reserve nbytes, waiting up to max_wait; pair with release(nbytes)."""
+        if not self.enabled:
+            return
+        self.check(nbytes)
+        if not self._waiters and self.in_use + nbytes <= self.limit:
+            self.in_use += nbytes
+            return
+        if self.max_waiting is not None and len(self._waiters) >= self.max_waiting:
+            raise OverBudget(f"{len(self._waiters)} jobs already waiting for memory")
+        fut = asyncio.get_running_loop().create_future()
+        entry = (nbytes, fut)
+        self._waiters.append(entry)
+        try:
+            await asyncio.wait_for(asyncio.shield(fut), self.max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if fut.done() and not fut.cancelled():
+                # Granted just as we gave up: hand it back
+                self.release(nbytes)
+            else:
+                fut.cancel()
+                self._waiters.remove(entry)
+                self._wake()
+            if isinstance(e, asyncio.TimeoutError):
+                raise OverBudget(
+                    f"{nbytes} bytes not admitted within {self.max_wait}s "
+                    f"({self.in_use} of {self.limit} in use)") from None
+            raise
+
+    def release(self, nbytes: int):
+        if not self.enabled:
+            return
+        self.in_use = max(0, self.in_use - nbytes)
+        self._wake()
+
+    def _wake(self):
+        # Strict FIFO: stop at the first waiter that doesn't fit
+        while self._waiters and self.in_use + self._waiters[0][0] <= self.limit:
+            nbytes, fut = self._waiters.popleft()
+            self.in_use += nbytes
+            fut.set_result(None)
+
+    @asynccontextmanager
+    async def reserve(self, nbytes: int):
+        await self.acquire(nbytes)
+        try:
+            yield
+        finally:
+            self.release(nbytes)
+
+    def snapshot(self) -> dict:
+        return {"limit_bytes": self.limit, "in_use_bytes": self.in_use,
+                "waiting": self.waiting}
@@ -0,0 +1,184 @@
+"""
+Minimal Prometheus text-format metrics (no client library needed).
+
+- Counter / Histogram: updated in-process by the API.
+- Gauges and read-through counters: sampled from a callback at scrape time.
+- RequestTimingMiddleware: stamps each request's start time into scope["state"]
+  and appends the `total` entry to any Server-Timing header on the way out.
+"""
+
+import math
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+REQUEST_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0, 30.0, 60.0, 120.0)
+MEMORY_BUCKETS = tuple(mb * 1024 * 1024 for mb in (8, 16, 32, 64, 128, 256, 512, 1024, 2048))
+
+LabelKey = Tuple[str, ...]
+
+
+def _fmt_value(v: float) -> str:
+    if v == math.inf:
+        return "+Inf"
+    return repr(float(v)) if not float(v).is_integer() else str(int(v))
+
+
+def _fmt_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(v) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Dict[str, str]) -> LabelKey:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        return self.header() + [
+            f"{self.name}{_fmt_labels(self.labelnames, k)} {_fmt_value(v)}"
+            for k, v in sorted(self._values.items())]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets: Sequence[float] = STAGE_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # label key -> ([per-bucket counts], sum)
+        self._series: Dict[LabelKey, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = ([0] * len(self.buckets), [0.0])
+        counts, total = series
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        total[0] += value
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for key, (counts, total) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                le = f'le="{_fmt_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, key, le)} "
+                             f"{cumulative}")
+            lines.append(f"{self.name}_sum{_fmt_labels(self.labelnames, key)} "
+                         f"{_fmt_value(total[0])}")
+            lines.append(f"{self.name}_count{_fmt_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Sampled(_Metric):
+    """Gauge/counter read from fn() at scrape time; fn returns a number or
+    an iterable of (labels dict, number)."""
+
+    def __init__(self, name, help, fn: Callable, kind: str = "gauge", labelnames=()):
+        super().__init__(name, help, labelnames)
+        self.kind = kind
+        self.fn = fn
+
+    def render(self) -> List[str]:
+        value = self.fn()
+        samples: Iterable = value if isinstance(value, (list, tuple)) else [({}, value)]
+        return self.header() + [
+            f"{self.name}{_fmt_labels(self.labelnames, self._key(labels))} {_fmt_value(v)}"
+            for labels, v in samples]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labelnames=()) -> Counter:
+        return self._add(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=STAGE_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def sampled(self, name, help, fn, kind="gauge", labelnames=()) -> Sampled:
+        return self._add(Sampled(name, help, fn, kind, labelnames))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for m in self._metrics:
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+def server_timing(entries: Iterable[Tuple[str, float]]) -> str:
+    """[(name, seconds)] -> Server-Timing header value (durations in ms)."""
+    return ", ".join(f"{name};dur={secs * 1000:.1f}" for name, secs in entries)
+
+
+def request_start(scope) -> Optional[float]:
+    return (scope.get("state") or {}).get("request_start")
+
+
+class RequestTimingMiddleware:
+    """Pure ASGI middleware; see module docstring."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        scope.setdefault("state", {})["request_start"] = start
+
+        async def timed_send(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers") or [])
+                for i, (k, v) in enumerate(headers):
+                    if k.lower() == b"server-timing":
+                        total = server_timing([("total", time.perf_counter() - start)])
+                        headers[i] = (k, v + b", " + total.encode("latin-1"))
+                        message = {**message, "headers": headers}
+                        break
+            await send(message)
+
+        await self.app(scope, receive, timed_send)
@@ -0,0 +1,300 @@
+"""
+Server-side store of transformed question rows.
+
+- QuestionStore: one SQLite table of rows (the MERGED_FIELDS columns) with a
+  unique index on (user_id, exam_number, Section, Question), plus one exams row
+  per (user_id, exam_number) with its metadata. Every method takes the owning
+  user_id; one user never sees or changes another's rows. upsert() applies one
+  upload in a single transaction and returns only the rows it inserted or
+  changed, so the client no longer has to diff an upload against its whole
+  history.
+- query(): keyset-paged reads of one user's rows filtered by exam, section
+  and/or subtype, each served from an index in (exam_number, Section, Question)
+  order.
+- analytics(): one user's accuracy, average time, flag rate and counts per
+  section, subtype and difficulty, from the question_stats summary table.
+  upsert() and delete_exam() apply each row's contribution (minus the replaced
+  row's) in the same transaction, so stats stay current without rescanning
+  questions; a query sums a few rows per exam.
+"""
+
+import base64
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from lsat_transformerWIP import MERGED_FIELDS, META_FIELDS
+
+KEY_FIELDS = ("exam_number", "Section", "Question")
+_INT_FIELDS = ("Section", "Question", "Difficulty", "total_time_seconds", "question_score")
+SCHEMA_VERSION = 1
+# question_stats breakdowns: name -> row field
+STAT_DIMS = {"section": "Section", "subtype": "Subtype", "difficulty": "Difficulty"}
+_STAT_SUMS = ("questions", "scored", "correct", "timed", "time_sum", "flagged")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS questions (
+    user_id TEXT NOT NULL,
+    {columns},
+    updated REAL NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS questions_key
+    ON questions(user_id, exam_number, Section, Question);
+CREATE INDEX IF NOT EXISTS questions_section
+    ON questions(user_id, Section, exam_number, Question);
+CREATE INDEX IF NOT EXISTS questions_subtype
+    ON questions(user_id, Subtype, exam_number, Section, Question);
+CREATE TABLE IF NOT EXISTS exams (
+    user_id TEXT NOT NULL,
+    exam_number TEXT NOT NULL,
+    exam_date TEXT,
+    scaled_score TEXT,
+    updated REAL NOT NULL,
+    PRIMARY KEY (user_id, exam_number)
+);
+CREATE TABLE IF NOT EXISTS question_stats (
+    user_id TEXT NOT NULL,
+    exam_number TEXT NOT NULL,
+    dim TEXT NOT NULL,
+    key TEXT NOT NULL,
+    experimental INTEGER NOT NULL,
+    {sums},
+    PRIMARY KEY (user_id, exam_number, dim, key, experimental)
+) WITHOUT ROWID;
+""".format(columns=",\n    ".join(
+    f"{f} {'INTEGER' if f in _INT_FIELDS else 'TEXT'}"
+    + (" NOT NULL" if f in KEY_FIELDS else "") for f in MERGED_FIELDS),
+    sums=",\n    ".join(f"{f} INTEGER NOT NULL DEFAULT 0" for f in _STAT_SUMS))
+
+_COLUMNS = ", ".join(MERGED_FIELDS)
+_UPSERT = (
+    f"INSERT INTO questions (user_id, {_COLUMNS}, updated) "
+    f"VALUES ({', '.join('?' * (len(MERGED_FIELDS) + 2))}) "
+    f"ON CONFLICT (user_id, {', '.join(KEY_FIELDS)}) DO UPDATE SET "
+    + ", ".join(f"{f}=excluded.{f}" for f in MERGED_FIELDS if f not in KEY_FIELDS)
+    + ", updated=excluded.updated")
+_UPSERT_EXAM = (
+    "INSERT INTO exams (user_id, exam_number, exam_date, scaled_score, updated) "
+    "VALUES (?, ?, ?, ?, ?) "
+    "ON CONFLICT (user_id, exam_number) DO UPDATE SET exam_date=excluded.exam_date, "
+    "scaled_score=excluded.scaled_score, updated=excluded.updated "
+    "WHERE (exam_date, scaled_score) IS NOT (excluded.exam_date, excluded.scaled_score)")
+
+_APPLY_STATS = (
+    "INSERT INTO question_stats "
+    f"(user_id, exam_number, dim, key, experimental, {', '.join(_STAT_SUMS)}) "
+    f"VALUES ({', '.join('?' * (5 + len(_STAT_SUMS)))}) "
+    "ON CONFLICT (user_id, exam_number, dim, key, experimental) DO UPDATE SET "
+    + ", ".join(f"{f}={f}+excluded.{f}" for f in _STAT_SUMS))
+_F = {f: i for i, f in enumerate(MERGED_FIELDS)}
+
+
+def _stat_deltas(added: Iterable[Tuple], removed: Iterable[Tuple]) -> List[Tuple]:
+    """
+    question_stats upsert params for rows ((user_id, *MERGED_FIELDS) tuples)
+    entering and leaving the store: one (user_id, exam, dim, key, experimental,
+    *sums) per touched group.
+    """
+    acc = defaultdict(lambda: [0] * len(_STAT_SUMS))
+    for rows, sign in ((added, 1), (removed, -1)):
+        for user_id, *row in rows:
+            score, secs = row[_F["question_score"]], row[_F["total_time_seconds"]]
+            scored = isinstance(score, int)
+            timed = isinstance(secs, int)
+            contrib = (1, scored, scored and score > 0, timed, secs if timed else 0,
+                       row[_F["Flagged"]] == "TRUE")
+            experimental = int(row[_F["experimental_section"]] == "TRUE")
+            for dim, field in STAT_DIMS.items():
+                sums = acc[(user_id, row[0], dim, str(row[_F[field]]), experimental)]
+                for i, v in enumerate(contrib):
+                    sums[i] += sign * v
+    return [(*k, *v) for k, v in acc.items() if any(v)]
+
+
+def _summarize(sums: Sequence[int]) -> Dict:
+    questions, scored, correct, timed, time_sum, flagged = sums
+    return {"questions": questions, "scored": scored, "correct": correct,
+            "accuracy": correct / scored if scored else None,
+            "avg_time_seconds": time_sum / timed if timed else None,
+            "flagged": flagged, "flag_rate": flagged / questions if questions else None}
+
+
+def encode_cursor(key: Sequence) -> str:
+    """Opaque page token for the (exam_number, Section, Question) of a page's last row."""
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int, int]:
+    """Inverse of encode_cursor; raises ValueError on a malformed token."""
+    try:
+        exam, section, question = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return str(exam), int(section), int(question)
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+
+
+class QuestionStore:
+    """Blocking SQLite access; call from a thread (asyncio.to_thread) in the API."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        if path != ":memory:":
+            self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self._db.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+
+    def _exec(self, sql: str, params=()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._db.execute(sql, params)
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def upsert(self, user_id: str, columns: Dict[str, List], meta: Dict) -> Dict:
+        """
+        Insert or update one upload's rows (column-major, as in a transform result)
+        and its exam metadata for user_id, in one transaction. Rows identical to the
+        stored ones are left alone. Raises ValueError, storing nothing, if the upload
+        has no exam_number (its rows would collide with every other such upload and
+        have no exams row). Returns {"inserted": [rows], "updated": [rows],
+        "unchanged": n, "exam_changed": bool}; rows are dicts keyed by MERGED_FIELDS.
+        """
+        incoming = list(zip(*(columns[f] for f in MERGED_FIELDS)))
+        if not all(str(exam or "").strip()
+                   for exam in (meta.get("exam_number"), *(row[0] for row in incoming))):
+            raise ValueError("Upload has no exam_number; pass it as the exam_number field")
+        now = time.time()
+        inserted, updated, replaced = [], [], []
+        with self._transaction() as db:
+            stored = {}
+            for exam in sorted({r[0] for r in incoming}):
+                for row in db.execute(f"SELECT {_COLUMNS} FROM questions "
+                                      "WHERE user_id=? AND exam_number=?", (user_id, exam)):
+                    stored[tuple(row)[:3]] = tuple(row)
+            for row in incoming:
+                old = stored.get(row[:3])
+                if old is None:
+                    inserted.append(row)
+                elif old != row:
+                    updated.append(row)
+                    replaced.append(old)
+                else:
+                    continue
+                stored[row[:3]] = row  # a repeated key within the upload: last wins
+            db.executemany(_UPSERT, [(user_id, *row, now) for row in inserted + updated])
+            db.executemany(_APPLY_STATS, _stat_deltas(
+                [(user_id, *row) for row in inserted + updated],
+                [(user_id, *row) for row in replaced]))
+            exam_changed = db.execute(_UPSERT_EXAM, (
+                user_id, *(meta.get(f) for f in META_FIELDS), now)).rowcount == 1
+        changed = inserted + updated
+        return {"inserted": [dict(zip(MERGED_FIELDS, r)) for r in inserted],
+                "updated": [dict(zip(MERGED_FIELDS, r)) for r in updated],
+                "unchanged": len(incoming) - len(changed),
+                "exam_changed": exam_changed}
+
+    def query(self, user_id: str, exam_number: Optional[str] = None,
+              section: Optional[int] = None, subtype: Optional[str] = None, limit: int = 100,
+              after: Optional[Tuple[str, int, int]] = None) -> Tuple[List[Dict], Optional[Tuple]]:
+        """
+        One page of user_id's rows in (exam_number, Section, Question) order, starting
+        after the key `after`. Returns (rows, key of the last row, or None on the last
+        page).
+        """
+        where, params = ["user_id=?"], [user_id]
+        for field, value in (("exam_number", exam_number), ("Section", section),
+                             ("Subtype", subtype)):
+            if value is not None:
+                where.append(f"{field}=?")
+                params.append(value)
+        if after is not None:
+            where.append("(exam_number, Section, Question) > (?, ?, ?)")
+            params.extend(after)
+        sql = f"SELECT {_COLUMNS} FROM questions WHERE " + " AND ".join(where)
+        sql += " ORDER BY exam_number, Section, Question LIMIT ?"
+        rows = [dict(r) for r in self._exec(sql, (*params, limit + 1)).fetchall()]
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, tuple(rows[-1][f] for f in KEY_FIELDS)
+
+    def exams(self, user_id: str) -> List[Dict]:
+        """user_id's stored exam metadata with row counts, by exam_number."""
+        rows = self._exec(
+            "SELECT e.exam_number, e.exam_date, e.scaled_score, e.updated, "
+            "(SELECT COUNT(*) FROM questions q "
+            " WHERE q.user_id = e.user_id AND q.exam_number = e.exam_number) AS rows "
+            "FROM exams e WHERE e.user_id=? ORDER BY e.exam_number", (user_id,)).fetchall()
+        return [dict(r) for r in rows]
+
+    def delete_exam(self, user_id: str, exam_number: str) -> Optional[int]:
+        """Remove one of user_id's exams, rows and metadata; returns the number of rows
+        removed, or None if the exam wasn't stored at all."""
+        key = (user_id, exam_number)
+        with self._transaction() as db:
+            found = db.execute("DELETE FROM exams WHERE user_id=? AND exam_number=?",
+                               key).rowcount
+            removed = db.execute("DELETE FROM questions WHERE user_id=? AND exam_number=?",
+                                 key).rowcount
+            db.execute("DELETE FROM question_stats WHERE user_id=? AND exam_number=?", key)
+        return removed if found or removed else None
+
+    def analytics(self, user_id: str, date_from: Optional[str] = None,
+                  date_to: Optional[str] = None, exclude_experimental: bool = False) -> Dict:
+        """
+        Aggregates over user_id's stored exams whose exam_date is within [date_from,
+        date_to] (ISO dates; either bound optional, undated exams, including rows
+        with no exams row, only match when neither is given): "overall" plus "by_section", "by_subtype" and "by_difficulty" lists.
+        Each entry has questions, scored, correct, accuracy (correct / scored),
+        avg_time_seconds, flagged and flag_rate.
+        """
+        where, params = ["s.user_id = ?"], [user_id]
+        if date_from is not None:
+            where.append("e.exam_date >= ?")
+            params.append(date_from)
+        if date_to is not None:
+            where.append("e.exam_date <= ?")
+            params.append(date_to)
+        if exclude_experimental:
+            where.append("s.experimental = 0")
+        where.append("s.questions > 0")
+        source = ("FROM question_stats s LEFT JOIN exams e "
+                  "ON e.user_id = s.user_id AND e.exam_number = s.exam_number "
+                  "WHERE " + " AND ".join(where))
+        sql = (f"SELECT s.dim, s.key, COUNT(DISTINCT s.exam_number) AS exams, "
+               f"{', '.join(f'SUM(s.{f})' for f in _STAT_SUMS)} {source} GROUP BY s.dim, s.key")
+        exams = self._exec(f"SELECT COUNT(DISTINCT s.exam_number) {source}", params).fetchone()[0]
+        out = {"exams": exams}
+        groups = {dim: [] for dim in STAT_DIMS}
+        totals = [0] * len(_STAT_SUMS)
+        for row in self._exec(sql, params).fetchall():
+            dim, key, exams, sums = row[0], row[1], row[2], tuple(row)[3:]
+            field = STAT_DIMS[dim]
+            value = int(key) if field in _INT_FIELDS and key.lstrip("-").isdigit() else key
+            groups[dim].append({field: value, "exams": exams, **_summarize(sums)})
+            if dim == "section":
+                totals = [a + b for a, b in zip(totals, sums)]
+        out["overall"] = _summarize(totals)
+        for dim, entries in groups.items():
+            entries.sort(key=lambda e: (isinstance(e[STAT_DIMS[dim]], str), e[STAT_DIMS[dim]]))
+            out["by_" + dim] = entries
+        return out
+
+    def close(self):
+        with self._lock:
+            self._db.close()
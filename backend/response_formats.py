@@ -0,0 +1,199 @@
+"""
+Response encodings for /transform results.
+
+A result is kept column-major ({field: [values]}, see lsat_transformerWIP.to_columns)
+plus the exam metadata dict; every format is encoded straight from that:
+
+- application/json (default): TransformResponse, the two CSV strings
+- application/vnd.lsat.columns+json: {"fields", "columns", "exam_metadata"}
+- application/vnd.apache.arrow.stream: Arrow IPC stream
+- application/vnd.apache.parquet: Parquet file
+Arrow/Parquet carry the exam metadata as JSON under the schema metadata key
+"exam_metadata"; Flagged/experimental_section are booleans there.
+
+Bodies are gzip/zstd-compressed per Accept-Encoding. pyarrow and zstandard are
+optional imports: without them those formats/encodings are simply not offered.
+"""
+
+import gzip
+import json
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import lsat_transformerWIP as transformer
+
+FORMAT_MEDIA_TYPES = {
+    "csv": "application/json",
+    "columns": "application/vnd.lsat.columns+json",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+_MEDIA_ALIASES = {"application/x-parquet": "parquet"}
+DEFAULT_FORMAT = "csv"
+
+# Bodies smaller than this aren't worth a compression pass
+COMPRESS_MIN_BYTES = 1024
+_BOOL_FIELDS = ("Flagged", "experimental_section")
+_INT_FIELDS = ("Section", "Question", "Difficulty", "total_time_seconds", "question_score")
+
+
+class NotAcceptable(Exception):
+    pass
+
+
+def _parse_accept(header: str) -> List[Tuple[str, float]]:
+    """'a/b;q=0.5, c/d' -> [(media, q)], highest q first (stable for ties)."""
+    items = []
+    for i, part in enumerate(header.split(",")):
+        media, _, params = part.strip().partition(";")
+        media = media.strip().lower()
+        if not media:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            items.append((i, media, q))
+    return [(m, q) for _, m, q in sorted(items, key=lambda t: (-t[2], t[0]))]
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return None
+    return pyarrow
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+def _available(key: Optional[str]) -> bool:
+    # pyarrow is only imported (~130 ms the first time) when arrow/parquet is asked for
+    if key in ("arrow", "parquet"):
+        return _pyarrow() is not None
+    return key in FORMAT_MEDIA_TYPES
+
+
+def negotiate_format(accept: Optional[str], fmt: Optional[str] = None) -> str:
+    """
+    Pick a format key from an explicit ?format= value or the Accept header.
+    Raises NotAcceptable when nothing requested is available.
+    """
+    if fmt:
+        fmt = fmt.lower()
+        if not _available(fmt):
+            raise NotAcceptable(f"Unsupported format: {fmt}")
+        return fmt
+    if not accept:
+        return DEFAULT_FORMAT
+    by_media = {m: k for k, m in FORMAT_MEDIA_TYPES.items()}
+    by_media.update(_MEDIA_ALIASES)
+    for media, _ in _parse_accept(accept):
+        if media in ("*/*", "application/*"):
+            return DEFAULT_FORMAT
+        key = by_media.get(media)
+        if _available(key):
+            return key
+    raise NotAcceptable(f"None of the requested types are available: {accept}")
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """'zstd' or 'gzip' per Accept-Encoding (zstd preferred on ties), else None."""
+    if not accept_encoding:
+        return None
+    offered = {m: q for m, q in _parse_accept(accept_encoding)}
+    wildcard = offered.get("*", 0.0)
+    best, best_q = None, 0.0
+    for enc in ("zstd", "gzip"):
+        if enc == "zstd" and _zstd() is None:
+            continue
+        q = offered.get(enc, wildcard)
+        if q > best_q:
+            best, best_q = enc, q
+    return best
+
+
+def arrow_table(columns: Dict[str, List], meta: Optional[Dict] = None):
+    """pyarrow Table for columns (typed as in the Arrow/Parquet formats); meta,
+    when given, goes under the schema metadata key "exam_metadata"."""
+    pa = _pyarrow()
+    arrays, fields = [], []
+    for name, values in columns.items():
+        if name in _BOOL_FIELDS:
+            arr = pa.array([v == "TRUE" for v in values], type=pa.bool_())
+        elif name in _INT_FIELDS:
+            arr = pa.array(values, type=pa.int32())
+        else:
+            arr = pa.array(values, type=pa.string())
+        arrays.append(arr)
+        fields.append(pa.field(name, arr.type))
+    metadata = {"exam_metadata": json.dumps(meta)} if meta is not None else None
+    schema = pa.schema(fields, metadata=metadata)
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def encode(fmt: str, columns: Dict[str, List], meta: Dict) -> bytes:
+    """Body bytes for a non-default format key."""
+    if fmt == "columns":
+        return json.dumps({"fields": list(columns), "columns": columns,
+                           "exam_metadata": meta}, separators=(",", ":")).encode("utf-8")
+    pa = _pyarrow()
+    table = arrow_table(columns, meta)
+    sink = pa.BufferOutputStream()
+    if fmt == "arrow":
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+    elif fmt == "parquet":
+        pa.parquet.write_table(table, sink, compression="zstd")
+    else:
+        raise ValueError(f"unknown format {fmt}")
+    return sink.getvalue().to_pybytes()
+
+
+def csv_pair(columns: Dict[str, List], meta: Dict) -> Tuple[str, str]:
+    """The legacy (all_sections_csv, exam_metadata_csv) strings."""
+    return (transformer.columns_to_csv(columns, lineterminator="\n"),
+            transformer.to_csv([meta], transformer.META_FIELDS, lineterminator="\n"))
+
+
+def compress(body: bytes, encoding: Optional[str]) -> bytes:
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6)
+    if encoding == "zstd":
+        return _zstd().ZstdCompressor(level=3).compress(body)
+    return body
+
+
+class StreamCompressor:
+    """Incremental gzip/zstd for streamed bodies; each chunk is flushed so
+    NDJSON records still reach the client as they're produced."""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "gzip":
+            self._obj = zlib.compressobj(6, zlib.DEFLATED, 31)  # 31: gzip container
+        else:
+            zstd = _zstd()
+            self._obj = zstd.ZstdCompressor(level=3).compressobj()
+            self._block = zstd.COMPRESSOBJ_FLUSH_BLOCK
+
+    def chunk(self, data: bytes) -> bytes:
+        if self.encoding == "gzip":
+            return self._obj.compress(data) + self._obj.flush(zlib.Z_SYNC_FLUSH)
+        return self._obj.compress(data) + self._obj.flush(self._block)
+
+    def finish(self) -> bytes:
+        return self._obj.flush()
@@ -0,0 +1,187 @@
+"""
+Content-addressed cache for /transform results.
+
+- Key: sha256 over the PDF bytes + original_name + exam_number + exam_date
+  (+ CACHE_VERSION).
+- Tier 1: bounded in-memory LRU.
+- Tier 2 (optional): one JSON file per key in a directory, evicted oldest-first
+  once the directory exceeds its byte budget.
+- Concurrent requests for the same key share one in-flight computation.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+_KEY_RE = re.compile(r"^[0-9a-f]{64}$")
+# Bump when the cached value's shape changes so stale disk entries are never read
+CACHE_VERSION = 1
+
+
+def cache_key(pdf_bytes: bytes, original_name: Optional[str] = None,
+              exam_number: Optional[str] = None, exam_date: Optional[str] = None) -> str:
+    h = hashlib.sha256(pdf_bytes)
+    # JSON keeps None distinct from "" and avoids separator collisions
+    h.update(json.dumps([original_name, exam_number, exam_date,
+                         CACHE_VERSION]).encode("utf-8"))
+    return h.hexdigest()
+
+
+class ResultCache:
+    def __init__(self, max_entries: int = 256, disk_dir: Optional[str] = None,
+                 disk_max_bytes: int = 256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._mem: "OrderedDict[str, Any]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "coalesced": 0,
+                      "bypassed": 0, "evictions": 0}
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    # ---------- memory tier ----------
+
+    def _mem_get(self, key: str):
+        if key not in self._mem:
+            return None
+        self._mem.move_to_end(key)
+        return self._mem[key]
+
+    def _mem_put(self, key: str, value):
+        if self.max_entries <= 0:
+            return
+        self._mem[key] = value
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    # ---------- disk tier ----------
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _disk_get(self, key: str):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+            os.utime(path)  # LRU by mtime
+            return value
+        except (OSError, ValueError):
+            return None
+
+    def _disk_put(self, key: str, value):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(value, f)
+        os.replace(tmp, path)
+        self._disk_evict()
+
+    def _disk_evict(self):
+        entries = []
+        total = 0
+        for name in os.listdir(self.disk_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                st = os.stat(os.path.join(self.disk_dir, name))
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, name))
+            total += st.st_size
+        for _, size, name in sorted(entries):
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.disk_dir, name))
+                total -= size
+                self.stats["evictions"] += 1
+            except OSError:
+                pass
+
+    # ---------- public API ----------
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]],
+                             bypass: bool = False):
+        """
+        Return (value, status) where status is "hit", "miss" or "coalesced".
+        bypass=True skips lookup and coalescing but still stores the fresh value.
+        Failures are never cached; every waiter sees the exception.
+        """
+        if bypass:
+            self.stats["bypassed"] += 1
+            task = asyncio.ensure_future(self._compute_and_store(key, compute))
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            # shield: as below, a cancelled caller must not cancel the computation
+            # mid-flight; it finishes and is stored
+            return await asyncio.shield(task), "bypass"
+
+        value = self._mem_get(key)
+        if value is not None:
+            self.stats["hits"] += 1
+            return value, "hit"
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+            value, _ = await asyncio.shield(task)
+            return value, "coalesced"
+
+        task = asyncio.ensure_future(self._lookup_or_compute(key, compute))
+        self._inflight[key] = task
+        task.add_done_callback(lambda _t: self._inflight.pop(key, None))
+        # shield: a disconnecting leader must not cancel work others wait on
+        return await asyncio.shield(task)
+
+    async def _lookup_or_compute(self, key, compute):
+        value = await asyncio.to_thread(self._disk_get, key)
+        if value is not None:
+            self.stats["disk_hits"] += 1
+            self._mem_put(key, value)
+            return value, "hit"
+        self.stats["misses"] += 1
+        return await self._compute_and_store(key, compute), "miss"
+
+    async def _compute_and_store(self, key, compute):
+        value = await compute()
+        await self._store(key, value)
+        return value
+
+    async def _store(self, key, value):
+        self._mem_put(key, value)
+        await asyncio.to_thread(self._disk_put, key, value)
+
+    def purge(self, key: Optional[str] = None) -> int:
+        """Drop one key (or everything when key is None). Returns entries removed."""
+        if key is not None and not _KEY_RE.match(key):
+            return 0
+        removed = 0
+        keys = [key] if key is not None else list(self._mem)
+        for k in keys:
+            if self._mem.pop(k, None) is not None:
+                removed += 1
+        if self.disk_dir:
+            names = ([f"{key}.json"] if key is not None
+                     else [n for n in os.listdir(self.disk_dir) if n.endswith(".json")])
+            for name in names:
+                try:
+                    os.remove(os.path.join(self.disk_dir, name))
+                    removed += 1
+                except OSError:
+                    pass
+        return removed
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.stats, "entries": len(self._mem), "max_entries": self.max_entries,
+                "inflight": len(self._inflight), "disk_dir": self.disk_dir}
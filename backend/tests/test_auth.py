@@ -0,0 +1,19 @@
+import pytest
+
+from auth import InvalidToken, sign_token, verify_token
+
+
+def test_round_trip():
+    assert verify_token(sign_token({"sub": "u1"}, "s"), "s")["sub"] == "u1"
+
+
+@pytest.mark.parametrize("token, secret", [
+    (sign_token({"sub": "u1"}, "s"), "other"),
+    (sign_token({"sub": "u1", "exp": 10}, "s"), "s"),
+    (sign_token({}, "s"), "s"),
+    ("not.a.token", "s"),
+    ("", "s"),
+])
+def test_rejected(token, secret):
+    with pytest.raises(InvalidToken):
+        verify_token(token, secret)
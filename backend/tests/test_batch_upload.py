@@ -0,0 +1,47 @@
+import io
+import zipfile
+
+from fastapi.testclient import TestClient
+
+import main
+
+
+def _zip(members):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, data in members:
+            zf.writestr(name, data)
+    return buf.getvalue()
+
+
+def _post(archive):
+    # No lifespan: a rejected batch never reaches the pool
+    client = TestClient(main.app)
+    return client.post("/transform/batch",
+                       files=[("files", ("exams.zip", archive, "application/zip"))])
+
+
+def _no_member_reads(monkeypatch):
+    def read(self, name, pwd=None):
+        raise AssertionError(f"{name} was decompressed")
+    monkeypatch.setattr(zipfile.ZipFile, "read", read)
+
+
+def test_too_many_members_rejected_before_reading(monkeypatch):
+    monkeypatch.setattr(main, "BATCH_MAX_FILES", 3)
+    _no_member_reads(monkeypatch)
+    archive = _zip([(f"exam{i}.pdf", b"%PDF-1.4\n") for i in range(4)])
+    r = _post(archive)
+    assert r.status_code == 413
+    assert r.json()["detail"] == "Too many files (max 3)"
+
+
+def test_expanded_size_over_limit_rejected_before_reading(monkeypatch):
+    monkeypatch.setattr(main, "BATCH_MAX_BYTES", 64 * 1024)
+    _no_member_reads(monkeypatch)
+    # Compresses to well under the limit, but declares 2 x 40 KB once expanded
+    archive = _zip([(f"exam{i}.pdf", b"%PDF-1.4\n" + bytes(40 * 1024)) for i in range(2)])
+    assert len(archive) < 64 * 1024
+    r = _post(archive)
+    assert r.status_code == 413
+    assert r.json()["detail"] == "Batch too large"
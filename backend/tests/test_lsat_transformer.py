@@ -0,0 +1,114 @@
+import csv
+import io
+
+import numpy as np
+import pytest
+
+from lsat_transformerWIP import (LINE_TOL_PT, MERGED_FIELDS, RowTable, TextLines, _box_sums,
+                                 _flag_planes, _score_planes, to_csv)
+
+
+def _page(questions, subtypes, sections):
+    rows = [{"Question": q, "Difficulty": q % 5 + 1, "total_time_seconds": 30 + q,
+             "question_score": q % 2, "Subtype": s, "Flagged": "TRUE" if q % 3 else "FALSE"}
+            for q, s in zip(questions, subtypes)]
+    return RowTable.from_page(rows, {sec: {"experimental": exp} for sec, exp in sections})
+
+
+def _table():
+    # Pages out of order, with labels csv has to quote
+    return RowTable.concat([
+        _page([2, 1], ["Flaw", 'Must "Be" True'], [(3, False)]),
+        _page([4, 3], ["Flaw, Descriptive", "Flaw"], [(1, True), (2, False)]),
+    ]).with_exam_number("12")
+
+
+def test_row_table_sorted_matches_row_sort():
+    table = _table()
+    expected = sorted(table.to_rows(), key=lambda r: (r["Section"], r["Question"]))
+    assert table.sorted().to_rows() == expected
+    # Already in order: returned as is
+    ordered = table.sorted()
+    assert ordered.sorted() is ordered
+
+
+def test_row_table_take_filters_rows():
+    table = _table()
+    rows = table.to_rows()
+    assert table.take(table.sections == 2).to_rows() == [r for r in rows if r["Section"] == 2]
+    assert table.take(np.array([3, 0])).to_rows() == [rows[3], rows[0]]
+    assert len(table.take(table.sections == 9)) == 0
+
+
+def test_row_table_csv_round_trip():
+    table = _table()
+    text = table.to_csv()
+    assert text == to_csv(table.to_rows(), MERGED_FIELDS)
+    parsed = list(csv.DictReader(io.StringIO(text, newline="")))
+    assert parsed == [{f: str(v) for f, v in r.items()} for r in table.to_rows()]
+    assert table.to_csv(header=False) == text.split("\r\n", 1)[1]
+
+
+def _lines(centers_and_x):
+    box = np.array([[x, yc - 1.0, x + 5.0, yc + 1.0] for yc, x in centers_and_x])
+    return TextLines(box, [f"{yc}@{x}" for yc, x in centers_and_x])
+
+
+def test_text_lines_gap_equal_to_tol_joins():
+    lines = _lines([(10.0, 50.0), (10.0 + LINE_TOL_PT, 0.0)])
+    assert lines.texts == [f"{10.0 + LINE_TOL_PT}@0.0 10.0@50.0"]
+
+
+def test_text_lines_gap_over_tol_splits():
+    lines = _lines([(10.0 + LINE_TOL_PT + 0.5, 0.0), (10.0, 50.0)])
+    assert lines.texts == ["10.0@50.0", f"{10.0 + LINE_TOL_PT + 0.5}@0.0"]
+    assert lines.center.tolist() == [10.0, 10.0 + LINE_TOL_PT + 0.5]
+
+
+def test_text_lines_chain_within_tol():
+    # Each gap is within tol, so the pieces form one line though they span 2 * tol
+    lines = _lines([(10.0, 20.0), (10.0 + LINE_TOL_PT, 10.0),
+                    (10.0 + 2 * LINE_TOL_PT, 0.0)])
+    assert len(lines) == 1
+    assert [s["bbox"][0] for s in lines.spans_of(0)] == [0.0, 10.0, 20.0]
+
+
+class _StripRaster:
+    """A page array split into horizontal strips at the given row boundaries."""
+
+    def __init__(self, arr, cuts):
+        self.arr = arr
+        self.bounds = list(zip([0] + cuts, cuts + [arr.shape[0]]))
+
+    def locate(self, y0, y1, x0, x1):
+        for i, (a, b) in enumerate(self.bounds):
+            if a <= y0 and y1 <= b:
+                return i
+        return -1
+
+    def crop(self, y0, y1, x0, x1):
+        return self.arr[y0:y1, x0:x1]
+
+
+@pytest.mark.parametrize("planes_fn", [_score_planes, _flag_planes])
+@pytest.mark.parametrize("n_columns", [3, 20])  # per-column prefixes / 2-D table
+def test_box_sums_match_brute_force(planes_fn, n_columns):
+    rng = np.random.default_rng(0)
+    arr = rng.integers(0, 256, size=(120, 90, 3), dtype=np.uint8)
+    raster = _StripRaster(arr, [40, 80])
+    k = 60
+    # Boxes share n_columns distinct column ranges
+    xs = rng.integers(0, 80, size=n_columns)
+    widths = 1 + rng.integers(0, 10, size=n_columns)
+    col = rng.integers(0, n_columns, size=k)
+    x0, x1 = xs[col], xs[col] + widths[col]
+    y0 = rng.integers(0, 110, size=k)
+    y1 = y0 + 1 + rng.integers(0, 10, size=k)
+    # Boxes crossing a strip boundary fall back to the full page (-1)
+    assert {raster.locate(a, b, 0, 1) for a, b in zip(y0, y1)} >= {-1, 0, 1, 2}
+
+    out = _box_sums(raster, planes_fn, y0, y1, x0, x1)
+    expected = np.array([[int(p.sum()) for p in planes_fn(arr[a:b, c:d])]
+                         for a, b, c, d in zip(y0, y1, x0, x1)]).T
+    assert out.shape == expected.shape
+    assert (out == expected).all()
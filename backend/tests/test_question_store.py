@@ -0,0 +1,58 @@
+import pytest
+
+from lsat_transformerWIP import MERGED_FIELDS
+from question_store import QuestionStore
+
+
+def _upload(exam_number, n=3, score=1, exam_date="2024-09-07"):
+    rows = [{f: None for f in MERGED_FIELDS} for _ in range(n)]
+    for q, row in enumerate(rows, 1):
+        row.update(exam_number=exam_number, exam_date=exam_date, Section=1, Question=q,
+                   Subtype="Flaw", Difficulty=2, total_time_seconds=60,
+                   question_score=score, Flagged="FALSE", experimental_section="FALSE")
+    columns = {f: [r[f] for r in rows] for f in MERGED_FIELDS}
+    return columns, {"exam_number": exam_number, "exam_date": exam_date, "scaled_score": "165"}
+
+
+def test_users_are_isolated():
+    store = QuestionStore(":memory:")
+    assert len(store.upsert("alice", *_upload("12"))["inserted"]) == 3
+    # Same exam for another user: new rows, not an update of alice's
+    assert len(store.upsert("bob", *_upload("12", n=2, score=0))["inserted"]) == 2
+    assert len(store.query("alice")[0]) == 3
+    assert [e["rows"] for e in store.exams("bob")] == [2]
+    assert store.delete_exam("bob", "12") == 2
+    assert store.delete_exam("bob", "12") is None
+    assert [e["rows"] for e in store.exams("alice")] == [3]
+
+
+def test_upload_without_exam_number_is_rejected():
+    store = QuestionStore(":memory:")
+    with pytest.raises(ValueError):
+        store.upsert("alice", *_upload(""))
+    assert store.query("alice") == ([], None)
+    assert store.exams("alice") == []
+
+
+def test_analytics_is_per_user():
+    store = QuestionStore(":memory:")
+    store.upsert("alice", *_upload("12", n=4, score=1))
+    store.upsert("bob", *_upload("12", n=2, score=0))
+    alice, bob = store.analytics("alice"), store.analytics("bob")
+    assert (alice["exams"], alice["overall"]["questions"], alice["overall"]["accuracy"]) \
+        == (1, 4, 1.0)
+    assert (bob["exams"], bob["overall"]["questions"], bob["overall"]["accuracy"]) \
+        == (1, 2, 0.0)
+    assert store.analytics("carol")["overall"]["questions"] == 0
+
+
+def test_analytics_without_exam_number():
+    store = QuestionStore(":memory:")
+    with pytest.raises(ValueError):
+        store.upsert("alice", *_upload(""))
+    assert store.analytics("alice")["overall"]["questions"] == 0
+    # Stats whose exam has no exams row still count, as undated
+    store.upsert("alice", *_upload("12", n=3))
+    store._exec("DELETE FROM exams")
+    assert store.analytics("alice")["overall"]["questions"] == 3
+    assert store.analytics("alice", date_from="2024-01-01")["overall"]["questions"] == 0
@@ -0,0 +1,22 @@
+import asyncio
+
+from result_cache import ResultCache
+
+
+def test_cancelled_bypass_still_computes_and_stores():
+    async def scenario():
+        cache = ResultCache(disk_dir=None)
+        done = []
+
+        async def compute():
+            await asyncio.sleep(0.2)
+            done.append(1)
+            return {"v": 1}
+
+        caller = asyncio.ensure_future(cache.get_or_compute("k", compute, bypass=True))
+        await asyncio.sleep(0.05)
+        caller.cancel()
+        await asyncio.sleep(0.3)
+        return caller.cancelled(), done, cache._mem_get("k")
+
+    assert asyncio.run(scenario()) == (True, [1], {"v": 1})
@@ -0,0 +1,101 @@
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from worker_pool import TransformPool
+
+
+def _tagged(tag: str, delay: float = 0.0) -> str:
+    time.sleep(delay)
+    return tag
+
+
+def _start_child_and_hang(pid_path: str):
+    child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])
+    with open(pid_path, "w") as f:
+        f.write(str(child.pid))
+    time.sleep(60)
+
+
+def _running(pid: int) -> bool:
+    # A killed child that nobody has reaped yet lingers as a zombie
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+async def _until_ready(pool: TransformPool):
+    while pool.ready_workers < pool.workers:
+        await asyncio.sleep(0.05)
+
+
+def test_cancelled_submit_does_not_leak_its_result():
+    async def scenario():
+        pool = TransformPool(workers=2, queue_size=2, timeout=30, warm_modules=())
+        pool.start()
+        try:
+            await _until_ready(pool)
+            before = {r["pid"] for r in pool.warm_reports}
+            slow = asyncio.ensure_future(pool.submit(_tagged, "A-slow", 1.0))
+            await asyncio.sleep(0.3)  # A is running on the first worker
+            slow.cancel()
+            try:
+                await slow
+            except asyncio.CancelledError:
+                pass
+            # Sequential jobs cycle through both worker slots, including A's
+            results = [await pool.submit(_tagged, tag) for tag in ("B", "C", "D")]
+            await _until_ready(pool)
+            after = {r["pid"] for r in pool.warm_reports}
+            return results, len(before - after), len(after)
+        finally:
+            pool.shutdown()
+
+    # A's worker was replaced, not handed to the next job mid-reply
+    assert asyncio.run(scenario()) == (["B", "C", "D"], 1, 2)
+
+
+def test_worker_reused_after_normal_job():
+    async def scenario():
+        pool = TransformPool(workers=1, queue_size=2, timeout=30, warm_modules=())
+        pool.start()
+        try:
+            return [await pool.submit(_tagged, t) for t in ("A", "B")]
+        finally:
+            pool.shutdown()
+
+    assert asyncio.run(scenario()) == ["A", "B"]
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc"), reason="reads process states from /proc")
+def test_killed_worker_takes_its_children_down(tmp_path):
+    pid_path = str(tmp_path / "child.pid")
+
+    async def scenario():
+        pool = TransformPool(workers=1, queue_size=1, timeout=30, warm_modules=())
+        pool.start()
+        try:
+            job = asyncio.ensure_future(pool.submit(_start_child_and_hang, pid_path))
+            while not os.path.exists(pid_path) or not open(pid_path).read():
+                await asyncio.sleep(0.05)
+            child = int(open(pid_path).read())
+            assert _running(child)
+            job.cancel()  # kills the worker mid-job
+            try:
+                await job
+            except asyncio.CancelledError:
+                pass
+            deadline = time.monotonic() + 5
+            while _running(child) and time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+            return _running(child)
+        finally:
+            pool.shutdown()
+
+    assert asyncio.run(scenario()) is False
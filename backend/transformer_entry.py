@@ -1,6 +1,4 @@
-import os
-import tempfile
-import shutil
+# ignore
 from typing import Tuple, Optional
 
 # Import your transformer module (this file sits next to it)
@@ -12,30 +10,11 @@ def transform_file(pdf_path: str,
                    exam_number: Optional[str] = None,
                    exam_date: Optional[str] = None) -> Tuple[str, str]:
     """
-    Calls your existing process_pdf() and returns CSV TEXT (not file paths).
+    Returns CSV TEXT (not file paths) for a PDF on disk.
     Threads original filename hint + overrides through the pipeline.
     """
-    tmp_out = tempfile.mkdtemp(prefix="lsat_transform_")
-    try:
-        merged_csv_path, meta_csv_path = WIP.process_pdf(
-            pdf_path,
-            out_dir=tmp_out,
-            merged_name="all_sections_clean_scored.csv",
-            exam_meta_name="exam_metadata.csv",
-            original_name_hint=original_name,
-            exam_number_override=exam_number,
-            exam_date_override=exam_date,
-        )
-        with open(merged_csv_path, "r", encoding="utf-8") as f:
-            merged_csv_text = f.read()
-        with open(meta_csv_path, "r", encoding="utf-8") as f:
-            meta_csv_text = f.read()
-        return merged_csv_text, meta_csv_text
-    finally:
-        try:
-            shutil.rmtree(tmp_out)
-        except Exception:
-            pass
+    return WIP.transform_file(pdf_path, original_name=original_name,
+                              exam_number=exam_number, exam_date=exam_date)
 
 
 def transform(pdf_bytes: bytes,
@@ -43,16 +22,7 @@ def transform(pdf_bytes: bytes,
               exam_number: Optional[str] = None,
               exam_date: Optional[str] = None) -> Tuple[str, str]:
     """
-    Bytes entrypoint: write temp PDF, then delegate to transform_file()
+    Bytes entrypoint: parsed fully in memory, no temp files.
     """
-    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tf:
-        tf.write(pdf_bytes)
-        tmp_pdf = tf.name
-    try:
-        return transform_file(tmp_pdf, original_name=original_name,
-                              exam_number=exam_number, exam_date=exam_date)
-    finally:
-        try:
-            os.remove(tmp_pdf)
-        except Exception:
-            pass
+    return WIP.transform(pdf_bytes, original_name=original_name,
+                         exam_number=exam_number, exam_date=exam_date)
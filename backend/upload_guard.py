@@ -0,0 +1,110 @@
+"""
+Upload ingestion guards.
+
+- BodySizeLimitMiddleware: per-path request body cap, enforced from Content-Length
+  up front and byte-by-byte while the body streams in, so an oversized upload is
+  cut off with 413 instead of being spooled in full.
+- read_upload(): chunked read of a spooled UploadFile into one buffer, with the
+  same cap.
+- looks_like_pdf(): %PDF- magic sniffing (the client's content_type isn't trusted).
+"""
+
+import json
+from typing import Dict
+
+from fastapi import UploadFile
+
+READ_CHUNK_BYTES = 1024 * 1024
+# The PDF spec allows junk before the header; readers accept it in the first 1 KB
+PDF_MAGIC = b"%PDF-"
+PDF_MAGIC_WINDOW = 1024
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+def looks_like_pdf(head: bytes) -> bool:
+    return PDF_MAGIC in bytes(head[:PDF_MAGIC_WINDOW])
+
+
+async def read_upload(file: UploadFile, limit: int) -> bytearray:
+    """Read the upload in chunks; raises UploadTooLarge as soon as limit is crossed."""
+    size = getattr(file, "size", None)
+    if size is not None and size > limit:
+        raise UploadTooLarge(f"{size} > {limit} bytes")
+    buf = bytearray()
+    while True:
+        chunk = await file.read(READ_CHUNK_BYTES)
+        if not chunk:
+            break
+        if len(buf) + len(chunk) > limit:
+            raise UploadTooLarge(f"> {limit} bytes")
+        buf += chunk
+    return buf
+
+
+class BodySizeLimitMiddleware:
+    """Pure ASGI middleware; limits maps request path -> max body bytes."""
+
+    def __init__(self, app, limits: Dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope.get("path")) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() \
+                and int(content_length) > limit:
+            await self._reject(send)
+            return
+
+        received = 0
+        exceeded = False
+        started = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            if exceeded:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    exceeded = True
+                    # Stop the body parser here; whatever it answers is replaced below
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            nonlocal started
+            if exceeded:
+                if not started:
+                    started = True
+                    await self._reject(send)
+                return
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not exceeded:
+                raise
+            if not started:
+                await self._reject(send)
+
+    @staticmethod
+    async def _reject(send):
+        body = json.dumps({"detail": "PDF too large"}).encode("utf-8")
+        await send({"type": "http.response.start", "status": 413,
+                    "headers": [(b"content-type", b"application/json"),
+                                (b"content-length", str(len(body)).encode()),
+                                (b"connection", b"close")]})
+        await send({"type": "http.response.body", "body": body})
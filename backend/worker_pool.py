@@ -0,0 +1,309 @@
+"""
+Bounded process pool for CPU-bound transforms.
+
+- Workers are spawned up front and pre-warmed: each imports warm_modules, then
+  runs the optional warmup() callable, and reports back (ready_workers,
+  warm_reports) before taking its first job.
+- Admission is bounded: at most `workers + queue_size` jobs running or waiting;
+  beyond that submit() raises PoolBusy so the API can answer 503 + Retry-After.
+- Each job has a timeout; a worker that overruns, or whose job is cancelled, is
+  killed and replaced, without touching jobs running on the other workers. Each
+  worker leads its own process group, so processes it started die with it.
+- stream() runs a generator function and yields its items as the worker sends them.
+"""
+
+import asyncio
+import importlib
+import inspect
+import multiprocessing as mp
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+
+class PoolBusy(Exception):
+    """Raised when the pool's run + wait capacity is exhausted."""
+
+
+class JobTimeout(Exception):
+    """Raised when a job exceeds the per-job timeout (its worker is killed)."""
+
+
+class WorkerCrashed(Exception):
+    """Raised when a worker process dies mid-job."""
+
+
+def _worker_main(conn, warm_modules: Tuple[str, ...], warmup: Optional[Callable[[], Any]]):
+    if hasattr(os, "setpgrp"):
+        # Before warmup, which may start the page_workers processes
+        os.setpgrp()
+    t0 = time.perf_counter()
+    for name in warm_modules:
+        importlib.import_module(name)
+    report = {"pid": os.getpid(), "import_s": time.perf_counter() - t0}
+    if warmup is not None:
+        t0 = time.perf_counter()
+        try:
+            report["warmup"] = warmup()
+        except Exception as e:
+            # A failed warmup only costs the first job its cold start
+            report["warmup_error"] = repr(e)
+        report["warmup_s"] = time.perf_counter() - t0
+    conn.send(("ready", report))
+    while True:
+        try:
+            msg = conn.recv()
+        except EOFError:
+            return
+        if msg is None:
+            return
+        fn, args, kwargs = msg
+        try:
+            value = fn(*args, **kwargs)
+            if inspect.isgenerator(value):
+                for item in value:
+                    conn.send(("item", item))
+                value = None
+            result = ("ok", value)
+        except BaseException as e:
+            result = ("err", e)
+        try:
+            conn.send(result)
+        except Exception as e:
+            # Unpicklable result/exception
+            conn.send(("err", RuntimeError(repr(e))))
+
+
+class _Worker:
+    def __init__(self, ctx, warm_modules: Tuple[str, ...],
+                 warmup: Optional[Callable[[], Any]] = None):
+        self.conn, child_conn = ctx.Pipe()
+        # Not daemonic: workers may fan pages out to their own processes
+        # (page_workers). They exit on EOF when the parent goes away; kill()
+        # takes those processes down too.
+        self.proc = ctx.Process(target=_worker_main,
+                                args=(child_conn, warm_modules, warmup))
+        self.proc.start()
+        child_conn.close()
+        self.report: Optional[Dict] = None
+        self._ready_lock = threading.Lock()
+
+    def wait_ready(self, timeout: Optional[float]) -> Dict:
+        """Block until the worker's startup report arrives (once; later calls return it)."""
+        with self._ready_lock:
+            if self.report is None:
+                if not self.conn.poll(timeout):
+                    raise JobTimeout(f"worker not ready after {timeout}s")
+                status, payload = self.conn.recv()
+                if status != "ready":
+                    raise WorkerCrashed(f"unexpected startup message {status!r}")
+                self.report = payload
+            return self.report
+
+    def run(self, fn: Callable, args: tuple, kwargs: dict, timeout: Optional[float]):
+        """Blocking call; runs on a helper thread, never on the event loop."""
+        try:
+            self.wait_ready(timeout)
+            self.conn.send((fn, args, kwargs))
+            if not self.conn.poll(timeout):
+                raise JobTimeout(f"job exceeded {timeout}s")
+            status, payload = self.conn.recv()
+        except (EOFError, OSError) as e:
+            # OSError also covers a pipe closed under us by kill()
+            raise WorkerCrashed(f"worker exited: {e}") from e
+        if status == "err":
+            raise payload
+        return payload
+
+    def run_stream(self, fn: Callable, args: tuple, kwargs: dict,
+                   timeout: Optional[float], emit: Callable[[Any], None]):
+        """Blocking, like run(); calls emit(item) per item. timeout covers the whole job."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            self.wait_ready(timeout)
+            self.conn.send((fn, args, kwargs))
+            while True:
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                if not self.conn.poll(remaining):
+                    raise JobTimeout(f"job exceeded {timeout}s")
+                status, payload = self.conn.recv()
+                if status != "item":
+                    break
+                emit(payload)
+        except (EOFError, OSError) as e:
+            # OSError also covers a pipe closed under us by kill()
+            raise WorkerCrashed(f"worker exited: {e}") from e
+        if status == "err":
+            raise payload
+
+    def alive(self) -> bool:
+        return self.proc.is_alive()
+
+    def _kill_group(self):
+        """SIGKILL the worker and every process in its group."""
+        try:
+            os.killpg(self.proc.pid, signal.SIGKILL)
+        except (AttributeError, ProcessLookupError):
+            # No process groups, or the worker hasn't made its own yet (so it has no
+            # processes of its own either)
+            self.proc.kill()
+
+    def kill(self):
+        try:
+            self._kill_group()
+            self.proc.join(timeout=5)
+        finally:
+            self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except Exception:
+            pass
+        self.proc.join(timeout=5)
+        # The worker exits via os._exit, so processes it started (page_workers)
+        # are still around even after a clean stop
+        self._kill_group()
+        self.conn.close()
+
+
+class TransformPool:
+    def __init__(self, workers: Optional[int] = None, queue_size: int = 8,
+                 timeout: Optional[float] = 120.0,
+                 warm_modules: Tuple[str, ...] = ("lsat_transformerWIP",),
+                 warmup: Optional[Callable[[], Any]] = None):
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.warm_modules = warm_modules
+        self.warmup = warmup
+        self._ctx = mp.get_context("spawn")
+        self._idle: Optional[asyncio.Queue] = None
+        self._threads: Optional[ThreadPoolExecutor] = None
+        self._pending = 0
+        self._live: set = set()
+
+    @property
+    def capacity(self) -> int:
+        return self.workers + self.queue_size
+
+    @property
+    def pending(self) -> int:
+        """Jobs running or waiting for a worker."""
+        return self._pending
+
+    @property
+    def ready_workers(self) -> int:
+        """Live workers that have finished importing and warming up."""
+        return sum(1 for w in self._live if w.report is not None)
+
+    @property
+    def warm_reports(self) -> List[Dict]:
+        """Startup reports of the live workers (import_s, warmup_s, warmup())."""
+        return [w.report for w in self._live if w.report is not None]
+
+    def _spawn(self) -> _Worker:
+        worker = _Worker(self._ctx, self.warm_modules, self.warmup)
+        self._live.add(worker)
+        # Collect the startup report in the background so readiness is visible
+        # before the worker's first job; failures surface on that job instead
+        fut = asyncio.get_running_loop().run_in_executor(
+            self._threads, worker.wait_ready, self.timeout)
+        fut.add_done_callback(lambda f: f.cancelled() or f.exception())
+        return worker
+
+    def _retire(self, worker: _Worker):
+        self._live.discard(worker)
+        worker.kill()
+
+    def start(self):
+        self._idle = asyncio.Queue()
+        self._threads = ThreadPoolExecutor(max_workers=self.workers,
+                                           thread_name_prefix="transform-wait")
+        for _ in range(self.workers):
+            self._idle.put_nowait(self._spawn())
+
+    async def submit(self, fn: Callable, *args, **kwargs) -> Any:
+        if self._idle is None:
+            raise RuntimeError("TransformPool not started")
+        if self._pending >= self.capacity:
+            raise PoolBusy(f"{self._pending} jobs pending (capacity {self.capacity})")
+        self._pending += 1
+        try:
+            worker = await self._idle.get()
+            loop = asyncio.get_running_loop()
+            try:
+                return await loop.run_in_executor(
+                    self._threads, worker.run, fn, args, kwargs, self.timeout)
+            except (JobTimeout, WorkerCrashed, asyncio.CancelledError):
+                # Cancelled: the worker is still busy, and its reply would be read
+                # by the next job sent to it
+                self._retire(worker)
+                worker = self._spawn()
+                raise
+            finally:
+                if not worker.alive():
+                    self._retire(worker)
+                    worker = self._spawn()
+                self._idle.put_nowait(worker)
+        finally:
+            self._pending -= 1
+
+    async def stream(self, fn: Callable, *args, **kwargs) -> AsyncIterator[Any]:
+        """
+        submit() for a generator function: yields its items as they arrive. Admission
+        happens on the first iteration. If the consumer stops early, the worker is
+        killed and replaced rather than left mid-job.
+        """
+        if self._idle is None:
+            raise RuntimeError("TransformPool not started")
+        if self._pending >= self.capacity:
+            raise PoolBusy(f"{self._pending} jobs pending (capacity {self.capacity})")
+        self._pending += 1
+        try:
+            worker = await self._idle.get()
+            loop = asyncio.get_running_loop()
+            items: asyncio.Queue = asyncio.Queue()
+            finished = False
+
+            def emit(item):
+                loop.call_soon_threadsafe(items.put_nowait, (True, item))
+
+            def done(fut):
+                # Scheduled after every emit() above, so it queues last
+                if not fut.cancelled():
+                    fut.exception()  # retrieved here; re-raised below when consumed
+                items.put_nowait((False, fut))
+
+            fut = loop.run_in_executor(self._threads, worker.run_stream, fn, args, kwargs,
+                                       self.timeout, emit)
+            fut.add_done_callback(done)
+            try:
+                while True:
+                    more, item = await items.get()
+                    if not more:
+                        # The worker is reusable unless it hung or died
+                        finished = item.cancelled() or not isinstance(
+                            item.exception(), (JobTimeout, WorkerCrashed))
+                        item.result()
+                        return
+                    yield item
+            finally:
+                if not finished or not worker.alive():
+                    self._retire(worker)
+                    worker = self._spawn()
+                self._idle.put_nowait(worker)
+        finally:
+            self._pending -= 1
+
+    def shutdown(self):
+        if self._idle is None:
+            return
+        while not self._idle.empty():
+            self._idle.get_nowait().stop()
+        self._live.clear()
+        self._threads.shutdown(wait=False)
+        self._idle = None